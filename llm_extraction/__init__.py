@@ -0,0 +1,7 @@
+"""LLM extraction modules shared by recipe_crawler_simple and menu_processor_simple.
+
+llm_client routes and paces model calls, extraction_cache stores validated
+results by content hash and ingredient_terms interns ingredient text. They
+import config from the calling pipeline, so run them from a pipeline
+directory with the repository root on the path.
+"""
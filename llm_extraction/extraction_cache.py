@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from psycopg2.extras import execute_values
+
+from config import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Eviction limits for the persistent extraction cache
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1000000))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", 90))
+LLM_CACHE_EVICT_INTERVAL_SECONDS = 3600
+
+
+class ExtractionCache:
+    """Persistent cache of validated extraction results.
+
+    Entries are keyed by a hash of (model, system prompt version, user content),
+    so a recrawled page with unchanged text, or two URLs carrying the same
+    content, skip the model call. Changing the prompt or model changes every
+    key, which makes stale entries unreachable until eviction removes them.
+    """
+
+    def __init__(self, table, model, system_prompt,
+                 max_entries=LLM_CACHE_MAX_ENTRIES, max_age_days=LLM_CACHE_MAX_AGE_DAYS):
+        self.table = table
+        self.model = model
+        self.prompt_version = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.last_evicted = None
+
+    def key_for(self, content):
+        """Cache key for the (already truncated) user content"""
+        digest = hashlib.sha256()
+        for part in (self.model, self.prompt_version, content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: stored result JSON} for every fresh entry among keys"""
+        if not keys:
+            return {}
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""UPDATE {self.table}
+                        SET last_used_at = CURRENT_TIMESTAMP, hit_count = hit_count + 1
+                        WHERE cache_key = ANY(%s)
+                        AND date_created > CURRENT_TIMESTAMP - make_interval(days => %s)
+                        RETURNING cache_key, result""",
+                    (list(set(keys)), self.max_age_days)
+                )
+                hits = dict(cursor.fetchall())
+                conn.commit()
+        return hits
+
+    def put_many(self, entries):
+        """Store (key, result dict) pairs, replacing older results for the same key"""
+        if not entries:
+            return
+        # One row per key: ON CONFLICT DO UPDATE cannot touch the same row twice in a statement
+        rows = [(key, self.model, self.prompt_version, json.dumps(result)) for key, result in dict(entries).items()]
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                execute_values(
+                    cursor,
+                    f"""INSERT INTO {self.table} (cache_key, model, prompt_version, result)
+                        VALUES %s
+                        ON CONFLICT (cache_key) DO UPDATE SET
+                        result = EXCLUDED.result,
+                        date_created = CURRENT_TIMESTAMP,
+                        last_used_at = CURRENT_TIMESTAMP""",
+                    rows,
+                    template="(%s, %s, %s, %s::jsonb)"
+                )
+                conn.commit()
+
+    def evict(self):
+        """Drop entries older than max_age_days, then the least recently used beyond max_entries"""
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""DELETE FROM {self.table}
+                        WHERE date_created < CURRENT_TIMESTAMP - make_interval(days => %s)""",
+                    (self.max_age_days,)
+                )
+                expired = cursor.rowcount
+                cursor.execute(
+                    f"""DELETE FROM {self.table} WHERE cache_key IN (
+                            SELECT cache_key FROM {self.table}
+                            ORDER BY last_used_at DESC OFFSET %s
+                        )""",
+                    (self.max_entries,)
+                )
+                overflow = cursor.rowcount
+                conn.commit()
+        self.last_evicted = time.monotonic()
+        if expired or overflow:
+            logger.info(f"Extraction cache evicted {expired} expired and {overflow} least-recently-used entries")
+
+    def maybe_evict(self):
+        """Run eviction at most once per LLM_CACHE_EVICT_INTERVAL_SECONDS"""
+        if self.last_evicted is None or time.monotonic() - self.last_evicted >= LLM_CACHE_EVICT_INTERVAL_SECONDS:
+            try:
+                self.evict()
+            except Exception as e:
+                logger.warning(f"Extraction cache eviction failed: {e}")
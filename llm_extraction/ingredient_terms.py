@@ -0,0 +1,79 @@
+import os
+import logging
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Terms held in memory per process; the cache starts over when it grows past this
+TERM_CACHE_MAX_ENTRIES = int(os.getenv("TERM_CACHE_MAX_ENTRIES", 200000))
+
+
+def term_text(value):
+    """Dictionary form of a column value: enums by their value; '' is a term of its own, only None is NULL"""
+    return getattr(value, "value", value)
+
+
+class TermCatalog:
+    """Interning cache for an ingredient_terms dictionary table.
+
+    dish_ingredients stores its repetitive text columns (ingredient,
+    flavor_ingredient, format, units, type) as ids into the dictionary.
+    resolve() maps a batch's strings to ids in bulk: no statements once the
+    terms are cached, at most three otherwise. Only ids read back from
+    committed rows are cached, so a term inserted by a transaction that later
+    rolls back is never handed out again. Call it once per transaction.
+    """
+
+    def __init__(self, table, max_entries=TERM_CACHE_MAX_ENTRIES):
+        self.table = table
+        self.max_entries = max_entries
+        self.ids = {}
+
+    def remember(self, ids):
+        if len(self.ids) + len(ids) > self.max_entries:
+            self.ids.clear()
+        self.ids.update(ids)
+
+    def resolve(self, cursor, terms):
+        """Return {term: term_id} for the non-NULL terms, inserting unknown ones on the open cursor"""
+        wanted = {term for term in terms if term is not None}
+        found = {term: self.ids[term] for term in wanted if term in self.ids}
+        missing = sorted(wanted - found.keys())  # sorted so concurrent writers lock in the same order
+        if not missing:
+            return found
+
+        cursor.execute(f"SELECT term, term_id FROM {self.table} WHERE term = ANY(%s)", (missing,))
+        existing = dict(cursor.fetchall())
+        self.remember(existing)
+        found.update(existing)
+
+        new = [term for term in missing if term not in existing]
+        if new:
+            inserted = dict(execute_values(
+                cursor,
+                f"INSERT INTO {self.table} (term) VALUES %s ON CONFLICT (term) DO NOTHING RETURNING term, term_id",
+                [(term,) for term in new],
+                page_size=len(new),
+                fetch=True
+            ))
+            found.update(inserted)
+            # Terms another worker committed while this insert waited on them
+            raced = [term for term in new if term not in inserted]
+            if raced:
+                cursor.execute(f"SELECT term, term_id FROM {self.table} WHERE term = ANY(%s)", (raced,))
+                committed = dict(cursor.fetchall())
+                self.remember(committed)
+                found.update(committed)
+            logger.debug(f"Added {len(inserted)} terms to {self.table}")
+        return found
+
+    def intern_rows(self, cursor, rows, positions):
+        """Copy of rows with the values at positions replaced by their term ids"""
+        ids = self.resolve(cursor, [term_text(row[i]) for row in rows for i in positions])
+        interned = []
+        for row in rows:
+            row = list(row)
+            for i in positions:
+                row[i] = ids.get(term_text(row[i]))
+            interned.append(tuple(row))
+        return interned
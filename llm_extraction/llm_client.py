@@ -0,0 +1,627 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import openai
+from openai import AsyncAzureOpenAI
+from pydantic import ValidationError
+
+from config import AZURE_API_KEY
+
+logger = logging.getLogger(__name__)
+
+# Default deployment quotas; override per deployment with AZURE_TPM_<NAME> / AZURE_RPM_<NAME>
+AZURE_DEPLOYMENT_TPM = int(os.getenv("AZURE_DEPLOYMENT_TPM", 1000000))
+AZURE_DEPLOYMENT_RPM = int(os.getenv("AZURE_DEPLOYMENT_RPM", 6000))
+
+# Endpoint/deployment pool, as a JSON list of objects with keys
+# name, endpoint, deployment and optionally api_key, api_version, tpm, rpm
+AZURE_OPENAI_DEPLOYMENTS = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+# Endpoint used when AZURE_OPENAI_DEPLOYMENTS is unset; AZURE_API_ENDPOINT does not change it
+DEFAULT_AZURE_ENDPOINT = "https://locmatic-menu-recipe.openai.azure.com/"
+DEFAULT_AZURE_API_VERSION = "2024-12-01-preview"
+
+# Retry policy shared by every LLM call in the process
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 4))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", 0.2))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", 10))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 60))
+
+# Rough prompt-size heuristic for English text; reconciled against usage afterwards
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def header_float(headers, name):
+    """Numeric response header, or None when missing or malformed"""
+    if headers is None:
+        return None
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def response_usage_tokens(response):
+    """total_tokens from a raw response's JSON body, or None when it reports no usage"""
+    try:
+        return int(response.http_response.json()["usage"]["total_tokens"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(headers):
+    """Seconds to back off according to Azure's retry-after-ms / retry-after headers"""
+    retry_after_ms = header_float(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000.0
+    return header_float(headers, "retry-after")
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency window for LLM calls.
+
+    The window grows by about one slot per window's worth of healthy
+    responses (additive increase) and is cut by `decrease` on throttling
+    (multiplicative decrease). A 429's retry-after pauses all admissions
+    instead of letting every in-flight worker hit the endpoint again.
+    """
+
+    def __init__(self, initial=8, minimum=1, maximum=64, decrease=0.5,
+                 latency_target=30.0, low_remaining_requests=5, low_remaining_tokens=5000):
+        self.window = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.low_remaining_requests = low_remaining_requests
+        self.low_remaining_tokens = low_remaining_tokens
+        self.in_flight = 0
+        self.throttled = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def limit(self):
+        """Current concurrency window (the reported metric)"""
+        return max(self.minimum, int(self.window))
+
+    async def acquire(self):
+        async with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                else:
+                    await self._condition.wait()
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    def record_success(self, latency, headers=None):
+        """Grow the window while latency is healthy and the deployment reports spare quota"""
+        remaining_requests = header_float(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = header_float(headers, "x-ratelimit-remaining-tokens")
+        near_limit = (
+            (remaining_requests is not None and remaining_requests < self.low_remaining_requests)
+            or (remaining_tokens is not None and remaining_tokens < self.low_remaining_tokens)
+        )
+        if latency > self.latency_target or near_limit:
+            return
+        self.window = min(self.maximum, self.window + 1.0 / self.window)
+
+    def record_throttle(self, retry_after=None):
+        """Cut the window on a 429 and pause admissions for retry-after seconds"""
+        now = time.monotonic()
+        self.throttled += 1
+        # One cut per burst: the other requests of the same window see the same 429
+        if now - self.last_decrease >= max(retry_after or 0.0, 1.0):
+            self.window = max(float(self.minimum), self.window * self.decrease)
+            self.last_decrease = now
+            logger.warning(f"LLM throttled, concurrency window cut to {self.limit}")
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def stats(self):
+        return {"window": self.limit, "in_flight": self.in_flight, "throttled": self.throttled}
+
+
+def estimate_request_tokens(messages, max_tokens):
+    """Tokens a chat request can consume: estimated prompt plus the full completion budget"""
+    prompt_tokens = sum(
+        len(message.get("content") or "") // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+    return prompt_tokens + max_tokens
+
+
+class TokenRateLimiter:
+    """Token-bucket admission against a deployment's tokens- and requests-per-minute quotas.
+
+    Each request reserves its estimated cost up front. reconcile() returns the
+    difference once the actual usage is known, so short requests free their
+    unused completion budget for the next ones.
+    """
+
+    def __init__(self, tokens_per_minute, requests_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.requests = float(requests_per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60.0)
+        self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60.0)
+
+    async def acquire(self, estimated_tokens):
+        """Wait until the bucket can cover the request; callers are admitted in arrival order"""
+        # A request larger than the whole bucket is admitted once the bucket is full
+        cost = min(estimated_tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= cost and self.requests >= 1:
+                    self.tokens -= cost
+                    self.requests -= 1
+                    return
+                wait = max(
+                    (cost - self.tokens) * 60.0 / self.tokens_per_minute,
+                    (1 - self.requests) * 60.0 / self.requests_per_minute,
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        """Settle a reservation against the usage the API reported"""
+        self._refill()
+        self.tokens = min(self.tokens_per_minute, self.tokens + estimated_tokens - actual_tokens)
+
+
+_deployment_rate_limiters = {}
+
+
+def get_deployment_rate_limiter(deployment):
+    """Shared TokenRateLimiter for a deployment, sized from its quota environment variables"""
+    if deployment not in _deployment_rate_limiters:
+        suffix = re.sub(r"[^A-Z0-9]+", "_", deployment.upper()).strip("_")
+        _deployment_rate_limiters[deployment] = TokenRateLimiter(
+            int(os.getenv(f"AZURE_TPM_{suffix}", AZURE_DEPLOYMENT_TPM)),
+            int(os.getenv(f"AZURE_RPM_{suffix}", AZURE_DEPLOYMENT_RPM)),
+        )
+    return _deployment_rate_limiters[deployment]
+
+
+# Error classes; only throttling and transient endpoint failures are worth retrying
+THROTTLE = "throttle"
+TRANSIENT = "transient"
+CONTENT_FILTER = "content_filter"
+LENGTH_LIMIT = "length_limit"
+VALIDATION = "validation"
+CIRCUIT_OPEN = "circuit_open"
+FATAL = "fatal"
+RETRYABLE_ERRORS = {THROTTLE, TRANSIENT}
+# Failures that leave the row pending for a later pass instead of marking it failed
+DEFERRABLE_ERRORS = {THROTTLE, TRANSIENT, CIRCUIT_OPEN}
+
+
+class LLMCallError(Exception):
+    """A classified LLM call failure"""
+
+    def __init__(self, kind, message, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.kind in RETRYABLE_ERRORS
+
+    @property
+    def deferrable(self):
+        return self.kind in DEFERRABLE_ERRORS
+
+    def __str__(self):
+        return f"{self.kind}: {super().__str__()}"
+
+
+def classify_error(error):
+    """Map an exception raised around a chat completion call to an LLMCallError"""
+    if isinstance(error, LLMCallError):
+        return error
+    if isinstance(error, openai.RateLimitError):
+        return LLMCallError(THROTTLE, str(error), parse_retry_after(error.response.headers))
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return LLMCallError(TRANSIENT, str(error))
+    if isinstance(error, openai.LengthFinishReasonError):
+        return LLMCallError(LENGTH_LIMIT, "Completion hit the max_tokens limit")
+    if isinstance(error, openai.ContentFilterFinishReasonError):
+        return LLMCallError(CONTENT_FILTER, "Completion stopped by the content filter")
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code in (408, 409) or error.status_code >= 500:
+            return LLMCallError(TRANSIENT, str(error), parse_retry_after(error.response.headers))
+        # Azure rejects prompts that trip the content filter with a 400
+        if error.code == "content_filter":
+            return LLMCallError(CONTENT_FILTER, str(error))
+        return LLMCallError(FATAL, str(error))
+    if isinstance(error, (ValidationError, json.JSONDecodeError)):
+        return LLMCallError(VALIDATION, str(error))
+    return LLMCallError(FATAL, f"{type(error).__name__}: {error}")
+
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=30.0):
+    """Full-jitter exponential backoff, never shorter than the server's retry-after"""
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    return max(delay, retry_after or 0.0)
+
+
+class RetryBudget:
+    """Caps retries at a fraction of first attempts, so an outage cannot multiply the load.
+
+    Every first attempt deposits `ratio` of a retry, every retry withdraws
+    one; the balance starts at (and is capped by) a small reserve.
+    """
+
+    def __init__(self, ratio=LLM_RETRY_BUDGET_RATIO, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        self.exhausted = 0
+
+    def record_attempt(self):
+        self.balance = min(float(self.reserve), self.balance + self.ratio)
+
+    def try_spend(self):
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class CircuitBreaker:
+    """Stops calls to an endpoint after consecutive transient failures.
+
+    Open for `reset_seconds`, then half-open: a single probe call is let
+    through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD, reset_seconds=LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def remaining(self):
+        """Seconds until the next probe is allowed"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.remaining() > 0 or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("LLM endpoint recovered, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def cancel_probe(self):
+        """Forget a probe that ended without an outcome (cancelled), so the next call can probe"""
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.probing = False
+            logger.warning(f"LLM endpoint unhealthy after {self.failures} failures, circuit open for {self.reset_seconds:.0f}s")
+
+
+def strict_json_schema(schema, root=None):
+    """Tighten a pydantic JSON schema, in place, into what strict structured outputs accept.
+
+    Every object is closed and lists all of its properties as required,
+    `default: null` is dropped, and a $ref with sibling keys (a described
+    nested model) or a single-entry allOf is inlined.
+    """
+    root = schema if root is None else root
+    for defs_key in ("$defs", "definitions"):
+        for definition in schema.get(defs_key, {}).values():
+            strict_json_schema(definition, root)
+    if schema.get("type") == "object":
+        schema.setdefault("additionalProperties", False)
+        properties = schema.get("properties")
+        if properties is not None:
+            schema["required"] = list(properties)
+            for prop in properties.values():
+                strict_json_schema(prop, root)
+    if isinstance(schema.get("items"), dict):
+        strict_json_schema(schema["items"], root)
+    for variant in schema.get("anyOf", []):
+        strict_json_schema(variant, root)
+    all_of = schema.get("allOf")
+    if all_of is not None:
+        if len(all_of) == 1:
+            schema.update(strict_json_schema(all_of[0], root))
+            schema.pop("allOf")
+        else:
+            for variant in all_of:
+                strict_json_schema(variant, root)
+    if "default" in schema and schema["default"] is None:
+        schema.pop("default")
+    ref = schema.get("$ref")
+    if ref is not None and len(schema) > 1:
+        resolved = root
+        for part in ref.lstrip("#/").split("/"):
+            resolved = resolved[part]
+        schema.update({**resolved, **schema})
+        schema.pop("$ref")
+        return strict_json_schema(schema, root)
+    return schema
+
+
+def json_schema_response_format(model):
+    """Strict response_format dict for a pydantic model, for create() calls and Batch API request bodies"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": strict_json_schema(model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+class Deployment:
+    """One endpoint/deployment pair with its own client, limiters, circuit and usage counters"""
+
+    def __init__(self, name, endpoint, deployment, api_key=None, api_version=DEFAULT_AZURE_API_VERSION,
+                 tpm=None, rpm=None, initial_concurrency=8, max_concurrency=64, timeout=60.0):
+        self.name = name
+        self.deployment = deployment
+        self.client = AsyncAzureOpenAI(
+            api_key=api_key or AZURE_API_KEY,
+            api_version=api_version,
+            azure_endpoint=endpoint,
+            timeout=timeout,
+            max_retries=0,  # LLMClient owns retries
+        )
+        self.limiter = AdaptiveConcurrencyLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        if tpm or rpm:
+            self.rate_limiter = TokenRateLimiter(tpm or AZURE_DEPLOYMENT_TPM, rpm or AZURE_DEPLOYMENT_RPM)
+        else:
+            self.rate_limiter = get_deployment_rate_limiter(name)
+        self.breaker = CircuitBreaker()
+        self.latency_ewma = None
+        self.remaining_tokens = None
+        self.requests = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def available(self):
+        """Whether the circuit would let a call through right now"""
+        return not self.breaker.is_open or (self.breaker.remaining() == 0 and not self.breaker.probing)
+
+    def weight(self):
+        """Routing weight: spare quota and free concurrency over observed latency"""
+        quota = self.rate_limiter.tokens / self.rate_limiter.tokens_per_minute
+        if self.remaining_tokens is not None:
+            quota = min(quota, self.remaining_tokens / self.rate_limiter.tokens_per_minute)
+        slots = (self.limiter.limit - self.limiter.in_flight) / self.limiter.limit
+        paused = self.limiter.paused_until > time.monotonic()
+        weight = max(quota, 0.01) * max(slots, 0.05) / (self.latency_ewma or 1.0)
+        return weight * (0.01 if paused else 1.0)
+
+    async def call(self, messages, max_tokens, response_format, temperature):
+        """One call under this deployment's concurrency window and token bucket"""
+        self.requests += 1
+        async with self.limiter:
+            estimated_tokens = estimate_request_tokens(messages, max_tokens)
+            await self.rate_limiter.acquire(estimated_tokens)
+            started = time.monotonic()
+            response = completion = None
+            try:
+                # Pydantic models go through parse(); JSON schema dicts through create()
+                if isinstance(response_format, dict):
+                    call = self.client.chat.completions.with_raw_response.create
+                else:
+                    call = self.client.beta.chat.completions.with_raw_response.parse
+                response = await call(
+                    model=self.deployment,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    messages=messages,
+                    response_format=response_format,
+                )
+                # The endpoint answered; parse() may still reject the content (length, filter, schema)
+                latency = time.monotonic() - started
+                self.limiter.record_success(latency, response.headers)
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                self.remaining_tokens = header_float(response.headers, "x-ratelimit-remaining-tokens")
+                completion = response.parse()
+            finally:
+                # Settle the reservation: requests that got no response (429s, 5xx, timeouts)
+                # used no quota; answered ones cost their reported usage
+                if response is None:
+                    used_tokens = 0
+                elif completion is not None and completion.usage:
+                    used_tokens = completion.usage.total_tokens
+                else:
+                    used_tokens = response_usage_tokens(response)
+                self.rate_limiter.reconcile(estimated_tokens, estimated_tokens if used_tokens is None else used_tokens)
+            if completion.usage:
+                self.prompt_tokens += completion.usage.prompt_tokens
+                self.completion_tokens += completion.usage.completion_tokens
+
+        finish_reason = completion.choices[0].finish_reason
+        if finish_reason == "length":
+            raise LLMCallError(LENGTH_LIMIT, "Completion hit the max_tokens limit")
+        if finish_reason == "content_filter":
+            raise LLMCallError(CONTENT_FILTER, "Completion stopped by the content filter")
+        return completion
+
+    def stats(self):
+        return {
+            "window": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+            "throttled": self.limiter.throttled,
+            "requests": self.requests,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ewma": round(self.latency_ewma, 2) if self.latency_ewma is not None else None,
+            "circuit_open": self.breaker.is_open,
+        }
+
+
+def load_deployments(default_deployment, initial_concurrency=8, max_concurrency=64, timeout=60.0):
+    """Deployments from AZURE_OPENAI_DEPLOYMENTS, or DEFAULT_AZURE_ENDPOINT's default_deployment when unset"""
+    if AZURE_OPENAI_DEPLOYMENTS:
+        configs = json.loads(AZURE_OPENAI_DEPLOYMENTS)
+    else:
+        configs = [{
+            "name": default_deployment,
+            "endpoint": DEFAULT_AZURE_ENDPOINT,
+            "deployment": default_deployment,
+        }]
+    return [
+        Deployment(
+            name=config.get("name") or config["deployment"],
+            endpoint=config["endpoint"],
+            deployment=config["deployment"],
+            api_key=config.get("api_key"),
+            api_version=config.get("api_version", DEFAULT_AZURE_API_VERSION),
+            tpm=config.get("tpm"),
+            rpm=config.get("rpm"),
+            initial_concurrency=initial_concurrency,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+        )
+        for config in configs
+    ]
+
+
+class LLMClient:
+    """Routes chat completions over a pool of deployments with classified retries.
+
+    Each call goes to a deployment picked at random in proportion to its
+    weight (spare quota, free concurrency, latency). A throttled or failing
+    deployment is skipped on the retry so the call fails over; a deployment
+    whose circuit is open receives no traffic until its probe succeeds.
+    Failures surface as LLMCallError.
+    """
+
+    def __init__(self, deployments, max_attempts=LLM_MAX_ATTEMPTS, retry_budget=None):
+        self.deployments = deployments
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget or RetryBudget()
+
+    @classmethod
+    def from_env(cls, default_deployment, initial_concurrency=8, max_concurrency=64, timeout=60.0):
+        return cls(load_deployments(default_deployment, initial_concurrency, max_concurrency, timeout))
+
+    @property
+    def all_circuits_open(self):
+        return all(d.breaker.is_open for d in self.deployments)
+
+    def next_probe_in(self):
+        """Seconds until some deployment accepts traffic again"""
+        return min(d.breaker.remaining() for d in self.deployments)
+
+    def choose(self, tried):
+        """Weighted pick among available deployments, preferring ones not yet tried for this call"""
+        available = [d for d in self.deployments if d.available]
+        candidates = [d for d in available if d.name not in tried] or available
+        if not candidates:
+            return None
+        return random.choices(candidates, weights=[d.weight() for d in candidates])[0]
+
+    async def complete(self, messages, max_tokens, response_format, temperature=0.0):
+        """Run a chat completion, failing over and retrying retryable failures. Raises LLMCallError"""
+        attempt = 0
+        tried = set()
+        while True:
+            deployment = self.choose(tried)
+            if deployment is None or not deployment.breaker.allow():
+                raise LLMCallError(CIRCUIT_OPEN, f"All deployments unavailable for another {self.next_probe_in():.0f}s")
+            attempt += 1
+            if attempt == 1:
+                self.retry_budget.record_attempt()
+            try:
+                completion = await deployment.call(messages, max_tokens, response_format, temperature)
+                deployment.breaker.record_success()
+                return completion
+            except Exception as e:
+                error = classify_error(e)
+            except BaseException:
+                # Cancellation says nothing about the endpoint, but must not leave a probe pending forever
+                deployment.breaker.cancel_probe()
+                raise
+
+            deployment.failures += 1
+            if error.kind == THROTTLE:
+                deployment.limiter.record_throttle(error.retry_after)
+            if error.kind == TRANSIENT:
+                deployment.breaker.record_failure()
+            else:
+                # The endpoint answered, even if only to throttle or reject the request
+                deployment.breaker.record_success()
+
+            if not error.retryable or attempt >= self.max_attempts:
+                raise error
+            tried.add(deployment.name)
+            # Another deployment can take the retry straight away; retrying the same
+            # pool again costs retry budget and waits out a backoff first
+            if any(d.available and d.name not in tried for d in self.deployments):
+                continue
+            if not self.retry_budget.try_spend():
+                raise error
+            await asyncio.sleep(backoff_delay(attempt, error.retry_after))
+
+    def stats(self):
+        deployments = {d.name: d.stats() for d in self.deployments}
+        return {
+            "window": sum(d["window"] for d in deployments.values()),
+            "throttled": sum(d["throttled"] for d in deployments.values()),
+            "retry_budget": round(self.retry_budget.balance, 1),
+            "retries_denied": self.retry_budget.exhausted,
+            "deployments": deployments,
+        }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for MenuProcessor.
+
+Seeds synthetic pending menu items into a local Postgres, drains them through
+MenuProcessor.process_batch against the mock OpenAI server, and reports
+items/sec, p50/p99 LLM call latency and the time spent in database reads
+and writes. Seeded rows (and their dishes and cache entries) are removed
+afterwards unless --keep is given.
+
+Run against a scratch database: process_batch takes every pending row, not
+only the seeded ones. menu.dishes references menu.menu_items, so the scratch
+schema needs that constraint dropped (or matching menu_items rows) for the
+saves to succeed.
+
+Usage:
+    python ../recipe_crawler_simple/mock_openai_server.py --latency-median 0.8 &
+    AZURE_OPENAI_DEPLOYMENTS='[{"name": "mock", "endpoint": "http://localhost:8089/", "deployment": "gpt-4.1-mini"}]' \\
+        python benchmark_extraction.py --items 5000 --batch-size 64 --max-concurrency 32 --pack-size 8
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from collections import defaultdict
+from psycopg2.extras import execute_values
+
+from config import setup_logging, db_connection
+from openai_menu_processor import MenuProcessor, canonical_menu_text
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_CATEGORY = "Benchmark"
+
+# Processor methods that spend their time in the database
+DB_METHODS = ["get_pending_menus", "lookup_cached", "store_cached", "save_results"]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Timings:
+    """Wall-clock samples of instance methods, keyed by method name"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, obj, name):
+        method = getattr(obj, name)
+        samples = self.samples[name]
+        if asyncio.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - started)
+        else:
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - started)
+        setattr(obj, name, timed)
+
+    def total(self, names):
+        return sum(sum(self.samples[name]) for name in names)
+
+
+def synthetic_item(index):
+    """(item_id, name, description, category) unique per index so nothing is deduplicated or cached"""
+    name = f"Benchmark Chicken Tikka Wrap No. {index}"
+    description = (f"Grilled chicken tikka, {index % 7 + 1} chutneys, pickled onion and "
+                   f"mint yogurt in a warm paratha, served with masala fries")
+    return str(uuid.uuid4()), name, description, BENCHMARK_CATEGORY
+
+
+def seed(count):
+    """Insert count pending menu items"""
+    now = datetime.utcnow()
+    items = [synthetic_item(index) for index in range(count)]
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                """INSERT INTO menu.demo_menu_items
+                   (item_id, name, description, category, date_uploaded, llm_status)
+                   VALUES %s""",
+                [(item_id, name, description, category, now, 'pending')
+                 for item_id, name, description, category in items]
+            )
+            conn.commit()
+    return items
+
+
+def cleanup(processor, items):
+    """Remove seeded items, their dishes (children cascade) and their cache entries"""
+    item_ids = [item[0] for item in items]
+    keys = [cache.key_for(canonical_menu_text(name, description, category))
+            for cache in (processor.cache, processor.packed_cache)
+            for _, name, description, category in items]
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {processor.cache.table} WHERE cache_key = ANY(%s)", (keys,))
+            cursor.execute("DELETE FROM menu.dishes WHERE dish_id = ANY(%s::uuid[])", (item_ids,))
+            cursor.execute("DELETE FROM menu.demo_menu_items WHERE item_id = ANY(%s::uuid[])", (item_ids,))
+            conn.commit()
+
+
+def count_statuses(items):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """SELECT llm_status, count(*) FROM menu.demo_menu_items
+                   WHERE item_id = ANY(%s::uuid[]) GROUP BY llm_status""",
+                ([item[0] for item in items],)
+            )
+            return dict(cursor.fetchall())
+
+
+async def benchmark(args):
+    processor = MenuProcessor(args.batch_size, args.max_concurrency, args.pack_size)
+    items = seed(args.items)
+    logger.info(f"Seeded {len(items)} pending menu items")
+
+    timings = Timings()
+    timings.wrap(processor.llm, "complete")
+    for name in DB_METHODS:
+        timings.wrap(processor, name)
+
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < args.max_seconds:
+            if not await processor.process_batch():
+                break
+        elapsed = time.perf_counter() - started
+        statuses = count_statuses(items)
+    finally:
+        if not args.keep:
+            cleanup(processor, items)
+
+    done = sum(count for status, count in statuses.items() if status != 'pending')
+    latencies = timings.samples["complete"]
+    db_seconds = timings.total(DB_METHODS)
+    logger.info(f"{done}/{len(items)} items in {elapsed:.1f}s: {done / elapsed:.1f} items/sec "
+                f"(statuses {statuses})")
+    logger.info(f"LLM calls: {len(latencies)}, p50 {percentile(latencies, 0.5):.2f}s, "
+                f"p99 {percentile(latencies, 0.99):.2f}s")
+    logger.info(f"DB time: {db_seconds:.1f}s total ({db_seconds / elapsed:.0%} of wall time), "
+                f"save_results {timings.total(['save_results']) / max(done, 1) * 1000:.1f} ms/item")
+    for name in DB_METHODS:
+        samples = timings.samples[name]
+        if samples:
+            logger.info(f"  {name}: {len(samples)} calls, {sum(samples):.2f}s, p99 {percentile(samples, 0.99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MenuProcessor against a local Postgres and mock LLM")
+    parser.add_argument("--items", type=int, default=2000, help="Synthetic menu items to seed")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Initial LLM concurrency per deployment")
+    parser.add_argument("--pack-size", type=int, default=1, help="Menu items per LLM request")
+    parser.add_argument("--max-seconds", type=float, default=600, help="Stop after this long even if rows remain")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows and results")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
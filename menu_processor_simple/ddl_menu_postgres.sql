@@ -23,6 +23,8 @@ CREATE TABLE IF NOT EXISTS menu.dishes
     num_reviews integer DEFAULT 0,
     date_published date,
     date_updated date,
+    ingredients_hash character varying COLLATE pg_catalog."default",
+    attributes_hash character varying COLLATE pg_catalog."default",
     CONSTRAINT dishes_pkey PRIMARY KEY (dish_id),
     CONSTRAINT dishes_dish_id_fkey FOREIGN KEY (dish_id)
         REFERENCES menu.menu_items (item_id) MATCH SIMPLE
@@ -34,6 +36,54 @@ TABLESPACE pg_default;
 ALTER TABLE IF EXISTS menu.dishes
     OWNER to postgres;
 
+CREATE INDEX IF NOT EXISTS dishes_date_modified_idx
+    ON menu.dishes (date_modified);
+
+-- Table: menu.dish_tombstones (deleted dish ids for the incremental MotherDuck sync)
+-- DROP TABLE IF EXISTS menu.dish_tombstones;
+CREATE TABLE IF NOT EXISTS menu.dish_tombstones
+(
+    dish_id uuid NOT NULL,
+    deleted_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+TABLESPACE pg_default;
+ALTER TABLE IF EXISTS menu.dish_tombstones
+    OWNER to postgres;
+
+CREATE INDEX IF NOT EXISTS dish_tombstones_deleted_at_idx
+    ON menu.dish_tombstones (deleted_at);
+
+CREATE OR REPLACE FUNCTION menu.record_dish_tombstones()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO menu.dish_tombstones (dish_id)
+    SELECT dish_id FROM old_rows;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS dishes_record_tombstones ON menu.dishes;
+CREATE TRIGGER dishes_record_tombstones
+    AFTER DELETE ON menu.dishes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION menu.record_dish_tombstones();
+
+-- Table: menu.ingredient_terms (dictionary behind the dish_ingredients *_term_id columns, see ../llm_extraction/ingredient_terms.py)
+-- DROP TABLE IF EXISTS menu.ingredient_terms;
+CREATE TABLE IF NOT EXISTS menu.ingredient_terms
+(
+    term_id serial NOT NULL,
+    term character varying COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT ingredient_terms_pkey PRIMARY KEY (term_id),
+    CONSTRAINT ingredient_terms_term_key UNIQUE (term)
+)
+TABLESPACE pg_default;
+ALTER TABLE IF EXISTS menu.ingredient_terms
+    OWNER to postgres;
+
 -- Table: menu.dish_ingredients (Based on recipe.dish_ingredients structure)
 -- DROP TABLE IF EXISTS menu.dish_ingredients;
 
@@ -42,27 +92,54 @@ CREATE TABLE IF NOT EXISTS menu.dish_ingredients
     dish_id uuid NOT NULL,
     ingredient_id SERIAL NOT NULL,
     quantity numeric(18,3),
-    units character varying COLLATE pg_catalog."default",
-    format character varying COLLATE pg_catalog."default",
-    type character varying COLLATE pg_catalog."default",
     ingredient_role character varying COLLATE pg_catalog."default",
     flavor_role character varying COLLATE pg_catalog."default",
     alternative_ingredients character varying[] COLLATE pg_catalog."default",
     date_added timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
     prep_method character varying COLLATE pg_catalog."default",
-    ingredient character varying COLLATE pg_catalog."default",
-    flavor_ingredient character varying COLLATE pg_catalog."default",
+    ingredient_term_id integer,
+    flavor_ingredient_term_id integer,
+    format_term_id integer,
+    units_term_id integer,
+    type_term_id integer,
     CONSTRAINT dish_ingredients_pkey PRIMARY KEY (dish_id, ingredient_id),
     CONSTRAINT dish_ingredients_dish_id_fkey FOREIGN KEY (dish_id)
         REFERENCES menu.dishes (dish_id) MATCH SIMPLE
         ON UPDATE NO ACTION
-        ON DELETE CASCADE
+        ON DELETE CASCADE,
+    CONSTRAINT dish_ingredients_ingredient_term_id_fkey FOREIGN KEY (ingredient_term_id)
+        REFERENCES menu.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_flavor_ingredient_term_id_fkey FOREIGN KEY (flavor_ingredient_term_id)
+        REFERENCES menu.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_format_term_id_fkey FOREIGN KEY (format_term_id)
+        REFERENCES menu.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_units_term_id_fkey FOREIGN KEY (units_term_id)
+        REFERENCES menu.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_type_term_id_fkey FOREIGN KEY (type_term_id)
+        REFERENCES menu.ingredient_terms (term_id)
 )
 TABLESPACE pg_default;
 
 ALTER TABLE IF EXISTS menu.dish_ingredients
     OWNER to postgres;
 
+CREATE INDEX IF NOT EXISTS dish_ingredients_ingredient_term_idx
+    ON menu.dish_ingredients (ingredient_term_id);
+CREATE INDEX IF NOT EXISTS dish_ingredients_flavor_ingredient_term_idx
+    ON menu.dish_ingredients (flavor_ingredient_term_id);
+
+-- dish_ingredients with its term ids resolved back to text, under the original column names
+CREATE OR REPLACE VIEW menu.dish_ingredients_named AS
+SELECT d.dish_id, d.ingredient_id, d.quantity, u.term AS units, f.term AS format, t.term AS type,
+       d.ingredient_role, d.flavor_role, d.alternative_ingredients, d.date_added, d.prep_method,
+       i.term AS ingredient, fi.term AS flavor_ingredient
+FROM menu.dish_ingredients d
+LEFT JOIN menu.ingredient_terms i ON i.term_id = d.ingredient_term_id
+LEFT JOIN menu.ingredient_terms fi ON fi.term_id = d.flavor_ingredient_term_id
+LEFT JOIN menu.ingredient_terms f ON f.term_id = d.format_term_id
+LEFT JOIN menu.ingredient_terms u ON u.term_id = d.units_term_id
+LEFT JOIN menu.ingredient_terms t ON t.term_id = d.type_term_id;
+
 -- Table: menu.dish_attributes (Based on recipe.dish_attributes structure)
 -- DROP TABLE IF EXISTS menu.dish_attributes;
 
@@ -211,3 +211,23 @@ class DishModel(BaseModel):
     ingredients: Optional[List[DishIngredient]] = None
     attributes: Optional[DishAttributes] = None
 
+
+
+PACKED_PROMPT_ADDENDUM = """
+PACKED INPUT:
+The message contains several menu items, one per line, each prefixed with its index, e.g. "[3] Name (Category): Description".
+- Extract every item independently, exactly as if it had been sent on its own.
+- Return one entry per input item in `items`, with `index` set to the item's index and `dish` holding its DishModel.
+- Do not merge, skip or reorder items.
+"""
+
+SYSTEM_PROMPT_MENU_EXTRACTION_PACKED = SYSTEM_PROMPT_MENU_EXTRACTION + PACKED_PROMPT_ADDENDUM
+
+
+class PackedMenuItem(BaseModel):
+    index: int
+    dish: DishModel
+
+
+class PackedDishResponse(BaseModel):
+    items: List[PackedMenuItem]
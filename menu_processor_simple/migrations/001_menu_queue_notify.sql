@@ -0,0 +1,34 @@
+-- Migration: wake MenuProcessor workers when menu items are queued
+--
+-- Menu items are loaded into menu.demo_menu_items by the POS/menu imports,
+-- which live outside this repo. So the notification is raised by a trigger
+-- instead of by the loader. Statement-level triggers send one notification
+-- per INSERT/UPDATE statement, not one per row. MenuProcessor LISTENs on
+-- this channel (config.MENU_LLM_CHANNEL) and only falls back to polling
+-- every QUEUE_POLL_FALLBACK_SECONDS.
+
+CREATE OR REPLACE FUNCTION menu.notify_menu_llm_queue()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM new_rows WHERE llm_status = 'pending') THEN
+        PERFORM pg_notify('menu_llm_queue', '');
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS demo_menu_items_notify_insert ON menu.demo_menu_items;
+CREATE TRIGGER demo_menu_items_notify_insert
+    AFTER INSERT ON menu.demo_menu_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION menu.notify_menu_llm_queue();
+
+DROP TRIGGER IF EXISTS demo_menu_items_notify_update ON menu.demo_menu_items;
+CREATE TRIGGER demo_menu_items_notify_update
+    AFTER UPDATE ON menu.demo_menu_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION menu.notify_menu_llm_queue();
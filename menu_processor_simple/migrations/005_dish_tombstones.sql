@@ -0,0 +1,43 @@
+-- Migration: incremental MotherDuck sync
+--
+-- copy_postgres_to_md.py now ships only dishes whose date_modified is past
+-- the watermark stored in MotherDuck's sync_state table, along with their
+-- ingredient and attribute rows. Deleted dishes leave no row to find, so a
+-- statement-level trigger records their ids in menu.dish_tombstones. The
+-- next sync removes them from MotherDuck. Dishes are usually deleted through
+-- the ON DELETE CASCADE from menu.menu_items, and the trigger still fires
+-- for cascaded deletes.
+--
+-- Tombstones older than the last sync are no longer needed. To prune them:
+--   DELETE FROM menu.dish_tombstones WHERE deleted_at < now() - interval '30 days';
+
+CREATE TABLE IF NOT EXISTS menu.dish_tombstones
+(
+    dish_id uuid NOT NULL,
+    deleted_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS dish_tombstones_deleted_at_idx
+    ON menu.dish_tombstones (deleted_at);
+
+-- The incremental sync filters dishes (and their children) on date_modified
+CREATE INDEX IF NOT EXISTS dishes_date_modified_idx
+    ON menu.dishes (date_modified);
+
+CREATE OR REPLACE FUNCTION menu.record_dish_tombstones()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO menu.dish_tombstones (dish_id)
+    SELECT dish_id FROM old_rows;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS dishes_record_tombstones ON menu.dishes;
+CREATE TRIGGER dishes_record_tombstones
+    AFTER DELETE ON menu.dishes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION menu.record_dish_tombstones();
@@ -0,0 +1,18 @@
+-- Migration: back off and eventually fail menu items whose extraction keeps being deferred
+--
+-- Throttling, outages, per-request timeouts and an open circuit used to
+-- leave an item pending with no record of the attempt, so the next pass
+-- picked it straight up again. MenuProcessor now counts every deferral in
+-- llm_deferrals and sets llm_next_attempt_at with an exponential backoff
+-- (config.LLM_DEFERRAL_BACKOFF_SECONDS, doubling up to
+-- LLM_DEFERRAL_BACKOFF_MAX_SECONDS). get_pending_menus skips items until
+-- then, and an item deferred LLM_MAX_DEFERRALS times is marked 'failed'.
+-- Both columns are reset whenever a status is written.
+
+ALTER TABLE menu.demo_menu_items
+    ADD COLUMN IF NOT EXISTS llm_deferrals integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS llm_next_attempt_at timestamp without time zone;
+
+-- To retry items that ran out of deferrals once the endpoint is healthy again:
+--   UPDATE menu.demo_menu_items SET llm_status = 'pending', llm_error_reason = NULL
+--   WHERE llm_status = 'failed' AND llm_error_reason LIKE 'Deferred %';
@@ -1,30 +1,93 @@
 # Updated Menu Processor (openai_menu_processor.py)
+import os
+import re
+import sys
+import json
+import hashlib
 import logging
 import asyncio
-from openai import AsyncAzureOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+import argparse
+import unicodedata
+from pydantic import ValidationError
+from psycopg2.extras import execute_values
 
-from config import AZURE_API_ENDPOINT, AZURE_API_KEY, AZURE_API_VERSION, setup_logging, get_db_connection
-from menu_prompts import SYSTEM_PROMPT_MENU_EXTRACTION, DishModel
+# llm_client, extraction_cache and ingredient_terms live in ../llm_extraction, shared by both pipelines
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import setup_logging, db_connection, QueueListener, MENU_LLM_CHANNEL
+from config import LLM_MAX_DEFERRALS, LLM_DEFERRAL_BACKOFF_SECONDS, LLM_DEFERRAL_BACKOFF_MAX_SECONDS
+from menu_prompts import SYSTEM_PROMPT_MENU_EXTRACTION, SYSTEM_PROMPT_MENU_EXTRACTION_PACKED, DishModel, PackedDishResponse
+from llm_extraction.extraction_cache import ExtractionCache
+from llm_extraction.ingredient_terms import TermCatalog
+from llm_extraction.llm_client import LLMClient, LLMCallError, CONTENT_FILTER, LENGTH_LIMIT, VALIDATION, json_schema_response_format
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def content_hash(rows):
+    """Stable digest of the rows stored for a dish's ingredients or attributes"""
+    return hashlib.sha256(json.dumps(rows, default=str).encode()).hexdigest()
+
+EXTRACTION_MODEL = "gpt-4.1-mini"
+EXTRACTION_MAX_TOKENS = 2000
+# Most completion tokens EXTRACTION_MODEL can return; larger max_tokens values are rejected outright
+EXTRACTION_MODEL_MAX_OUTPUT_TOKENS = 32768
+# Completion budget per item in a packed request
+PACKED_MAX_TOKENS_PER_ITEM = 1000
+MAX_PACK_SIZE = EXTRACTION_MODEL_MAX_OUTPUT_TOKENS // PACKED_MAX_TOKENS_PER_ITEM
+# Pack failures caused by what is in the pack (a truncated or invalid response, a filtered item),
+# which single-item calls can isolate; throttling and outages are not retried item by item
+SPLITTABLE_PACK_ERRORS = {VALIDATION, LENGTH_LIMIT, CONTENT_FILTER}
+
+# Dish columns filled from the menu extraction; the recipe-only ones get defaults in write_dishes
+MENU_FIELDS = [
+    'dish_name', 'description', 'meal_time', 'general_category', 
+    'specific_category', 'cuisine', 'serving_temperature', 
+    'season', 'source'
+]
+
+# Ingredient row positions (dish_id, ingredient, flavor_ingredient, format, prep_method, quantity,
+# units, type, ...) whose text is interned into ingredient_terms
+INTERNED_POSITIONS = (1, 2, 3, 6, 7)
+
+# Punctuation, symbols and underscores all collapse to a single separator
+NON_WORD_RUN = re.compile(r"[\W_]+")
+
+
+def canonical_menu_text(name, description, category):
+    """Normalised "name | category | description" shared by repeated copies of a menu item"""
+    parts = []
+    for value in (name, category, description):
+        value = unicodedata.normalize("NFKC", value or "").casefold()
+        parts.append(" ".join(NON_WORD_RUN.sub(" ", value).split()))
+    return " | ".join(parts)
+
+
 class MenuProcessor:
-    def __init__(self, batch_size=32, max_concurrency=8):
+    def __init__(self, batch_size=32, max_concurrency=8, pack_size=1):
+        if not 1 <= pack_size <= MAX_PACK_SIZE:
+            raise ValueError(f"pack_size must be between 1 and {MAX_PACK_SIZE}, got {pack_size}")
         self.batch_size = batch_size
-        self.semaphore = asyncio.Semaphore(max_concurrency)
-        self.client = AsyncAzureOpenAI(
-            api_key=AZURE_API_KEY, 
-            api_version="2024-12-01-preview", 
-            azure_endpoint="https://locmatic-menu-recipe.openai.azure.com/",
-            timeout=60.0,
+        # Items per request; above 1 the system prompt is shared by a whole pack
+        self.pack_size = pack_size
+        self.packed_response_format = json_schema_response_format(PackedDishResponse)
+        # Routes over the AZURE_OPENAI_DEPLOYMENTS pool (default: the single gpt-4.1-mini deployment).
+        # Each deployment's concurrency starts at max_concurrency and adapts to latency and throttling
+        self.llm = LLMClient.from_env(
+            EXTRACTION_MODEL,
+            initial_concurrency=max_concurrency,
+            max_concurrency=max(max_concurrency, batch_size),
         )
+        self.listener = QueueListener(MENU_LLM_CHANNEL)
+        self.cache = ExtractionCache("menu.llm_extraction_cache", EXTRACTION_MODEL, SYSTEM_PROMPT_MENU_EXTRACTION)
+        # Packed results come from their own prompt, so a change to it only invalidates them
+        self.packed_cache = ExtractionCache("menu.llm_extraction_cache", EXTRACTION_MODEL, SYSTEM_PROMPT_MENU_EXTRACTION_PACKED)
+        self.terms = TermCatalog("menu.ingredient_terms")
 
     def get_pending_menus(self):
         """Get menu items that need extraction"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """SELECT item_id, name, description, category, date_uploaded
@@ -32,6 +95,7 @@ class MenuProcessor:
                        WHERE llm_status = 'pending'
                          AND description IS NOT NULL
                          AND description != ''
+                         AND (llm_next_attempt_at IS NULL OR llm_next_attempt_at <= LOCALTIMESTAMP)
                        ORDER BY date_uploaded DESC LIMIT %s""",
                     (self.batch_size,)
                 )
@@ -39,11 +103,11 @@ class MenuProcessor:
 
     def update_llm_status(self, item_id, status, failure_reason=None):
         """Update LLM processing status"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE menu.demo_menu_items 
-                    SET llm_status = %s, llm_error_reason = %s
+                    SET llm_status = %s, llm_error_reason = %s, llm_deferrals = 0, llm_next_attempt_at = NULL
                     WHERE item_id = %s
                 """, (status, failure_reason, item_id))
                 conn.commit()
@@ -60,180 +124,467 @@ class MenuProcessor:
             return truncated[:last_newline] + "\n[Content truncated for processing]"
         return truncated + "\n[Content truncated for processing]"
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def build_user_content(self, name, description, category):
+        """Format a menu item as "Name (Category): Description", handling missing fields gracefully"""
+        name_part = name or "Unknown Dish"
+        category_part = f" ({category})" if category else ""
+        description_part = f": {description}" if description else ""
+        
+        return self.truncate_content(f"{name_part}{category_part}{description_part}")
+
     async def extract_menu_item(self, menu_data):
-        """Extract structured menu data using OpenAI"""
+        """Extract structured menu data using OpenAI. Returns (item_id, dish, date_uploaded, error)"""
         item_id, name, description, category, date_uploaded = menu_data
         
-        async with self.semaphore:
+        try:
+            content = self.build_user_content(name, description, category)
+            completion = await self.llm.complete(
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT_MENU_EXTRACTION},
+                    {"role": "user", "content": content}
+                ],
+                max_tokens=EXTRACTION_MAX_TOKENS,
+                response_format=DishModel,
+            )
+            message = completion.choices[0].message
+            if message.parsed is None:
+                if message.refusal:
+                    raise LLMCallError(CONTENT_FILTER, f"Model refusal: {message.refusal}")
+                raise LLMCallError(VALIDATION, "Empty structured output")
+            return item_id, message.parsed, date_uploaded, None
+            
+        except LLMCallError as e:
+            # Throttling, outages and an open circuit leave the item pending for a later pass
+            if e.deferrable:
+                logger.warning(f"Extraction deferred for menu item {item_id}: {e}")
+            else:
+                logger.error(f"Extraction failed for menu item {item_id}: {e}")
+            return item_id, None, date_uploaded, e
+
+    async def extract_menu_pack(self, menu_items):
+        """Extract several menu items in one request. Returns (results, items to retry one by one)
+
+        Only unparseable or invalid responses send items to single calls; any
+        other failure becomes every item's result, so a throttled pack stays
+        deferred instead of turning into len(menu_items) more requests.
+        """
+        try:
+            lines = [
+                f"[{index}] {self.build_user_content(item[1], item[2], item[3])}"
+                for index, item in enumerate(menu_items)
+            ]
+            # A JSON schema dict goes through create(), so one invalid item does not discard the pack
+            completion = await self.llm.complete(
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT_MENU_EXTRACTION_PACKED},
+                    {"role": "user", "content": "\n".join(lines)}
+                ],
+                max_tokens=PACKED_MAX_TOKENS_PER_ITEM * len(menu_items),
+                response_format=self.packed_response_format,
+            )
+            entries = json.loads(completion.choices[0].message.content or "{}").get("items") or []
+        except LLMCallError as e:
+            if e.kind in SPLITTABLE_PACK_ERRORS:
+                logger.warning(f"Packed extraction of {len(menu_items)} menu items failed: {e}")
+                return [], list(menu_items)
+            if e.deferrable:
+                logger.warning(f"Packed extraction of {len(menu_items)} menu items deferred: {e}")
+            else:
+                logger.error(f"Packed extraction of {len(menu_items)} menu items failed: {e}")
+            return [(item[0], None, item[4], e) for item in menu_items], []
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Packed extraction of {len(menu_items)} menu items returned unusable output: {e}")
+            return [], list(menu_items)
+        
+        # Map entries back by index; missing, duplicate or invalid entries are retried singly
+        dishes, duplicates = {}, set()
+        for entry in entries:
             try:
-                # Format content as: "Name (Category): Description"
-                # Handle missing fields gracefully
-                name_part = name or "Unknown Dish"
-                category_part = f" ({category})" if category else ""
-                description_part = f": {description}" if description else ""
-                
-                content = f"{name_part}{category_part}{description_part}"
-                content = self.truncate_content(content)
-                
-                completion = await self.client.beta.chat.completions.parse(
-                    model="gpt-4.1-mini",
-                    max_tokens=2000,
-                    temperature=0.0,
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT_MENU_EXTRACTION},
-                        {"role": "user", "content": content}
-                    ],
-                    response_format=DishModel,
-                )
-                
-                return item_id, completion.choices[0].message.parsed, date_uploaded
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Extraction failed for menu item {item_id}: {error_msg}")
-                
-                # Log specific error types for debugging
-                if "content filter" in error_msg.lower():
-                    logger.warning(f"Content filter rejection for item {item_id}")
-                elif "length limit" in error_msg.lower():
-                    logger.warning(f"Token limit exceeded for item {item_id}")
-                elif "validation error" in error_msg.lower():
-                    logger.warning(f"Validation error for item {item_id}: {error_msg}")
-                
-                return item_id, None, date_uploaded
+                index = int(entry["index"])
+                dish = DishModel.model_validate(entry["dish"])
+            except (KeyError, TypeError, ValueError, ValidationError) as e:
+                logger.debug(f"Discarding invalid packed entry: {e}")
+                continue
+            if index in dishes:
+                duplicates.add(index)
+            dishes[index] = dish
+        
+        results, fallback = [], []
+        for index, item in enumerate(menu_items):
+            if index in dishes and index not in duplicates:
+                results.append((item[0], dishes[index], item[4], None))
+            else:
+                fallback.append(item)
+        return results, fallback
+
+    async def extract_menu_items(self, menu_items):
+        """Extract a list of menu items, packed when pack_size > 1, falling back to single-item calls.
+
+        Returns (packed results, single-item results).
+        """
+        if self.pack_size <= 1:
+            return [], await asyncio.gather(*[self.extract_menu_item(item) for item in menu_items], return_exceptions=True)
+        
+        packs = [menu_items[i:i + self.pack_size] for i in range(0, len(menu_items), self.pack_size)]
+        results, fallback = [], []
+        for outcome in await asyncio.gather(*[self.extract_menu_pack(pack) for pack in packs], return_exceptions=True):
+            if isinstance(outcome, tuple):
+                results.extend(outcome[0])
+                fallback.extend(outcome[1])
+            else:
+                logger.error(f"Unexpected packed extraction result: {outcome}")
+        
+        singles = []
+        if fallback:
+            logger.info(f"Retrying {len(fallback)} menu items individually")
+            singles = await asyncio.gather(*[self.extract_menu_item(item) for item in fallback], return_exceptions=True)
+        return results, singles
+
+    def write_dishes(self, cursor, dishes):
+        """Upsert [(item_id, dish, date_uploaded)] with their ingredients and attributes: a few statements per batch, not per row.
+
+        Returns the number of dishes inserted or changed.
+        """
+        # Ingredients and attributes are only rewritten when their content hash changed
+        cursor.execute(
+            "SELECT dish_id::text, ingredients_hash, attributes_hash FROM menu.dishes WHERE dish_id = ANY(%s::uuid[])",
+            ([str(dish[0]) for dish in dishes],)
+        )
+        stored = {row[0]: row[1:] for row in cursor.fetchall()}
+        dish_rows, ingredient_rows, attribute_rows, replaced = [], [], [], []
+        for item_id, dish, date_uploaded in dishes:
+            stored_ingredients_hash, stored_attributes_hash = stored.get(str(item_id), (None, None))
+            # A dish without ingredients or attributes leaves the stored ones (and their hash) in place
+            ingredients_hash, attributes_hash = stored_ingredients_hash, stored_attributes_hash
+            
+            # Save main dish info - handle menu-specific vs recipe-specific fields
+            values = [
+                'menu' if field == 'source' else getattr(dish, field, None)  # Hardcoded source for menu items
+                for field in MENU_FIELDS
+            ]
+            
+            # Add default values for recipe-specific fields not available in menus
+            values.extend([
+                None,  # complexity
+                None,  # star_rating
+                0,     # num_ratings  
+                0,     # num_reviews
+                date_uploaded.date() if date_uploaded else None,  # date_published (from date_uploaded)
+                None   # date_updated
+            ])
+            
+            # Save ingredients - handle fields that may not exist in menu prompts
+            if dish.ingredients:
+                ingredients = []
+                for ingredient in dish.ingredients:
+                    ingredients.append((
+                        getattr(ingredient, 'ingredient', None),
+                        getattr(ingredient, 'flavor_ingredient', None),
+                        getattr(ingredient, 'format', None),
+                        getattr(ingredient, 'prep_method', None),
+                        None,  # quantity - not available in menu prompts
+                        None,  # units - not available in menu prompts
+                        getattr(ingredient, 'type', None),
+                        getattr(ingredient, 'ingredient_role', None),
+                        getattr(ingredient, 'flavor_role', None),
+                        getattr(ingredient, 'alternative_ingredients', None)))
+                ingredients_hash = content_hash(ingredients)
+                if ingredients_hash != stored_ingredients_hash:
+                    replaced.append(item_id)
+                    ingredient_rows.extend((item_id,) + row for row in ingredients)
+            
+            # Save attributes
+            if dish.attributes:
+                attrs = dish.attributes
+                attributes = (attrs.flavor_attributes, attrs.texture_attributes,
+                    attrs.aroma_attributes, attrs.cooking_techniques, attrs.diet_preferences,
+                    attrs.functional_health, attrs.occasions,
+                    attrs.convenience_attributes, attrs.social_setting,
+                    attrs.emotional_attributes)
+                attributes_hash = content_hash(attributes)
+                if attributes_hash != stored_attributes_hash:
+                    attribute_rows.append((item_id,) + attributes)
+            dish_rows.append([item_id] + values + [ingredients_hash, attributes_hash])
+        
+        # Unchanged dishes are left untouched, so date_modified only moves on a real change
+        hashes = ['ingredients_hash', 'attributes_hash']
+        all_fields = MENU_FIELDS + ['complexity', 'star_rating', 'num_ratings', 'num_reviews', 'date_published', 'date_updated'] + hashes
+        tracked = MENU_FIELDS + hashes
+        changed = execute_values(cursor, f"""
+            INSERT INTO menu.dishes AS d (dish_id, {', '.join(all_fields)})
+            VALUES %s
+            ON CONFLICT (dish_id) DO UPDATE SET
+            {', '.join([f'{field} = EXCLUDED.{field}' for field in tracked])},
+            date_modified = CURRENT_TIMESTAMP
+            WHERE ({', '.join([f'd.{field}' for field in tracked])})
+                IS DISTINCT FROM ({', '.join([f'EXCLUDED.{field}' for field in tracked])})
+            RETURNING dish_id
+        """, dish_rows, page_size=len(dish_rows), fetch=True)
+        
+        if replaced:
+            cursor.execute("DELETE FROM menu.dish_ingredients WHERE dish_id = ANY(%s::uuid[])", (replaced,))
+        if ingredient_rows:
+            # ingredient, flavor_ingredient, format, units and type are stored as term ids
+            ingredient_rows = self.terms.intern_rows(cursor, ingredient_rows, INTERNED_POSITIONS)
+            execute_values(cursor, """
+                INSERT INTO menu.dish_ingredients 
+                (dish_id, ingredient_term_id, flavor_ingredient_term_id, format_term_id, prep_method, quantity,
+                units_term_id, type_term_id, ingredient_role, flavor_role, alternative_ingredients)
+                VALUES %s
+            """, ingredient_rows, page_size=len(ingredient_rows))
+        
+        if attribute_rows:
+            execute_values(cursor, """
+                INSERT INTO menu.dish_attributes 
+                (dish_id, flavor_attributes, texture_attributes, aroma_attributes, cooking_techniques,
+                diet_preferences, functional_health, occasions, convenience_attributes,
+                social_setting, emotional_attributes)
+                VALUES %s
+                ON CONFLICT (dish_id) DO UPDATE SET
+                flavor_attributes = EXCLUDED.flavor_attributes,
+                texture_attributes = EXCLUDED.texture_attributes,
+                aroma_attributes = EXCLUDED.aroma_attributes,
+                cooking_techniques = EXCLUDED.cooking_techniques,
+                diet_preferences = EXCLUDED.diet_preferences,
+                functional_health = EXCLUDED.functional_health,
+                occasions = EXCLUDED.occasions,
+                convenience_attributes = EXCLUDED.convenience_attributes,
+                social_setting = EXCLUDED.social_setting,
+                emotional_attributes = EXCLUDED.emotional_attributes
+            """, attribute_rows, page_size=len(attribute_rows))
+        return len(changed)
+
+    def write_statuses(self, cursor, statuses):
+        """Set llm_status for [(item_id, status, failure_reason)] in one statement"""
+        execute_values(
+            cursor,
+            """UPDATE menu.demo_menu_items m
+               SET llm_status = v.status, llm_error_reason = v.reason, llm_deferrals = 0, llm_next_attempt_at = NULL
+               FROM (VALUES %s) AS v(id, status, reason)
+               WHERE m.item_id = v.id::uuid""",
+            statuses,
+            page_size=len(statuses)
+        )
+
+    def write_deferrals(self, cursor, deferrals):
+        """Back off [(item_id, reason)] items left pending. Returns how many ran out of deferrals and failed
+
+        Each deferral doubles the wait before get_pending_menus offers the
+        item again; the LLM_MAX_DEFERRALS-th marks it failed.
+        """
+        given_up = execute_values(
+            cursor,
+            f"""UPDATE menu.demo_menu_items m
+               SET llm_deferrals = m.llm_deferrals + 1,
+                   llm_next_attempt_at = LOCALTIMESTAMP + make_interval(secs => LEAST(
+                       {LLM_DEFERRAL_BACKOFF_SECONDS} * power(2, m.llm_deferrals), {LLM_DEFERRAL_BACKOFF_MAX_SECONDS})),
+                   llm_status = CASE WHEN m.llm_deferrals + 1 >= {LLM_MAX_DEFERRALS} THEN 'failed' ELSE m.llm_status END,
+                   llm_error_reason = CASE WHEN m.llm_deferrals + 1 >= {LLM_MAX_DEFERRALS}
+                       THEN 'Deferred {LLM_MAX_DEFERRALS} times, last: ' || v.reason ELSE v.reason END
+               FROM (VALUES %s) AS v(id, reason)
+               WHERE m.item_id = v.id::uuid
+               RETURNING m.llm_status = 'failed'""",
+            deferrals,
+            page_size=len(deferrals),
+            fetch=True
+        )
+        return sum(1 for (failed,) in given_up if failed)
 
     def save_dish(self, item_id, dish, date_uploaded):
         """Save dish data to menu database"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
-                # Save main dish info - handle menu-specific vs recipe-specific fields
-                menu_fields = [
-                    'dish_name', 'description', 'meal_time', 'general_category', 
-                    'specific_category', 'cuisine', 'serving_temperature', 
-                    'season', 'source'
-                ]
-                values = []
-                for field in menu_fields:
-                    if field == 'source':
-                        values.append('menu')  # Hardcoded source for menu items
-                    else:
-                        values.append(getattr(dish, field, None))
-                
-                # Add default values for recipe-specific fields not available in menus
-                values.extend([
-                    None,  # complexity
-                    None,  # star_rating
-                    0,     # num_ratings  
-                    0,     # num_reviews
-                    date_uploaded.date() if date_uploaded else None,  # date_published (from date_uploaded)
-                    None   # date_updated
-                ])
-                
-                all_fields = menu_fields + ['complexity', 'star_rating', 'num_ratings', 'num_reviews', 'date_published', 'date_updated']
-                
-                cursor.execute(f"""
-                    INSERT INTO menu.dishes (dish_id, {', '.join(all_fields)})
-                    VALUES (%s, {', '.join(['%s'] * len(all_fields))})
-                    ON CONFLICT (dish_id) DO UPDATE SET
-                    {', '.join([f'{field} = EXCLUDED.{field}' for field in menu_fields])},
-                    date_modified = CURRENT_TIMESTAMP
-                """, [item_id] + values)
-                
-                # Save ingredients - handle fields that may not exist in menu prompts
-                if dish.ingredients:
-                    cursor.execute("DELETE FROM menu.dish_ingredients WHERE dish_id = %s", (item_id,))
-                    for ingredient in dish.ingredients:
-                        cursor.execute("""
-                            INSERT INTO menu.dish_ingredients 
-                            (dish_id, ingredient, flavor_ingredient, format, prep_method, quantity, units, type,
-                            ingredient_role, flavor_role, alternative_ingredients)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (item_id, 
-                            getattr(ingredient, 'ingredient', None),
-                            getattr(ingredient, 'flavor_ingredient', None),
-                            getattr(ingredient, 'format', None),
-                            getattr(ingredient, 'prep_method', None),
-                            None,  # quantity - not available in menu prompts
-                            None,  # units - not available in menu prompts
-                            getattr(ingredient, 'type', None),
-                            getattr(ingredient, 'ingredient_role', None),
-                            getattr(ingredient, 'flavor_role', None),
-                            getattr(ingredient, 'alternative_ingredients', None)))
-                
-                # Save attributes
-                if dish.attributes:
-                    attrs = dish.attributes
-                    cursor.execute("""
-                        INSERT INTO menu.dish_attributes 
-                        (dish_id, flavor_attributes, texture_attributes, aroma_attributes, cooking_techniques,
-                        diet_preferences, functional_health, occasions, convenience_attributes,
-                        social_setting, emotional_attributes)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (dish_id) DO UPDATE SET
-                        flavor_attributes = EXCLUDED.flavor_attributes,
-                        texture_attributes = EXCLUDED.texture_attributes,
-                        aroma_attributes = EXCLUDED.aroma_attributes,
-                        cooking_techniques = EXCLUDED.cooking_techniques,
-                        diet_preferences = EXCLUDED.diet_preferences,
-                        functional_health = EXCLUDED.functional_health,
-                        occasions = EXCLUDED.occasions,
-                        convenience_attributes = EXCLUDED.convenience_attributes,
-                        social_setting = EXCLUDED.social_setting,
-                        emotional_attributes = EXCLUDED.emotional_attributes
-                    """, (item_id, attrs.flavor_attributes, attrs.texture_attributes,
-                        attrs.aroma_attributes, attrs.cooking_techniques, attrs.diet_preferences,
-                        attrs.functional_health, attrs.occasions,
-                        attrs.convenience_attributes, attrs.social_setting,
-                        attrs.emotional_attributes))
-                
+                self.write_dishes(cursor, [(item_id, dish, date_uploaded)])
                 conn.commit()
 
-    async def run(self):
-        """Main processing loop"""
-        logger.info("Starting menu extraction")
+    def save_results(self, dishes, statuses, deferrals=()):
+        """Persist a batch in one transaction. Returns the number of dishes saved
+
+        dishes are [(item_id, dish, date_uploaded)] and are marked complete;
+        statuses are (item_id, status, failure_reason) for items without a dish;
+        deferrals are (item_id, reason) for items to retry later. If the
+        batched write fails, items are retried one at a time so a bad dish
+        only fails itself.
+        """
+        if not dishes and not statuses and not deferrals:
+            return 0
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    changed = self.write_dishes(cursor, dishes) if dishes else 0
+                    if dishes or statuses:
+                        self.write_statuses(cursor, [(item_id, 'complete', None) for item_id, _, _ in dishes] + statuses)
+                    given_up = self.write_deferrals(cursor, deferrals) if deferrals else 0
+                    conn.commit()
+            if dishes:
+                logger.info(f"Saved {len(dishes)} dishes ({len(dishes) - changed} unchanged)")
+            if given_up:
+                logger.warning(f"Marked {given_up} menu items failed after {LLM_MAX_DEFERRALS} deferrals")
+            return len(dishes)
+        except Exception as e:
+            logger.warning(f"Batched save of {len(dishes)} dishes failed, saving one at a time: {e}")
         
-        while True:
-            menu_items = self.get_pending_menus()
-            if not menu_items:
-                logger.info("No menu items to process, waiting...")
-                await asyncio.sleep(10)
-                continue
-            
-            logger.info(f"Processing {len(menu_items)} menu items")
-            
-            # Extract all menu items concurrently
-            tasks = [self.extract_menu_item(item) for item in menu_items]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        if deferrals:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    self.write_deferrals(cursor, deferrals)
+                    conn.commit()
+        
+        saved = 0
+        for item_id, dish, date_uploaded in dishes:
+            try:
+                self.save_dish(item_id, dish, date_uploaded)
+                self.update_llm_status(item_id, 'complete')
+                saved += 1
+            except Exception as e:
+                logger.error(f"Failed to save dish {item_id}: {e}")
+                self.update_llm_status(item_id, 'failed', str(e))
+        for item_id, status, failure_reason in statuses:
+            self.update_llm_status(item_id, status, failure_reason)
+        return saved
+
+    def group_duplicates(self, menu_items):
+        """Group a batch by canonical text: {representative item_id: [items sharing its text]}"""
+        by_text = {}
+        for item in menu_items:
+            by_text.setdefault(canonical_menu_text(item[1], item[2], item[3]), []).append(item)
+        return {group[0][0]: group for group in by_text.values()}
+
+    def lookup_cached(self, menu_items):
+        """Split a batch into cache hits [(item_id, dish, date_uploaded)] and items that still need the model.
+
+        Returns (hits, misses, canonical text by item_id) for store_cached.
+        """
+        # Keyed on the canonical text so repeats from other batches also hit
+        texts = {item[0]: canonical_menu_text(item[1], item[2], item[3]) for item in menu_items}
+        
+        hits, misses = [], list(menu_items)
+        # Single-item results first, then packed ones for whatever is still missing
+        for cache in (self.cache, self.packed_cache):
+            if not misses:
+                break
+            cache_keys = {item[0]: cache.key_for(texts[item[0]]) for item in misses}
+            try:
+                cached = cache.get_many(list(cache_keys.values()))
+            except Exception as e:
+                logger.warning(f"Extraction cache lookup failed: {e}")
+                cached = {}
             
-            # Save successful extractions and update status
-            successful = 0
-            failed = 0
-            for result in results:
-                if isinstance(result, tuple) and len(result) == 3:
-                    item_id, dish, date_uploaded = result
+            remaining = []
+            for item in misses:
+                result = cached.get(cache_keys[item[0]])
+                try:
+                    if result is not None:
+                        hits.append((item[0], DishModel.model_validate(result), item[4], None))
+                        continue
+                except ValidationError:
+                    pass  # Stored under an older DishModel; extract again
+                remaining.append(item)
+            misses = remaining
+        return hits, misses, texts
+
+    def store_cached(self, cache, results, texts):
+        """Cache every successful extraction in results under cache's prompt version"""
+        entries = [
+            (cache.key_for(texts[result[0]]), result[1].model_dump(mode='json'))
+            for result in results
+            if isinstance(result, tuple) and len(result) == 4 and result[1]
+        ]
+        try:
+            cache.put_many(entries)
+        except Exception as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+
+    async def process_batch(self):
+        """Extract and save one batch of pending menu items. Returns the number of items taken (0 when the queue is empty)"""
+        menu_items = self.get_pending_menus()
+        if not menu_items:
+            return 0
+
+        # Repeated items (chains, POS exports) are extracted once per canonical text
+        groups = self.group_duplicates(menu_items)
+        representatives = [group[0] for group in groups.values()]
+
+        # Previously seen item text goes straight to save_results
+        results, items_to_extract, texts = self.lookup_cached(representatives)
+        logger.info(f"Processing {len(menu_items)} menu items: {len(representatives)} unique, "
+                    f"{len(results)} from cache")
+
+        # Extract the remaining menu items concurrently
+        packed, extracted = await self.extract_menu_items(items_to_extract)
+        self.store_cached(self.packed_cache, packed, texts)
+        self.store_cached(self.cache, extracted, texts)
+        # Both caches share one table, which eviction trims as a whole
+        self.cache.maybe_evict()
+        results.extend(packed)
+        results.extend(extracted)
+
+        # Save successful extractions and update status, once for every item in the group, in one transaction
+        dishes = []
+        statuses = []
+        deferrals = []
+        failed = 0
+        for result in results:
+            if isinstance(result, tuple) and len(result) == 4:
+                representative_id, dish, _, error = result
+                for item_id, _, _, _, date_uploaded in groups[representative_id]:
                     if dish:
-                        try:
-                            self.save_dish(item_id, dish, date_uploaded)
-                            self.update_llm_status(item_id, 'complete')
-                            successful += 1
-                        except Exception as e:
-                            logger.error(f"Failed to save dish {item_id}: {e}")
-                            self.update_llm_status(item_id, 'failed', str(e))
-                            failed += 1
+                        dishes.append((item_id, dish, date_uploaded))
+                    elif error is not None and error.deferrable:
+                        deferrals.append((item_id, str(error)))
                     else:
-                        self.update_llm_status(item_id, 'failed', 'OpenAI extraction failed')
+                        statuses.append((item_id, 'failed', str(error) if error else 'OpenAI extraction failed'))
                         failed += 1
-                else:
-                    # Handle exceptions from gather
-                    logger.error(f"Unexpected result type: {result}")
-                    failed += 1
-            
-            logger.info(f"Successfully processed {successful}/{len(menu_items)} menu items ({failed} failed)")
+            else:
+                # Handle exceptions from gather
+                logger.error(f"Unexpected result type: {result}")
+                failed += 1
+        successful = self.save_results(dishes, statuses, deferrals)
+        failed += len(dishes) - successful
+
+        logger.info(f"Successfully processed {successful}/{len(menu_items)} menu items "
+                    f"({failed} failed, {len(deferrals)} deferred)")
+        llm_stats = self.llm.stats()
+        logger.info(f"LLM concurrency window: {llm_stats['window']} "
+                    f"({llm_stats['throttled']} throttled responses so far, "
+                    f"retry budget {llm_stats['retry_budget']})")
+        for name, usage in llm_stats['deployments'].items():
+            logger.info(f"Deployment {name}: {usage['requests']} requests, {usage['failures']} failed, "
+                        f"{usage['prompt_tokens'] + usage['completion_tokens']} tokens, "
+                        f"latency {usage['latency_ewma']}s")
+
+        # Don't spin on the deferred items while the endpoint is down or throttling everything
+        if self.llm.all_circuits_open:
+            logger.warning(f"All LLM deployments unavailable, pausing {self.llm.next_probe_in():.0f}s")
+            await asyncio.sleep(self.llm.next_probe_in())
+        elif deferrals and not dishes and not statuses:
+            logger.warning(f"Every extraction in the batch was deferred, pausing {LLM_DEFERRAL_BACKOFF_SECONDS}s")
+            await asyncio.sleep(LLM_DEFERRAL_BACKOFF_SECONDS)
+        return len(menu_items)
+
+    async def run(self):
+        """Main processing loop"""
+        logger.info("Starting menu extraction")
+        # Listen before the first queue check so no enqueue notification is missed
+        try:
+            self.listener.connect()
+        except Exception as e:
+            logger.warning(f"Could not LISTEN on {MENU_LLM_CHANNEL}, falling back to polling: {e}")
+        
+        while True:
+            if not await self.process_batch():
+                logger.info("No menu items to process, waiting for new work...")
+                await self.listener.wait()
 
 
 async def main():
-    processor = MenuProcessor(batch_size=64, max_concurrency=16)
+    parser = argparse.ArgumentParser(description="Extract structured menu data")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Max concurrency")
+    parser.add_argument("--pack-size", type=int, default=1, help=f"Menu items sent per request (1 disables packing, at most {MAX_PACK_SIZE})")
+    args = parser.parse_args()
+    
+    processor = MenuProcessor(args.batch_size, args.max_concurrency, args.pack_size)
     await processor.run()
 
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for openai_menu_processor.canonical_menu_text, the key repeated
+menu items are grouped and cached under.
+
+Copies that differ only in case, Unicode form, punctuation or spacing must
+collapse to the same text; a different name, category or description must not.
+
+No endpoint or database is needed.
+
+Usage:
+    python -m unittest test_canonical_menu_text
+"""
+
+import unittest
+
+from openai_menu_processor import MenuProcessor, canonical_menu_text
+
+
+class CanonicalMenuText(unittest.TestCase):
+
+    def test_layout_is_name_category_description(self):
+        self.assertEqual(
+            canonical_menu_text("Pad Thai", "rice noodles, peanuts", "Mains"),
+            "pad thai | mains | rice noodles peanuts",
+        )
+
+    def test_case_spacing_and_punctuation_do_not_matter(self):
+        self.assertEqual(
+            canonical_menu_text("  PAD   THAI!! ", "Rice noodles; peanuts.", "mains"),
+            canonical_menu_text("pad-thai", "rice_noodles / peanuts", "MAINS"),
+        )
+
+    def test_unicode_forms_and_case_folding(self):
+        # Composed vs decomposed accents, fullwidth letters, German sharp s
+        self.assertEqual(
+            canonical_menu_text("Cr\u00e8me br\u00fbl\u00e9e", None, "\uff24essert"),
+            canonical_menu_text("Cre\u0300me bru\u0302le\u0301e", None, "dessert"),
+        )
+        self.assertEqual(canonical_menu_text("Straße", None, None), canonical_menu_text("STRASSE", None, None))
+
+    def test_missing_fields_are_blank(self):
+        self.assertEqual(canonical_menu_text(None, None, None), " |  | ")
+        self.assertEqual(canonical_menu_text("Fries", "", None), canonical_menu_text("Fries", None, ""))
+
+    def test_fields_are_not_interchangeable(self):
+        self.assertNotEqual(canonical_menu_text("Fries", "Sides", None), canonical_menu_text("Fries", None, "Sides"))
+        self.assertNotEqual(canonical_menu_text("Latte", None, "Hot"), canonical_menu_text("Latte", None, "Iced"))
+
+
+class GroupDuplicates(unittest.TestCase):
+
+    def test_items_sharing_canonical_text_are_grouped_under_the_first(self):
+        items = [
+            ("a", "Pad Thai", "Rice noodles", "Mains", None),
+            ("b", "Latte", None, "Drinks", None),
+            ("c", "PAD THAI", "rice noodles.", "mains", None),
+        ]
+        groups = MenuProcessor.group_duplicates(None, items)
+        self.assertEqual(list(groups), ["a", "b"])
+        self.assertEqual([item[0] for item in groups["a"]], ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,4 @@
+"""PostgreSQL to MotherDuck sync shared by recipe_crawler_simple and menu_processor_simple"""
+
+from .table_mappings import TABLE_MAPPINGS, TableMapping, check_mappings
+from .copier import DataCopier, SyncConfig, main
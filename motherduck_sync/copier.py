@@ -0,0 +1,392 @@
+"""
+PostgreSQL to MotherDuck copier shared by the recipe and menu pipelines
+Each pipeline's copy_postgres_to_md.py describes its schema and DDL files in a SyncConfig and calls main()
+Incremental by default: only dishes changed since the last sync (and deletions) are shipped
+Pages through each table by primary key in batches of COPY_BATCH_SIZE rows (default 1000),
+moving each page as Arrow columns (PostgreSQL COPY -> pyarrow -> DuckDB) rather than Python tuples
+Tables are split into dish_id ranges read over COPY_WORKERS connections (default 4) in parallel
+Column mappings come from table_mappings.py and are checked against the pipeline's DDL files
+config is the calling pipeline's config.py, found on the path of the script being run
+"""
+
+import io
+import os
+import uuid
+import queue
+import threading
+import duckdb
+import logging
+import argparse
+from typing import List, Tuple, Any
+from datetime import timedelta
+import time
+
+from config import acquire_db_connection, release_db_connection, setup_logging, MOTHERDUCK_TOKEN, MD_DATABASE_URL
+from .table_mappings import TABLE_MAPPINGS, check_mappings
+
+# Configure logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Rows per page; each page is one indexed range scan starting after the previous page's last key
+BATCH_SIZE = int(os.getenv("COPY_BATCH_SIZE", 1000))
+# Postgres connections reading dish_id ranges concurrently (drawn from the config.py pool)
+COPY_WORKERS = int(os.getenv("COPY_WORKERS", 4))
+# Ranges per worker and table; more ranges than workers keeps every reader busy to the end
+COPY_RANGES_PER_WORKER = 4
+# Arrow batches read ahead of the MotherDuck writer; readers wait while the queue is full
+COPY_QUEUE_BATCHES = int(os.getenv("COPY_QUEUE_BATCHES", 8))
+
+# Watermarks live in the destination, next to the data they describe
+SYNC_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        name VARCHAR PRIMARY KEY,
+        watermark TIMESTAMP,
+        synced_at TIMESTAMP
+    )
+"""
+# date_modified is the writer's transaction start, so a transaction that commits after a
+# sync can carry an older timestamp; every sync re-reads this far behind the watermark
+SYNC_OVERLAP = timedelta(minutes=int(os.getenv("SYNC_OVERLAP_MINUTES", 15)))
+
+class SyncConfig:
+    """What one pipeline syncs: its PostgreSQL schema and the DDL files the mappings are checked against.
+
+    full_sync_replaces chooses whether a full sync clears the MotherDuck
+    tables first or merges every dish by dish_id into what is there.
+    """
+
+    def __init__(self, schema, postgres_ddl, motherduck_ddl, full_sync_replaces, mappings=TABLE_MAPPINGS):
+        self.schema = schema
+        self.postgres_ddl = postgres_ddl
+        self.motherduck_ddl = motherduck_ddl
+        self.full_sync_replaces = full_sync_replaces
+        self.mappings = mappings
+        # MotherDuck tables kept in sync, each keyed by dish_id
+        self.sync_tables = [mapping.destination for mapping in mappings]
+        self.dishes_watermark = f"{schema}.dishes"
+        self.tombstones_watermark = f"{schema}.dish_tombstones"
+
+
+def dish_id_ranges(count):
+    """Split the uuid space into count [low, high) ranges, None meaning unbounded.
+
+    Dish ids are random or name-based uuids whose leading bytes are uniformly
+    distributed, so equal slices of the space hold about equal row counts.
+    """
+    bounds = [None] + [str(uuid.UUID(int=i * 2**128 // count)) for i in range(1, count)] + [None]
+    return list(zip(bounds, bounds[1:]))
+
+
+class DataCopier:
+    def __init__(self, config, workers=COPY_WORKERS):
+        self.config = config
+        self.pg_conn = None
+        self.duck_conn = None
+        self.workers = max(1, workers)
+        
+    def connect_postgres(self):
+        """Connect to PostgreSQL using config.py"""
+        try:
+            self.pg_conn = acquire_db_connection()
+            logger.info("Connected to PostgreSQL")
+        except Exception as e:
+            logger.error(f"Failed to connect to PostgreSQL: {e}")
+            raise
+            
+    def connect_motherduck(self):
+        """Connect to MotherDuck using config.py"""
+        try:
+            # Use MD_DATABASE_URL if available, otherwise construct from token
+            if MD_DATABASE_URL:
+                self.duck_conn = duckdb.connect(MD_DATABASE_URL)
+            else:
+                self.duck_conn = duckdb.connect(f'md:?motherduck_token={MOTHERDUCK_TOKEN}')
+            logger.info("Connected to MotherDuck")
+        except Exception as e:
+            logger.error(f"Failed to connect to MotherDuck: {e}")
+            raise
+    
+    def iter_batches(self, conn, mapping, where=None, params=()):
+        """Yield pyarrow Tables of the mapping's source columns, in key order, read over conn.
+
+        Pages by keyset, WHERE (keys) > (last row's keys), instead of OFFSET,
+        so every page is an index range scan and a full copy is linear in the
+        table size. Each page is streamed out with COPY ... TO STDOUT (FORMAT
+        csv) and parsed by Arrow's CSV reader straight into typed columns, so
+        no Python object is built per row. where is an optional extra
+        condition on the rows, with its params.
+        """
+        pg_cursor = conn.cursor()
+        order = ', '.join(mapping.keys)
+        placeholders = ', '.join(['%s'] * len(mapping.keys))
+        last = None
+        while True:
+            conditions = [where] if where else []
+            if last is not None:
+                conditions.append(f"({order}) > ({placeholders})")
+            filter_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            # COPY takes no bind parameters, so the page query is rendered client side
+            query = pg_cursor.mogrify(
+                f"SELECT {mapping.select_list} FROM {self.config.schema}.{mapping.source}{filter_sql} ORDER BY {order} LIMIT %s",
+                (*params, *(last or ()), BATCH_SIZE)
+            ).decode()
+            buffer = io.BytesIO()
+            pg_cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", buffer)
+            if not buffer.tell():
+                return
+            buffer.seek(0)
+            batch = mapping.read_csv(buffer)
+            yield batch
+            last = tuple(batch.column(key)[-1].as_py() for key in mapping.keys)
+    
+    def insert_batch(self, target, batch, mapping):
+        """Insert an Arrow batch into a MotherDuck table through the mapping.
+
+        The batch is projected into the destination layout, registered with
+        DuckDB and inserted with a single INSERT ... SELECT, which scans the
+        Arrow buffers directly.
+        """
+        self.duck_conn.register("arrow_batch", mapping.project(batch))
+        try:
+            self.duck_conn.execute(mapping.insert_sql(target, "arrow_batch"))
+        finally:
+            self.duck_conn.unregister("arrow_batch")
+    
+    def copy_tables(self, jobs, snapshot):
+        """Copy every job's rows into its MotherDuck table over self.workers Postgres connections.
+
+        A job is (mapping, target, where, params). Each job is
+        split into dish_id ranges, and reader threads, each on its own pooled
+        connection inside the exported snapshot, page through ranges and put
+        Arrow batches on a bounded queue. This thread drains the queue into
+        MotherDuck, so reading, parsing and writing overlap while at most
+        COPY_QUEUE_BATCHES batches wait in memory.
+        """
+        schema = self.config.schema
+        pg_cursor = self.pg_conn.cursor()
+        totals = []
+        for mapping, target, where, params in jobs:
+            pg_cursor.execute(f"SELECT COUNT(*) FROM {schema}.{mapping.source}{f' WHERE {where}' if where else ''}", params)
+            totals.append(pg_cursor.fetchone()[0])
+            logger.info(f"Total {schema}.{mapping.source} rows to copy into {target}: {totals[-1]}")
+        
+        tasks = queue.Queue()
+        for index, (_, _, where, params) in enumerate(jobs):
+            for low, high in dish_id_ranges(self.workers * COPY_RANGES_PER_WORKER):
+                conditions = [where] if where else []
+                range_params = list(params)
+                if low:
+                    conditions.append("dish_id >= %s")
+                    range_params.append(low)
+                if high:
+                    conditions.append("dish_id < %s")
+                    range_params.append(high)
+                tasks.put((index, ' AND '.join(conditions), tuple(range_params)))
+        
+        batches = queue.Queue(maxsize=COPY_QUEUE_BATCHES)
+        stop = threading.Event()
+        
+        def offer(item):
+            """Queue item for the writer, giving up once the copy is being abandoned"""
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def read():
+            conn = None
+            try:
+                conn = acquire_db_connection()
+                conn.rollback()
+                cursor = conn.cursor()
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                while not stop.is_set():
+                    try:
+                        index, where, params = tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    for batch in self.iter_batches(conn, jobs[index][0], where, params):
+                        if not offer((index, batch)):
+                            return
+            except Exception as e:
+                offer(e)
+            finally:
+                if conn:
+                    conn.rollback()
+                    release_db_connection(conn)
+                offer(None)  # this reader is done
+        
+        readers = [threading.Thread(target=read, name=f"copy-reader-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for reader in readers:
+            reader.start()
+        
+        copied = [0] * len(jobs)
+        running = len(readers)
+        try:
+            while running:
+                item = batches.get()
+                if item is None:
+                    running -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                index, batch = item
+                mapping, target, _, _ = jobs[index]
+                self.insert_batch(target, batch, mapping)
+                copied[index] += batch.num_rows
+                logger.info(f"Copied {copied[index]}/{totals[index]} {schema}.{mapping.source} rows")
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+        
+        for (mapping, _, _, _), count in zip(jobs, copied):
+            logger.info(f"Completed {schema}.{mapping.source} copy: {count} rows")
+    
+    def get_watermark(self, name):
+        """Last synced position stored in MotherDuck for name, or None before the first sync"""
+        self.duck_conn.execute(SYNC_STATE_DDL)
+        row = self.duck_conn.execute("SELECT watermark FROM sync_state WHERE name = ?", [name]).fetchone()
+        return row[0] if row else None
+    
+    def set_watermark(self, name, watermark):
+        self.duck_conn.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES (?, ?, CAST(now() AS TIMESTAMP))", [name, watermark]
+        )
+    
+    def sync(self, full=False):
+        """Ship dishes changed since the last sync, with their child rows, and remove deleted dishes.
+
+        Changed rows are staged in temp tables and merged in one MotherDuck
+        transaction: every staged or deleted dish_id is removed from the three
+        tables and the staged rows are inserted, so re-running a sync is
+        harmless. Child rows ride on dishes.date_modified, which moves whenever
+        a dish's ingredients or attributes change. A full sync (or the first
+        one) stages every dish; unless it replaces the tables outright, it
+        still applies the deletions recorded since the last sync.
+        """
+        config = self.config
+        schema = config.schema
+        dishes_since = None if full else self.get_watermark(config.dishes_watermark)
+        # A merging full sync keeps whatever MotherDuck holds, so dishes deleted since the
+        # last sync still have to be removed before the tombstone watermark moves on
+        replaces = full and config.full_sync_replaces
+        tombstones_since = None if replaces else self.get_watermark(config.tombstones_watermark)
+        
+        # One snapshot for every read, so dishes, children and tombstones agree
+        self.pg_conn.rollback()
+        pg_cursor = self.pg_conn.cursor()
+        pg_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        pg_cursor.execute("SELECT LOCALTIMESTAMP, pg_export_snapshot()")
+        sync_start, snapshot = pg_cursor.fetchone()
+        
+        deleted = []
+        if tombstones_since is not None:
+            pg_cursor.execute(
+                f"SELECT DISTINCT dish_id FROM {schema}.dish_tombstones WHERE deleted_at > %s",
+                (tombstones_since - SYNC_OVERLAP,)
+            )
+            deleted = [(str(row[0]),) for row in pg_cursor.fetchall()]
+        
+        for table in config.sync_tables:
+            self.duck_conn.execute(f"CREATE OR REPLACE TEMP TABLE {table}_stage AS SELECT * FROM {table} LIMIT 0")
+        self.duck_conn.execute("CREATE OR REPLACE TEMP TABLE deleted_dishes (dish_id UUID)")
+        if deleted:
+            self.duck_conn.executemany("INSERT INTO deleted_dishes VALUES (?)", deleted)
+        
+        if dishes_since is None:
+            logger.info("Staging every dish (full sync)")
+            modified, changed, params = None, None, ()
+        else:
+            since = dishes_since - SYNC_OVERLAP
+            logger.info(f"Staging dishes modified since {since} and {len(deleted)} deletions")
+            modified = "date_modified > %s"
+            changed = f"dish_id IN (SELECT dish_id FROM {schema}.dishes WHERE date_modified > %s)"
+            params = (since,)
+        
+        # Newest change in the snapshot: the watermark for the next incremental sync
+        pg_cursor.execute(f"SELECT MAX(date_modified) FROM {schema}.dishes{f' WHERE {modified}' if modified else ''}", params)
+        newest = pg_cursor.fetchone()[0]
+        logger.info(f"Copying with {self.workers} reader connections")
+        self.copy_tables([
+            (mapping, f"{mapping.destination}_stage", modified if mapping.destination == "dishes" else changed, params)
+            for mapping in config.mappings
+        ], snapshot)
+        
+        self.duck_conn.execute("BEGIN TRANSACTION")
+        try:
+            for table in config.sync_tables:
+                if dishes_since is None and config.full_sync_replaces:
+                    self.duck_conn.execute(f"DELETE FROM {table}")
+                else:
+                    self.duck_conn.execute(f"""
+                        DELETE FROM {table} WHERE dish_id IN (
+                            SELECT dish_id FROM {table}_stage
+                            UNION SELECT dish_id FROM dishes_stage
+                            UNION SELECT dish_id FROM deleted_dishes
+                        )
+                    """)
+                self.duck_conn.execute(f"INSERT INTO {table} SELECT * FROM {table}_stage")
+            self.set_watermark(config.dishes_watermark, max(filter(None, [newest, dishes_since]), default=sync_start))
+            self.set_watermark(config.tombstones_watermark, sync_start)
+            self.duck_conn.execute("COMMIT")
+        except Exception:
+            self.duck_conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.pg_conn.rollback()
+        logger.info(f"Merged staged changes and {len(deleted)} deletions into MotherDuck")
+    
+    def run(self, full=False):
+        """Run the complete data copy process"""
+        try:
+            # Fail before touching either database if the mappings and the DDL files have drifted apart
+            config = self.config
+            check_mappings(config.mappings, config.schema, config.postgres_ddl, config.motherduck_ddl)
+            
+            # Connect to databases
+            self.connect_postgres()
+            self.connect_motherduck()
+            
+            start_time = time.time()
+            
+            # Stage and merge dishes, ingredients and attributes
+            self.sync(full)
+            
+            elapsed_time = time.time() - start_time
+            logger.info(f"Data copy completed successfully in {elapsed_time:.2f} seconds")
+            
+        except Exception as e:
+            logger.error(f"Data copy failed: {e}")
+            raise
+        finally:
+            # Close connections
+            if self.pg_conn:
+                release_db_connection(self.pg_conn)
+                logger.info("PostgreSQL connection released")
+            if self.duck_conn:
+                self.duck_conn.close()
+                logger.info("MotherDuck connection closed")
+
+
+def main(config):
+    """Command line entry point for a pipeline's copy_postgres_to_md.py"""
+    parser = argparse.ArgumentParser(description=f"Sync {config.schema} dishes from PostgreSQL to MotherDuck")
+    parser.add_argument("--full", action="store_true",
+                        help="Reload every dish instead of only those changed since the last sync")
+    parser.add_argument("--workers", type=int, default=COPY_WORKERS,
+                        help="Postgres connections reading dish_id ranges in parallel")
+    args = parser.parse_args()
+    
+    mode = "replace" if config.full_sync_replaces else "merge"
+    logger.info(f"Starting PostgreSQL to MotherDuck data copy of {config.schema} ({mode} mode for full syncs)...")
+    logger.info("Using configuration from config.py")
+    
+    copier = DataCopier(config, args.workers)
+    copier.run(args.full)
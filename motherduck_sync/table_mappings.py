@@ -0,0 +1,194 @@
+import re
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+# PostgreSQL varchar[] columns; they travel as JSON text and DuckDB parses them back into lists
+PG_ARRAY = pa.list_(pa.string())
+
+
+class TableMapping:
+    """How one PostgreSQL relation is copied into one MotherDuck table.
+
+    columns lists (PostgreSQL column or None for NULL, MotherDuck column,
+    Arrow type in transit) in MotherDuck column order. Everything derived
+    from the spec (the SELECT list, the CSV reader options and the DuckDB
+    INSERT) is built once here, so each batch costs one read_csv, one
+    Table assembly and one INSERT ... SELECT.
+    """
+
+    def __init__(self, source, destination, keys, columns):
+        self.source = source              # relation inside the PostgreSQL schema
+        self.destination = destination    # MotherDuck table
+        self.keys = keys                  # unique, indexed paging key; dish_id first
+        self.columns = columns
+
+        self.source_types = {column: arrow_type for column, _, arrow_type in columns if column}
+        self.select_list = ', '.join(
+            f"array_to_json({column}) AS {column}" if arrow_type == PG_ARRAY else column
+            for column, arrow_type in self.source_types.items()
+        )
+        self.read_options = pa_csv.ReadOptions(column_names=list(self.source_types))
+        self.parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+        self.convert_options = pa_csv.ConvertOptions(
+            column_types={column: pa.string() if arrow_type == PG_ARRAY else arrow_type
+                          for column, arrow_type in self.source_types.items()},
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False  # COPY writes NULL bare and '' quoted
+        )
+        self.names = [name for _, name, _ in columns]
+        self.insert_list = ', '.join(f'"{name}"' for name in self.names)
+        self.insert_select = ', '.join(
+            f"from_json(\"{name}\", '[\"VARCHAR\"]')" if column and arrow_type == PG_ARRAY else f'"{name}"'
+            for column, name, arrow_type in columns
+        )
+
+    def read_csv(self, buffer):
+        """Arrow Table of the source columns from a COPY ... (FORMAT csv) of select_list"""
+        return pa_csv.read_csv(buffer, read_options=self.read_options, parse_options=self.parse_options,
+                               convert_options=self.convert_options)
+
+    def project(self, batch):
+        """batch laid out as the MotherDuck table: renamed, reordered and NULL-filled, without copying the data"""
+        return pa.table(
+            [batch.column(column) if column else pa.nulls(batch.num_rows, arrow_type)
+             for column, _, arrow_type in self.columns],
+            names=self.names
+        )
+
+    def insert_sql(self, target, view):
+        """INSERT of a registered projection (view) into target, a table shaped like the destination"""
+        return f"INSERT INTO {target} ({self.insert_list}) SELECT {self.insert_select} FROM {view}"
+
+
+# Tables kept in sync, each keyed by dish_id; dishes first so its changes drive the children's
+TABLE_MAPPINGS = [
+    TableMapping("dishes", "dishes", ["dish_id"], [
+        ("dish_id", "dish_id", pa.string()),
+        ("dish_name", "dish_name", pa.string()),
+        ("description", "description", pa.string()),
+        (None, "dish_base_type", pa.string()),
+        ("meal_time", "meal_time", pa.string()),
+        (None, "food_format", pa.string()),
+        ("general_category", "general_category", pa.string()),
+        ("specific_category", "specific_category", pa.string()),
+        ("cuisine", "cuisine", pa.string()),
+        (None, "country", pa.string()),
+        ("complexity", "complexity", pa.string()),
+        ("serving_temperature", "serving_temperature", pa.string()),
+        ("season", "season", pa.string()),
+        ("source", "source", pa.string()),
+        ("date_updated", "date_updated", pa.date32()),
+        ("date_published", "date_published", pa.date32()),
+        ("date_created", "date_created", pa.timestamp("us")),
+        ("date_modified", "date_modified", pa.timestamp("us")),
+        ("star_rating", "star_rating", pa.decimal128(3, 2)),
+        ("num_ratings", "num_ratings", pa.int32()),
+        ("num_reviews", "num_reviews", pa.int32()),
+    ]),
+    # The view resolves the ingredient_terms ids back to text
+    TableMapping("dish_ingredients_named", "dish_ingredients", ["dish_id", "ingredient_id"], [
+        ("dish_id", "dish_id", pa.string()),
+        ("ingredient_id", "ingredient_id", pa.int32()),
+        ("flavor_ingredient", "name", pa.string()),
+        ("ingredient", "full_ingredient", pa.string()),
+        ("quantity", "quantity", pa.decimal128(18, 3)),
+        ("units", "units", pa.string()),
+        ("format", "format", pa.string()),
+        ("type", "type", pa.string()),
+        ("ingredient_role", "ingredient_role", pa.string()),
+        ("prep_method", "cooking_technique", pa.string()),
+        ("flavor_role", "flavor_role", pa.string()),
+        ("alternative_ingredients", "alternatives", PG_ARRAY),
+        (None, "flavor_notes", PG_ARRAY),
+        ("date_added", "date_added", pa.timestamp("us")),
+    ]),
+    TableMapping("dish_attributes", "dish_attributes", ["dish_id"], [
+        ("dish_id", "dish_id", pa.string()),
+        ("flavor_attributes", "flavor_attributes", PG_ARRAY),
+        ("texture_attributes", "texture_attributes", PG_ARRAY),
+        ("aroma_attributes", "aroma_attributes", PG_ARRAY),
+        ("cooking_techniques", "cooking_techniques", PG_ARRAY),
+        ("diet_preferences", "diet_preferences", PG_ARRAY),
+        ("functional_health", "functional_health", PG_ARRAY),
+        ("occasions", "occasions", PG_ARRAY),
+        ("convenience_attributes", "convenience_attributes", PG_ARRAY),
+        ("social_setting", "social_setting", PG_ARRAY),
+        ("emotional_attributes", "emotional_attributes", PG_ARRAY),
+    ]),
+]
+
+
+def split_top_level(text):
+    """Split text on the commas that are not inside parentheses"""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def ddl_columns(path):
+    """{relation: {column: (type, not_null)}} for the CREATE TABLE and CREATE VIEW statements in a DDL file.
+
+    View columns get (None, False): their types aren't spelled out in the file.
+    """
+    with open(path) as f:
+        ddl = re.sub(r"--[^\n]*", "", f.read())
+    relations = {}
+    for name, body in re.findall(r"CREATE TABLE(?: IF NOT EXISTS)?\s+([\w.]+)\s*\((.*?)\n\s*\)", ddl, re.S):
+        columns = {}
+        for entry in split_top_level(body):
+            column, _, definition = entry.partition(' ')
+            if column.upper() in ("CONSTRAINT", "PRIMARY", "FOREIGN", "UNIQUE", "CHECK"):
+                continue
+            definition = definition.strip()
+            column_type = re.split(r"\s+(?:COLLATE|DEFAULT|NOT|NULL|PRIMARY)\b", definition)[0]
+            columns[column.strip('"')] = (column_type, "NOT NULL" in definition.upper())
+        relations[name] = columns
+    for name, select in re.findall(r"CREATE (?:OR REPLACE )?VIEW\s+([\w.]+)\s+AS\s+SELECT\s+(.*?)\s+FROM\s", ddl, re.S):
+        relations[name] = {re.split(r"[\s.]", item)[-1].strip('"'): (None, False)
+                           for item in split_top_level(select)}
+    return relations
+
+
+def check_mappings(mappings, schema, postgres_ddl, motherduck_ddl):
+    """Raise ValueError listing every place a mapping disagrees with the DDL files"""
+    postgres = ddl_columns(postgres_ddl)
+    motherduck = ddl_columns(motherduck_ddl)
+    problems = []
+    for mapping in mappings:
+        relation = f"{schema}.{mapping.source}"
+        source = postgres.get(relation)
+        destination = motherduck.get(mapping.destination)
+        if source is None:
+            problems.append(f"{relation} is not defined in {postgres_ddl}")
+        if destination is None:
+            problems.append(f"{mapping.destination} is not defined in {motherduck_ddl}")
+        if source is None or destination is None:
+            continue
+
+        for key in mapping.keys:
+            if key not in mapping.source_types:
+                problems.append(f"{relation}: paging key {key} is not copied")
+        for column, name, arrow_type in mapping.columns:
+            is_array = arrow_type == PG_ARRAY
+            if column:
+                if column not in source:
+                    problems.append(f"{relation}.{column} does not exist")
+                elif source[column][0] is not None and source[column][0].endswith("[]") != is_array:
+                    problems.append(f"{relation}.{column} is {source[column][0]} but mapped as {arrow_type}")
+            if name not in destination:
+                problems.append(f"{mapping.destination}.{name} does not exist")
+                continue
+            if destination[name][0].endswith("[]") != is_array:
+                problems.append(f"{mapping.destination}.{name} is {destination[name][0]} but mapped as {arrow_type}")
+            if column is None and destination[name][1]:
+                problems.append(f"{mapping.destination}.{name} is NOT NULL but mapped to NULL")
+    if problems:
+        raise ValueError("Column mappings don't match the DDL:\n  " + "\n  ".join(problems))
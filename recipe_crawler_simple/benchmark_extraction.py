@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for RecipeExtractor.
+
+Seeds synthetic pending recipes into a local Postgres, drains them through
+RecipeExtractor.process_batch against the mock OpenAI server, and reports
+items/sec, p50/p99 LLM call latency and the time spent in database reads
+and writes. Seeded rows (and their dishes and cache entries) are removed
+afterwards unless --keep is given.
+
+Run against a scratch database: process_batch takes every pending row, not
+only the seeded ones.
+
+Usage:
+    python mock_openai_server.py --latency-median 1.5 --throttle-rate 0.02 &
+    AZURE_OPENAI_DEPLOYMENTS='[{"name": "mock", "endpoint": "http://localhost:8089/", "deployment": "gpt-4.1-mini"}]' \\
+        python benchmark_extraction.py --items 2000 --batch-size 64 --max-concurrency 32
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from collections import defaultdict
+from psycopg2.extras import execute_values
+
+from config import setup_logging, db_connection
+from utils import url_id_for
+from openai_recipe_processor import RecipeExtractor
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+BENCHMARK_URL_PREFIX = "https://benchmark.invalid/recipes/"
+
+# Extractor methods that spend their time in the database
+DB_METHODS = ["get_pending_recipes", "screen_recipes", "lookup_cached", "store_cached", "save_results"]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Timings:
+    """Wall-clock samples of instance methods, keyed by method name"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, obj, name):
+        method = getattr(obj, name)
+        samples = self.samples[name]
+        if asyncio.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - started)
+        else:
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    samples.append(time.perf_counter() - started)
+        setattr(obj, name, timed)
+
+    def total(self, names):
+        return sum(sum(self.samples[name]) for name in names)
+
+
+def synthetic_recipe(index):
+    """(url, title, description, parsed_text) unique per index so nothing hits the extraction cache"""
+    title = f"Benchmark Skillet Pasta No. {index}"
+    text = "\n".join([
+        title,
+        "A weeknight pasta used to load-test the extraction pipeline. " * 6,
+        "Ingredients",
+        "200 g spaghetti",
+        "2 tbsp olive oil",
+        f"{index % 5 + 2} cloves garlic",
+        "1 cup cherry tomatoes",
+        "½ tsp chili flakes",
+        "Instructions",
+        "1. Boil the pasta in salted water.",
+        "2. Fry the garlic in the oil, add the tomatoes and chili.",
+        "3. Toss with the pasta and serve.",
+    ])
+    return f"{BENCHMARK_URL_PREFIX}{index}", title, "Benchmark recipe", text
+
+
+def seed(count):
+    """Insert count pending recipes with crawled pages"""
+    now = datetime.utcnow()
+    recipes = [synthetic_recipe(index) for index in range(count)]
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                """INSERT INTO recipe.recipe_urls
+                   (id, original_url, url, is_recipe, crawl_status, llm_status, last_crawled)
+                   VALUES %s ON CONFLICT (id) DO NOTHING""",
+                [(url_id_for(url), url, url, True, 'complete', 'pending', now) for url, _, _, _ in recipes]
+            )
+            execute_values(
+                cursor,
+                """INSERT INTO recipe.recipe_pages (url_id, title, description, parsed_text)
+                   VALUES %s ON CONFLICT (url_id) DO NOTHING""",
+                [(url_id_for(url), title, description, text) for url, title, description, text in recipes]
+            )
+            conn.commit()
+    return recipes
+
+
+def cleanup(extractor, recipes):
+    """Remove seeded rows (dishes and pages cascade) and their cache entries"""
+    keys = [extractor.cache.key_for(extractor.build_user_content(text, title, description))
+            for _, title, description, text in recipes]
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {extractor.cache.table} WHERE cache_key = ANY(%s)", (keys,))
+            cursor.execute("DELETE FROM recipe.recipe_urls WHERE url LIKE %s", (BENCHMARK_URL_PREFIX + '%',))
+            conn.commit()
+
+
+def count_statuses():
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT llm_status, count(*) FROM recipe.recipe_urls WHERE url LIKE %s GROUP BY llm_status",
+                (BENCHMARK_URL_PREFIX + '%',)
+            )
+            return dict(cursor.fetchall())
+
+
+async def benchmark(args):
+    extractor = RecipeExtractor(args.batch_size, args.max_concurrency, compact_schema=args.compact_schema)
+    recipes = seed(args.items)
+    logger.info(f"Seeded {len(recipes)} pending recipes")
+
+    timings = Timings()
+    timings.wrap(extractor.llm, "complete")
+    for name in DB_METHODS:
+        timings.wrap(extractor, name)
+
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < args.max_seconds:
+            if not await extractor.process_batch():
+                break
+        elapsed = time.perf_counter() - started
+        statuses = count_statuses()
+    finally:
+        if not args.keep:
+            cleanup(extractor, recipes)
+
+    done = sum(count for status, count in statuses.items() if status != 'pending')
+    latencies = timings.samples["complete"]
+    db_seconds = timings.total(DB_METHODS)
+    logger.info(f"{done}/{len(recipes)} recipes in {elapsed:.1f}s: {done / elapsed:.1f} items/sec "
+                f"(statuses {statuses})")
+    logger.info(f"LLM calls: {len(latencies)}, p50 {percentile(latencies, 0.5):.2f}s, "
+                f"p99 {percentile(latencies, 0.99):.2f}s")
+    logger.info(f"DB time: {db_seconds:.1f}s total ({db_seconds / elapsed:.0%} of wall time), "
+                f"save_results {timings.total(['save_results']) / max(done, 1) * 1000:.1f} ms/item")
+    for name in DB_METHODS:
+        samples = timings.samples[name]
+        if samples:
+            logger.info(f"  {name}: {len(samples)} calls, {sum(samples):.2f}s, p99 {percentile(samples, 0.99) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RecipeExtractor against a local Postgres and mock LLM")
+    parser.add_argument("--items", type=int, default=1000, help="Synthetic recipes to seed")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Initial LLM concurrency per deployment")
+    parser.add_argument("--compact-schema", action="store_true", help="Use the short-key response schema")
+    parser.add_argument("--max-seconds", type=float, default=600, help="Stop after this long even if rows remain")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows and results")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
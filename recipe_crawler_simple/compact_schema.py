@@ -0,0 +1,161 @@
+# Compact wire format for recipe extraction (compact_schema.py)
+#
+# Structured output spends most of its tokens repeating field names such as
+# "alternative_ingredients" for every ingredient. The compact models below
+# carry the same fields under short keys, with enum fields as integer codes.
+# expand_dish() turns a compact response back into the regular DishModel, so
+# nothing downstream of the client changes.
+from enum import IntEnum
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+
+from recipe_prompts import (
+    SYSTEM_PROMPT_RECIPE_EXTRACTION, DishModel, MealTime, GeneralCategory, Season, Complexity,
+    ServingTemperature, IngredientRole, FlavorRole, PhysicalFormat,
+)
+
+# Short key -> DishModel / DishIngredient / DishAttributes field
+DISH_KEYS = {
+    "n": "dish_name", "d": "description", "mt": "meal_time", "gc": "general_category",
+    "sc": "specific_category", "cu": "cuisine", "cx": "complexity", "st": "serving_temperature",
+    "se": "season", "sr": "star_rating", "nr": "num_ratings", "nv": "num_reviews",
+    "dp": "date_published", "du": "date_updated", "i": "ingredients", "a": "attributes",
+}
+INGREDIENT_KEYS = {
+    "n": "ingredient", "f": "flavor_ingredient", "fm": "format", "p": "prep_method",
+    "q": "quantity", "u": "units", "t": "type", "r": "ingredient_role", "fr": "flavor_role",
+    "alt": "alternative_ingredients",
+}
+ATTRIBUTE_KEYS = {
+    "fl": "flavor_attributes", "tx": "texture_attributes", "ar": "aroma_attributes",
+    "ct": "cooking_techniques", "dt": "diet_preferences", "fh": "functional_health",
+    "oc": "occasions", "cv": "convenience_attributes", "ss": "social_setting",
+    "em": "emotional_attributes",
+}
+
+# Fields sent as integer codes, numbered in enum declaration order from 1
+CODED_FIELDS = {
+    "meal_time": MealTime, "general_category": GeneralCategory, "complexity": Complexity,
+    "serving_temperature": ServingTemperature, "season": Season, "format": PhysicalFormat,
+    "ingredient_role": IngredientRole, "flavor_role": FlavorRole,
+}
+
+
+def code_enum(enum):
+    """Integer-coded twin of a string enum"""
+    return IntEnum(f"{enum.__name__}Code", {member.name: index for index, member in enumerate(enum, 1)})
+
+
+MealTimeCode = code_enum(MealTime)
+GeneralCategoryCode = code_enum(GeneralCategory)
+ComplexityCode = code_enum(Complexity)
+ServingTemperatureCode = code_enum(ServingTemperature)
+SeasonCode = code_enum(Season)
+PhysicalFormatCode = code_enum(PhysicalFormat)
+IngredientRoleCode = code_enum(IngredientRole)
+FlavorRoleCode = code_enum(FlavorRole)
+
+
+class CompactIngredient(BaseModel):
+    n: str
+    f: str
+    fm: Optional[PhysicalFormatCode] = None
+    p: Optional[str] = None
+    q: Optional[float] = None
+    u: Optional[str] = None
+    t: Optional[str] = None
+    r: Optional[IngredientRoleCode] = None
+    fr: Optional[FlavorRoleCode] = None
+    alt: Optional[List[str]] = None
+
+
+class CompactAttributes(BaseModel):
+    fl: Optional[List[str]] = None
+    tx: Optional[List[str]] = None
+    ar: Optional[List[str]] = None
+    ct: Optional[List[str]] = None
+    dt: Optional[List[str]] = None
+    fh: Optional[List[str]] = None
+    oc: Optional[List[str]] = None
+    cv: Optional[List[str]] = None
+    ss: Optional[List[str]] = None
+    em: Optional[List[str]] = None
+
+
+class CompactDish(BaseModel):
+    n: str
+    d: Optional[str] = None
+    mt: Optional[MealTimeCode] = None
+    gc: Optional[GeneralCategoryCode] = None
+    sc: Optional[str] = None
+    cu: Optional[str] = None
+    cx: Optional[ComplexityCode] = None
+    st: Optional[ServingTemperatureCode] = None
+    se: Optional[SeasonCode] = None
+    sr: Optional[float] = None
+    nr: Optional[int] = None
+    nv: Optional[int] = None
+    dp: Optional[date] = None
+    du: Optional[date] = None
+    i: Optional[List[CompactIngredient]] = None
+    a: Optional[CompactAttributes] = None
+
+
+def _legend():
+    """Prompt section mapping the short keys and codes back to the field definitions above it"""
+    lines = [
+        "",
+        "COMPACT OUTPUT FORMAT:",
+        "Return the fields described above under these short keys:",
+        "- dish: " + ", ".join(f"{short}={field}" for short, field in DISH_KEYS.items()),
+        "- each ingredient (i): " + ", ".join(f"{short}={field}" for short, field in INGREDIENT_KEYS.items()),
+        "- attributes (a): " + ", ".join(f"{short}={field}" for short, field in ATTRIBUTE_KEYS.items()),
+        "Enumerated fields are integer codes:",
+    ]
+    for field, enum in CODED_FIELDS.items():
+        lines.append(f"- {field}: " + ", ".join(f"{index}={member.value}" for index, member in enumerate(enum, 1)))
+    return "\n".join(lines) + "\n"
+
+
+SYSTEM_PROMPT_RECIPE_EXTRACTION_COMPACT = SYSTEM_PROMPT_RECIPE_EXTRACTION + _legend()
+
+
+def _expand(data, keys):
+    expanded = {}
+    for short, value in data.items():
+        field = keys[short]
+        if field in CODED_FIELDS and value is not None:
+            value = list(CODED_FIELDS[field])[int(value) - 1]
+        expanded[field] = value
+    return expanded
+
+
+def _compact(data, keys):
+    compacted = {}
+    for short, field in keys.items():
+        value = data.get(field)
+        if field in CODED_FIELDS and value is not None:
+            value = list(CODED_FIELDS[field]).index(CODED_FIELDS[field](value)) + 1
+        compacted[short] = value
+    return compacted
+
+
+def expand_dish(compact):
+    """CompactDish -> DishModel"""
+    data = _expand(compact.model_dump(), DISH_KEYS)
+    if data.get("ingredients"):
+        data["ingredients"] = [_expand(ingredient, INGREDIENT_KEYS) for ingredient in data["ingredients"]]
+    if data.get("attributes"):
+        data["attributes"] = _expand(data["attributes"], ATTRIBUTE_KEYS)
+    return DishModel.model_validate(data)
+
+
+def compact_dish(dish):
+    """DishModel -> CompactDish (the inverse of expand_dish)"""
+    data = _compact(dish.model_dump(mode="json"), DISH_KEYS)
+    if data.get("i"):
+        data["i"] = [_compact(ingredient, INGREDIENT_KEYS) for ingredient in data["i"]]
+    if data.get("a"):
+        data["a"] = _compact(data["a"], ATTRIBUTE_KEYS)
+    return CompactDish.model_validate(data)
@@ -1,7 +1,12 @@
 from dotenv import load_dotenv
 import os
 import logging
+import time
+import asyncio
+import threading
 import psycopg2
+import psycopg2.pool
+import psycopg2.extensions
 import asyncpg
 from contextlib import contextmanager
 
@@ -32,14 +37,193 @@ MD_DATABASE_URL = os.getenv("MD_DATABASE_URL")
 # Database URL (Make sure it's PostgreSQL if using psycopg2)
 DB_URL = os.getenv("DB_URL")
 
-def get_db_connection():
-    """Create a synchronous database connection using psycopg2"""
-    # Replace with your actual connection details from config
-    conn = psycopg2.connect(
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# Connections idle in the pool longer than this are pinged before reuse
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", 30))
+
+_db_pool = None
+_db_pool_slots = None
+_db_pool_lock = threading.Lock()
+_db_pool_idle_since = {}
+
+
+def _db_connect_kwargs():
+    return dict(
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER", "postgres"),
         password=os.getenv("DB_PASSWORD"),
         host=os.getenv("DB_HOST"),
         port=os.getenv("DB_PORT", 5432),
     )
-    return conn
\ No newline at end of file
+
+
+def get_db_connection():
+    """Create a dedicated (unpooled) synchronous database connection using psycopg2"""
+    return psycopg2.connect(**_db_connect_kwargs())
+
+
+def get_db_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _db_pool, _db_pool_slots
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, **_db_connect_kwargs()
+                )
+                # The pool raises when exhausted; the semaphore makes callers wait instead
+                _db_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+    return _db_pool
+
+
+def _is_connection_healthy(conn):
+    """Cheap liveness check for a connection that has been idle in the pool"""
+    if conn.closed:
+        return False
+    idle_since = _db_pool_idle_since.get(id(conn))
+    if idle_since is not None and time.monotonic() - idle_since < DB_POOL_HEALTH_CHECK_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def acquire_db_connection():
+    """Check a healthy connection out of the pool. Pair with release_db_connection()"""
+    pool = get_db_pool()
+    _db_pool_slots.acquire()
+    try:
+        # After a server restart every idle connection may be dead; once they are all
+        # discarded the pool opens a fresh one
+        for _ in range(DB_POOL_MAX_SIZE + 1):
+            conn = pool.getconn()
+            healthy = _is_connection_healthy(conn)
+            _db_pool_idle_since.pop(id(conn), None)
+            if healthy:
+                return conn
+            logging.getLogger(__name__).warning("Discarding broken pooled database connection")
+            pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection available from the pool")
+    except Exception:
+        _db_pool_slots.release()
+        raise
+
+
+def release_db_connection(conn, close=False):
+    """Return a connection to the pool, rolling back any open transaction"""
+    try:
+        if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+            conn.rollback()
+    except psycopg2.Error:
+        close = True
+    close = close or bool(conn.closed)
+    if not close:
+        _db_pool_idle_since[id(conn)] = time.monotonic()
+    get_db_pool().putconn(conn, close=close)
+    _db_pool_slots.release()
+
+
+@contextmanager
+def db_connection():
+    """Pooled connection context manager: commits on success, rolls back on error"""
+    conn = acquire_db_connection()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        # Rolls back whatever is still open. Only a connection that is actually closed is
+        # discarded; one that hit a deadlock or a cancelled statement goes back to the pool
+        release_db_connection(conn)
+
+
+def close_db_pool():
+    """Close every pooled connection (call on shutdown)"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+            _db_pool_idle_since.clear()
+
+
+# LISTEN/NOTIFY channels that wake the queue workers when work is enqueued
+RECIPE_CRAWL_CHANNEL = "recipe_crawl_queue"
+RECIPE_LLM_CHANNEL = "recipe_llm_queue"
+MENU_LLM_CHANNEL = "menu_llm_queue"
+# Workers still re-check their queue this often in case a notification was missed
+QUEUE_POLL_FALLBACK_SECONDS = float(os.getenv("QUEUE_POLL_FALLBACK_SECONDS", 60))
+
+# Rows whose extraction is deferred (throttling, outages, timeouts) wait LLM_DEFERRAL_BACKOFF_SECONDS,
+# doubling per deferral up to LLM_DEFERRAL_BACKOFF_MAX_SECONDS, and fail after LLM_MAX_DEFERRALS
+LLM_MAX_DEFERRALS = int(os.getenv("LLM_MAX_DEFERRALS", 8))
+LLM_DEFERRAL_BACKOFF_SECONDS = int(os.getenv("LLM_DEFERRAL_BACKOFF_SECONDS", 30))
+LLM_DEFERRAL_BACKOFF_MAX_SECONDS = int(os.getenv("LLM_DEFERRAL_BACKOFF_MAX_SECONDS", 3600))
+
+
+def notify_channel(cursor, channel, payload=""):
+    """Queue a notification; Postgres delivers it when the surrounding transaction commits"""
+    cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+
+class QueueListener:
+    """Blocks an asyncio worker until a channel is notified, with a polling fallback"""
+
+    def __init__(self, *channels):
+        self.channels = channels
+        self.conn = None
+
+    def connect(self):
+        """Open the dedicated LISTEN connection (pooled connections cannot hold a LISTEN)"""
+        if self.conn is not None and not self.conn.closed:
+            return
+        self.conn = get_db_connection()
+        self.conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cursor:
+            for channel in self.channels:
+                cursor.execute(f"LISTEN {channel}")
+
+    def _drain(self):
+        self.conn.poll()
+        notified = bool(self.conn.notifies)
+        self.conn.notifies.clear()
+        return notified
+
+    async def wait(self, timeout=QUEUE_POLL_FALLBACK_SECONDS):
+        """Return True when notified, False when the fallback timeout elapsed"""
+        try:
+            self.connect()
+            if self._drain():
+                return True
+        except psycopg2.Error as e:
+            logging.getLogger(__name__).warning(f"LISTEN connection unavailable, polling instead: {e}")
+            self.close()
+            await asyncio.sleep(timeout)
+            return False
+
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fileno = self.conn.fileno()
+        loop.add_reader(fileno, readable.set)
+        try:
+            await asyncio.wait_for(readable.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fileno)
+
+        try:
+            return self._drain()
+        except psycopg2.Error:
+            self.close()
+            return False
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = None
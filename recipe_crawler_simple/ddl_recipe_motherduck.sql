@@ -3,6 +3,7 @@
 -- DROP TABLE IF EXISTS dish_ingredients;
 -- DROP TABLE IF EXISTS dishes;
 
+-- Column mappings from PostgreSQL live in ../motherduck_sync/table_mappings.py, which checks them against this file
 -- Recreate dishes table without constraints
 CREATE TABLE dishes(
   dish_id UUID,
@@ -17,11 +18,12 @@ CREATE TABLE dishes(
   country VARCHAR,
   complexity VARCHAR,
   serving_temperature VARCHAR,
-  cooking_technique VARCHAR[],
   season VARCHAR,
   source VARCHAR,
-  date_created TIMESTAMP DEFAULT(CURRENT_TIMESTAMP),
   date_updated TIMESTAMP DEFAULT(CURRENT_TIMESTAMP),
+  date_published DATE,
+  date_created TIMESTAMP DEFAULT(CURRENT_TIMESTAMP),
+  date_modified TIMESTAMP DEFAULT(CURRENT_TIMESTAMP),
   star_rating DECIMAL(3,2),
   num_ratings INTEGER DEFAULT(0),
   num_reviews INTEGER DEFAULT(0)
@@ -51,10 +53,18 @@ CREATE TABLE dish_attributes(
   flavor_attributes VARCHAR[],
   texture_attributes VARCHAR[],
   aroma_attributes VARCHAR[],
+  cooking_techniques VARCHAR[],
   diet_preferences VARCHAR[],
   functional_health VARCHAR[],
   occasions VARCHAR[],
   convenience_attributes VARCHAR[],
   social_setting VARCHAR[],
   emotional_attributes VARCHAR[]
-);
\ No newline at end of file
+);
+
+-- Sync watermarks written by copy_postgres_to_md.py (created on first run if missing)
+CREATE TABLE IF NOT EXISTS sync_state(
+  "name" VARCHAR PRIMARY KEY,
+  watermark TIMESTAMP,
+  synced_at TIMESTAMP
+);
@@ -20,6 +20,8 @@ CREATE TABLE IF NOT EXISTS recipe.dishes
     num_reviews integer DEFAULT 0,
     date_published date,
     date_updated date,
+    ingredients_hash character varying COLLATE pg_catalog."default",
+    attributes_hash character varying COLLATE pg_catalog."default",
     CONSTRAINT dishes_pkey PRIMARY KEY (dish_id),
     CONSTRAINT dishes_dish_id_fkey FOREIGN KEY (dish_id)
         REFERENCES recipe.recipe_urls (id) MATCH SIMPLE
@@ -30,6 +32,54 @@ TABLESPACE pg_default;
 ALTER TABLE IF EXISTS recipe.dishes
     OWNER to postgres;
 
+CREATE INDEX IF NOT EXISTS dishes_date_modified_idx
+    ON recipe.dishes (date_modified);
+
+-- Table: recipe.dish_tombstones (deleted dish ids for the incremental MotherDuck sync)
+-- DROP TABLE IF EXISTS recipe.dish_tombstones;
+CREATE TABLE IF NOT EXISTS recipe.dish_tombstones
+(
+    dish_id uuid NOT NULL,
+    deleted_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+TABLESPACE pg_default;
+ALTER TABLE IF EXISTS recipe.dish_tombstones
+    OWNER to postgres;
+
+CREATE INDEX IF NOT EXISTS dish_tombstones_deleted_at_idx
+    ON recipe.dish_tombstones (deleted_at);
+
+CREATE OR REPLACE FUNCTION recipe.record_dish_tombstones()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO recipe.dish_tombstones (dish_id)
+    SELECT dish_id FROM old_rows;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS dishes_record_tombstones ON recipe.dishes;
+CREATE TRIGGER dishes_record_tombstones
+    AFTER DELETE ON recipe.dishes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recipe.record_dish_tombstones();
+
+-- Table: recipe.ingredient_terms (dictionary behind the dish_ingredients *_term_id columns, see ../llm_extraction/ingredient_terms.py)
+-- DROP TABLE IF EXISTS recipe.ingredient_terms;
+CREATE TABLE IF NOT EXISTS recipe.ingredient_terms
+(
+    term_id serial NOT NULL,
+    term character varying COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT ingredient_terms_pkey PRIMARY KEY (term_id),
+    CONSTRAINT ingredient_terms_term_key UNIQUE (term)
+)
+TABLESPACE pg_default;
+ALTER TABLE IF EXISTS recipe.ingredient_terms
+    OWNER to postgres;
+
 -- Table: recipe.dish_ingredients
 
 -- DROP TABLE IF EXISTS recipe.dish_ingredients;
@@ -39,21 +89,31 @@ CREATE TABLE IF NOT EXISTS recipe.dish_ingredients
     dish_id uuid NOT NULL,
     ingredient_id integer NOT NULL DEFAULT nextval('recipe.dish_ingredients_ingredient_id_seq'::regclass),
     quantity numeric(18,3),
-    units character varying COLLATE pg_catalog."default",
-    format character varying COLLATE pg_catalog."default",
-    type character varying COLLATE pg_catalog."default",
     ingredient_role character varying COLLATE pg_catalog."default",
     flavor_role character varying COLLATE pg_catalog."default",
     alternative_ingredients character varying[] COLLATE pg_catalog."default",
     date_added timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
     prep_method character varying COLLATE pg_catalog."default",
-    ingredient character varying COLLATE pg_catalog."default",
-    flavor_ingredient character varying COLLATE pg_catalog."default",
+    ingredient_term_id integer,
+    flavor_ingredient_term_id integer,
+    format_term_id integer,
+    units_term_id integer,
+    type_term_id integer,
     CONSTRAINT dish_ingredients_pkey PRIMARY KEY (dish_id, ingredient_id),
     CONSTRAINT dish_ingredients_dish_id_fkey FOREIGN KEY (dish_id)
         REFERENCES recipe.dishes (dish_id) MATCH SIMPLE
         ON UPDATE NO ACTION
-        ON DELETE CASCADE
+        ON DELETE CASCADE,
+    CONSTRAINT dish_ingredients_ingredient_term_id_fkey FOREIGN KEY (ingredient_term_id)
+        REFERENCES recipe.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_flavor_ingredient_term_id_fkey FOREIGN KEY (flavor_ingredient_term_id)
+        REFERENCES recipe.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_format_term_id_fkey FOREIGN KEY (format_term_id)
+        REFERENCES recipe.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_units_term_id_fkey FOREIGN KEY (units_term_id)
+        REFERENCES recipe.ingredient_terms (term_id),
+    CONSTRAINT dish_ingredients_type_term_id_fkey FOREIGN KEY (type_term_id)
+        REFERENCES recipe.ingredient_terms (term_id)
 )
 
 TABLESPACE pg_default;
@@ -61,6 +121,23 @@ TABLESPACE pg_default;
 ALTER TABLE IF EXISTS recipe.dish_ingredients
     OWNER to postgres;
 
+CREATE INDEX IF NOT EXISTS dish_ingredients_ingredient_term_idx
+    ON recipe.dish_ingredients (ingredient_term_id);
+CREATE INDEX IF NOT EXISTS dish_ingredients_flavor_ingredient_term_idx
+    ON recipe.dish_ingredients (flavor_ingredient_term_id);
+
+-- dish_ingredients with its term ids resolved back to text, under the original column names
+CREATE OR REPLACE VIEW recipe.dish_ingredients_named AS
+SELECT d.dish_id, d.ingredient_id, d.quantity, u.term AS units, f.term AS format, t.term AS type,
+       d.ingredient_role, d.flavor_role, d.alternative_ingredients, d.date_added, d.prep_method,
+       i.term AS ingredient, fi.term AS flavor_ingredient
+FROM recipe.dish_ingredients d
+LEFT JOIN recipe.ingredient_terms i ON i.term_id = d.ingredient_term_id
+LEFT JOIN recipe.ingredient_terms fi ON fi.term_id = d.flavor_ingredient_term_id
+LEFT JOIN recipe.ingredient_terms f ON f.term_id = d.format_term_id
+LEFT JOIN recipe.ingredient_terms u ON u.term_id = d.units_term_id
+LEFT JOIN recipe.ingredient_terms t ON t.term_id = d.type_term_id;
+
 -- Table: recipe.dish_attributes
 -- DROP TABLE IF EXISTS recipe.dish_attributes;
 CREATE TABLE IF NOT EXISTS recipe.dish_attributes
@@ -84,4 +161,26 @@ CREATE TABLE IF NOT EXISTS recipe.dish_attributes
 )
 TABLESPACE pg_default;
 ALTER TABLE IF EXISTS recipe.dish_attributes
-    OWNER to postgres;
\ No newline at end of file
+    OWNER to postgres;
+
+-- Table: recipe.recipe_pages
+-- Page content kept out of the recipe.recipe_urls queue table (see migrations/001_recipe_pages.sql)
+-- DROP TABLE IF EXISTS recipe.recipe_pages;
+CREATE TABLE IF NOT EXISTS recipe.recipe_pages
+(
+    url_id uuid NOT NULL,
+    title character varying COLLATE pg_catalog."default",
+    description character varying COLLATE pg_catalog."default",
+    parsed_text text COLLATE pg_catalog."default",
+    html_path character varying COLLATE pg_catalog."default",
+    has_recipe_jsonld boolean,
+    date_modified timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT recipe_pages_pkey PRIMARY KEY (url_id),
+    CONSTRAINT recipe_pages_url_id_fkey FOREIGN KEY (url_id)
+        REFERENCES recipe.recipe_urls (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)
+TABLESPACE pg_default;
+ALTER TABLE IF EXISTS recipe.recipe_pages
+    OWNER to postgres;
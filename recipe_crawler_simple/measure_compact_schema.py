@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Measure what the compact response schema saves per recipe.
+
+Offline (default): re-encodes cached extraction results in both wire formats
+and compares their estimated output tokens, checking that every result
+round-trips losslessly through compact_dish/expand_dish.
+
+Live (--live): extracts the same pending recipes with both schemas and
+compares the completion tokens reported by the API and the call latency.
+Nothing is written to the database.
+
+Usage:
+    python measure_compact_schema.py --limit 500
+    python measure_compact_schema.py --live --limit 20
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from statistics import mean
+
+# llm_client, extraction_cache and ingredient_terms live in ../llm_extraction, shared by both pipelines
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import setup_logging, db_connection
+from recipe_prompts import DishModel
+from compact_schema import CompactDish, compact_dish, expand_dish
+from recipe_prefilter import prefilter_recipe
+from llm_extraction.llm_client import CHARS_PER_TOKEN
+from openai_recipe_processor import RecipeExtractor, EXTRACTION_MAX_TOKENS
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def wire_tokens(model):
+    """Estimated output tokens for a model instance as the API would emit it"""
+    return len(model.model_dump_json(exclude_none=False)) / CHARS_PER_TOKEN
+
+
+def measure_offline(limit):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT result FROM recipe.llm_extraction_cache ORDER BY last_used_at DESC LIMIT %s",
+                (limit,)
+            )
+            rows = [row[0] for row in cursor.fetchall()]
+
+    full_tokens, compact_tokens, mismatches = [], [], 0
+    for result in rows:
+        dish = DishModel.model_validate(result if isinstance(result, dict) else json.loads(result))
+        compact = compact_dish(dish)
+        if expand_dish(compact) != dish:
+            mismatches += 1
+        full_tokens.append(wire_tokens(dish))
+        compact_tokens.append(wire_tokens(compact))
+
+    if not rows:
+        logger.info("No cached results to measure")
+        return
+    saved = mean(full_tokens) - mean(compact_tokens)
+    logger.info(f"{len(rows)} cached recipes: ~{mean(full_tokens):.0f} output tokens full, "
+                f"~{mean(compact_tokens):.0f} compact, ~{saved:.0f} saved per recipe "
+                f"({saved / mean(full_tokens):.0%}); {mismatches} round-trip mismatches")
+
+
+async def timed_extraction(extractor, recipe):
+    """(completion tokens, latency seconds, dish) for one recipe, or None on failure"""
+    url_id, text, title, description = recipe
+    started = time.monotonic()
+    try:
+        completion = await extractor.llm.complete(
+            messages=[
+                {"role": "system", "content": extractor.system_prompt},
+                {"role": "user", "content": extractor.build_user_content(text, title, description)}
+            ],
+            max_tokens=EXTRACTION_MAX_TOKENS,
+            response_format=CompactDish if extractor.compact_schema else DishModel,
+        )
+    except Exception as e:
+        logger.warning(f"Extraction of {url_id} failed: {e}")
+        return None
+    parsed = completion.choices[0].message.parsed
+    dish = expand_dish(parsed) if extractor.compact_schema else parsed
+    return completion.usage.completion_tokens, time.monotonic() - started, dish
+
+
+async def measure_live(limit):
+    full = RecipeExtractor(batch_size=limit)
+    compact = RecipeExtractor(batch_size=limit, compact_schema=True)
+    # Same prefilter as the extractor, without marking anything skipped
+    recipes = [
+        row[:4] for row in full.get_pending_recipes()
+        if prefilter_recipe(row[4], row[2], row[1], row[5])[0]
+    ]
+
+    samples = []
+    for recipe in recipes:
+        # Sequential so the two calls see the same endpoint load
+        full_result = await timed_extraction(full, recipe)
+        compact_result = await timed_extraction(compact, recipe)
+        if full_result and compact_result:
+            samples.append((full_result, compact_result))
+
+    if not samples:
+        logger.info("No recipes measured")
+        return
+    full_tokens = mean(s[0][0] for s in samples)
+    compact_tokens = mean(s[1][0] for s in samples)
+    full_latency = mean(s[0][1] for s in samples)
+    compact_latency = mean(s[1][1] for s in samples)
+    same_ingredients = sum(
+        len(s[0][2].ingredients or []) == len(s[1][2].ingredients or []) for s in samples
+    )
+    logger.info(f"{len(samples)} recipes: {full_tokens:.0f} -> {compact_tokens:.0f} completion tokens "
+                f"({full_tokens - compact_tokens:.0f} saved per recipe), "
+                f"{full_latency:.2f}s -> {compact_latency:.2f}s latency "
+                f"({full_latency - compact_latency:.2f}s saved per recipe); "
+                f"ingredient counts agree on {same_ingredients}/{len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure output tokens and latency saved by the compact schema")
+    parser.add_argument("--limit", type=int, default=200, help="Recipes to measure")
+    parser.add_argument("--live", action="store_true", help="Call the model with both schemas (costs tokens)")
+    args = parser.parse_args()
+
+    if args.live:
+        asyncio.run(measure_live(args.limit))
+    else:
+        measure_offline(args.limit)
+
+
+if __name__ == "__main__":
+    main()
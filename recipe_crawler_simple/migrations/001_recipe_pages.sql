@@ -0,0 +1,101 @@
+-- Migration: move page content out of recipe.recipe_urls into recipe.recipe_pages
+--
+-- recipe_urls is the crawl/LLM work queue. Its status columns are updated
+-- constantly, and every UPDATE rewrites the whole row version. Keeping the
+-- large parsed_text blobs on the same row makes each status flip copy them
+-- and bloats the table the queue scans run against. After this migration
+-- recipe_urls only holds narrow queue columns. Page content lives in
+-- recipe_pages, which is written once per crawl.
+--
+-- Run inside a maintenance window. The final VACUUM FULL takes an exclusive
+-- lock on recipe_urls while it rewrites the table.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS recipe.recipe_pages
+(
+    url_id uuid NOT NULL,
+    title character varying COLLATE pg_catalog."default",
+    description character varying COLLATE pg_catalog."default",
+    parsed_text text COLLATE pg_catalog."default",
+    html_path character varying COLLATE pg_catalog."default",
+    date_modified timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT recipe_pages_pkey PRIMARY KEY (url_id),
+    CONSTRAINT recipe_pages_url_id_fkey FOREIGN KEY (url_id)
+        REFERENCES recipe.recipe_urls (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)
+TABLESPACE pg_default;
+
+ALTER TABLE IF EXISTS recipe.recipe_pages
+    OWNER to postgres;
+
+-- Backfill existing content. The crawler wrote page_title / page_description;
+-- older tables (archived/create_tables.sql) have title / description instead,
+-- and some have both. Use whichever of them exist, preferring the page_ ones.
+DO $$
+DECLARE
+    title_columns text[];
+    description_columns text[];
+    title_expr text;
+    description_expr text;
+BEGIN
+    SELECT array_agg(quote_ident(column_name) ORDER BY column_name = 'title')
+      INTO title_columns
+      FROM information_schema.columns
+     WHERE table_schema = 'recipe' AND table_name = 'recipe_urls'
+       AND column_name IN ('page_title', 'title');
+
+    SELECT array_agg(quote_ident(column_name) ORDER BY column_name = 'description')
+      INTO description_columns
+      FROM information_schema.columns
+     WHERE table_schema = 'recipe' AND table_name = 'recipe_urls'
+       AND column_name IN ('page_description', 'description');
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+         WHERE table_schema = 'recipe' AND table_name = 'recipe_urls' AND column_name = 'parsed_text'
+    ) THEN
+        RETURN;  -- already migrated
+    END IF;
+
+    title_expr := COALESCE('COALESCE(' || array_to_string(title_columns, ', ') || ', NULL)', 'NULL');
+    description_expr := COALESCE('COALESCE(' || array_to_string(description_columns, ', ') || ', NULL)', 'NULL');
+
+    EXECUTE format(
+        'INSERT INTO recipe.recipe_pages (url_id, title, description, parsed_text)
+         SELECT id, %1$s, %2$s, parsed_text
+         FROM recipe.recipe_urls
+         WHERE parsed_text IS NOT NULL
+            OR %1$s IS NOT NULL
+            OR %2$s IS NOT NULL
+         ON CONFLICT (url_id) DO NOTHING',
+        title_expr, description_expr
+    );
+END
+$$;
+
+ALTER TABLE recipe.recipe_urls
+    DROP COLUMN IF EXISTS parsed_text,
+    DROP COLUMN IF EXISTS page_title,
+    DROP COLUMN IF EXISTS page_description,
+    DROP COLUMN IF EXISTS title,
+    DROP COLUMN IF EXISTS description;
+
+-- Leave free space on each page so status updates can be HOT updates
+ALTER TABLE recipe.recipe_urls SET (fillfactor = 85);
+
+-- Narrow partial indexes for the two queue scans
+CREATE INDEX IF NOT EXISTS recipe_urls_crawl_pending_idx
+    ON recipe.recipe_urls (id)
+    WHERE crawl_status = 'pending';
+
+CREATE INDEX IF NOT EXISTS recipe_urls_llm_pending_idx
+    ON recipe.recipe_urls (last_crawled DESC)
+    WHERE llm_status = 'pending' AND is_recipe IS TRUE AND crawl_status = 'complete';
+
+COMMIT;
+
+-- Reclaim the space the dropped columns still occupy
+VACUUM (FULL, ANALYZE) recipe.recipe_urls;
@@ -0,0 +1,124 @@
+-- Migration: hash-partition recipe.recipe_urls
+--
+-- recipe_urls grows by millions of rows with every sitemap refresh. The
+-- global UNIQUE (url) index and the status scans get slower as it grows,
+-- and vacuuming one huge heap gets more expensive.
+--
+-- A partitioned table can only enforce uniqueness on columns that include
+-- the partition key. So the row id is made a pure function of the
+-- normalized url: uuid_generate_v5(uuid_ns_url(), url), which is the same
+-- value as uuid.uuid5(uuid.NAMESPACE_URL, url) in Python (utils.url_id_for).
+-- Partitioning by HASH (id) is then partitioning on a hash of the url:
+--   * PRIMARY KEY (id) enforces url uniqueness, so ingestion uses ON CONFLICT (id)
+--   * every UPDATE ... WHERE id = %s is pruned to a single partition
+--   * foreign keys from recipe.dishes and recipe.recipe_pages stay valid
+--
+-- Existing rows get new ids. Child tables are remapped in the same
+-- transaction. Run a full MotherDuck refresh afterwards so the dish_ids
+-- there match.
+--
+-- Keep RECIPE_URL_PARTITIONS in utils.py in sync with the modulus below.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE TEMP TABLE recipe_url_id_map ON COMMIT DROP AS
+SELECT id AS old_id, uuid_generate_v5(uuid_ns_url(), url) AS new_id
+FROM recipe.recipe_urls;
+
+CREATE UNIQUE INDEX ON recipe_url_id_map (old_id);
+ANALYZE recipe_url_id_map;
+
+-- Detach children, then move them to the url-derived ids
+ALTER TABLE recipe.dish_ingredients DROP CONSTRAINT IF EXISTS dish_ingredients_dish_id_fkey;
+ALTER TABLE recipe.dish_attributes DROP CONSTRAINT IF EXISTS dish_attributes_dish_id_fkey;
+ALTER TABLE recipe.dishes DROP CONSTRAINT IF EXISTS dishes_dish_id_fkey;
+ALTER TABLE recipe.recipe_pages DROP CONSTRAINT IF EXISTS recipe_pages_url_id_fkey;
+
+UPDATE recipe.dishes t SET dish_id = m.new_id
+FROM recipe_url_id_map m WHERE t.dish_id = m.old_id;
+
+UPDATE recipe.dish_ingredients t SET dish_id = m.new_id
+FROM recipe_url_id_map m WHERE t.dish_id = m.old_id;
+
+UPDATE recipe.dish_attributes t SET dish_id = m.new_id
+FROM recipe_url_id_map m WHERE t.dish_id = m.old_id;
+
+UPDATE recipe.recipe_pages t SET url_id = m.new_id
+FROM recipe_url_id_map m WHERE t.url_id = m.old_id;
+
+-- Partitioned replacement table
+CREATE TABLE recipe.recipe_urls_partitioned
+    (LIKE recipe.recipe_urls INCLUDING DEFAULTS INCLUDING GENERATED)
+    PARTITION BY HASH (id);
+
+-- The copied random-uuid default would mint ids that are not derived from the
+-- url, so duplicate urls could slip past PRIMARY KEY (id). Writers must pass
+-- utils.url_id_for(url); an insert without an id now fails on NOT NULL.
+ALTER TABLE recipe.recipe_urls_partitioned ALTER COLUMN id DROP DEFAULT;
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE recipe.%I PARTITION OF recipe.recipe_urls_partitioned
+                 FOR VALUES WITH (MODULUS 16, REMAINDER %s) WITH (fillfactor = 85)',
+            'recipe_urls_p' || lpad(i::text, 2, '0'), i);
+    END LOOP;
+END $$;
+
+-- Copy rows under their new ids (column list built from the live table)
+DO $$
+DECLARE
+    cols text;
+    src_cols text;
+BEGIN
+    SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position),
+           string_agg('u.' || quote_ident(column_name), ', ' ORDER BY ordinal_position)
+    INTO cols, src_cols
+    FROM information_schema.columns
+    WHERE table_schema = 'recipe' AND table_name = 'recipe_urls' AND column_name <> 'id';
+
+    EXECUTE format(
+        'INSERT INTO recipe.recipe_urls_partitioned (id, %s)
+         SELECT m.new_id, %s
+         FROM recipe.recipe_urls u JOIN recipe_url_id_map m ON m.old_id = u.id',
+        cols, src_cols);
+END $$;
+
+ALTER TABLE recipe.recipe_urls RENAME TO recipe_urls_unpartitioned;
+ALTER TABLE recipe.recipe_urls_partitioned RENAME TO recipe_urls;
+
+-- Indexes are declared once on the parent and created on every partition
+ALTER TABLE recipe.recipe_urls ADD CONSTRAINT recipe_urls_part_pkey PRIMARY KEY (id);
+
+CREATE INDEX recipe_urls_part_site_id_idx ON recipe.recipe_urls (site_id);
+
+CREATE INDEX recipe_urls_part_crawl_pending_idx
+    ON recipe.recipe_urls (id)
+    WHERE crawl_status = 'pending';
+
+CREATE INDEX recipe_urls_part_llm_pending_idx
+    ON recipe.recipe_urls (last_crawled DESC)
+    WHERE llm_status = 'pending' AND is_recipe IS TRUE AND crawl_status = 'complete';
+
+-- Reattach children to the partitioned table
+ALTER TABLE recipe.dishes ADD CONSTRAINT dishes_dish_id_fkey FOREIGN KEY (dish_id)
+    REFERENCES recipe.recipe_urls (id) MATCH SIMPLE ON UPDATE NO ACTION ON DELETE CASCADE;
+
+ALTER TABLE recipe.dish_ingredients ADD CONSTRAINT dish_ingredients_dish_id_fkey FOREIGN KEY (dish_id)
+    REFERENCES recipe.dishes (dish_id) MATCH SIMPLE ON UPDATE NO ACTION ON DELETE CASCADE;
+
+ALTER TABLE recipe.dish_attributes ADD CONSTRAINT dish_attributes_dish_id_fkey FOREIGN KEY (dish_id)
+    REFERENCES recipe.dishes (dish_id) MATCH SIMPLE ON UPDATE NO ACTION ON DELETE CASCADE;
+
+ALTER TABLE recipe.recipe_pages ADD CONSTRAINT recipe_pages_url_id_fkey FOREIGN KEY (url_id)
+    REFERENCES recipe.recipe_urls (id) MATCH SIMPLE ON UPDATE NO ACTION ON DELETE CASCADE;
+
+COMMIT;
+
+ANALYZE recipe.recipe_urls;
+
+-- After verifying the new table:
+-- DROP TABLE recipe.recipe_urls_unpartitioned;
@@ -0,0 +1,19 @@
+-- Migration: serve the crawl queue by expected recipe yield instead of at random
+--
+-- crawl_priority (0-100) is computed at ingest time by utils.score_crawl_priority.
+-- It combines three signals: sitemap lastmod, recipe signals in the URL
+-- path, and the site's historical is_recipe hit rate. ContentProcessor
+-- takes pending rows in crawl_priority order. randnum is no longer written.
+--
+-- Existing pending rows start at 0. Score them with:
+--   python sitemap_processor.py --rescore
+
+ALTER TABLE recipe.recipe_urls
+    ADD COLUMN IF NOT EXISTS crawl_priority smallint NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS sitemap_lastmod timestamp with time zone;
+
+-- Replaces the unordered pending index: the queue scan reads it top-down
+DROP INDEX IF EXISTS recipe.recipe_urls_part_crawl_pending_idx;
+CREATE INDEX IF NOT EXISTS recipe_urls_crawl_priority_idx
+    ON recipe.recipe_urls (crawl_priority DESC)
+    WHERE crawl_status = 'pending';
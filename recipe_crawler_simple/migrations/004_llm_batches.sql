@@ -0,0 +1,36 @@
+-- Migration: bookkeeping for the Azure OpenAI Batch API execution mode
+--
+-- openai_recipe_batch_processor.py claims pending recipes by setting
+-- llm_status = 'batched' and pointing llm_batch_id at a row here. It does
+-- this before anything is uploaded. A crash at any point can then be
+-- resumed: the remote batch is matched back through its submission_id
+-- metadata, or the claimed rows are released back to 'pending'. Results
+-- are only applied to rows still claimed by the same submission, so
+-- applying an output file twice is harmless.
+
+CREATE TABLE IF NOT EXISTS recipe.llm_batches
+(
+    submission_id uuid NOT NULL,
+    batch_id character varying COLLATE pg_catalog."default",
+    input_file_id character varying COLLATE pg_catalog."default",
+    output_file_id character varying COLLATE pg_catalog."default",
+    error_file_id character varying COLLATE pg_catalog."default",
+    status character varying COLLATE pg_catalog."default" NOT NULL DEFAULT 'claimed',
+    num_requests integer NOT NULL DEFAULT 0,
+    num_succeeded integer NOT NULL DEFAULT 0,
+    num_failed integer NOT NULL DEFAULT 0,
+    date_created timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    date_completed timestamp without time zone,
+    CONSTRAINT llm_batches_pkey PRIMARY KEY (submission_id)
+)
+TABLESPACE pg_default;
+
+ALTER TABLE IF EXISTS recipe.llm_batches
+    OWNER to postgres;
+
+ALTER TABLE recipe.recipe_urls
+    ADD COLUMN IF NOT EXISTS llm_batch_id uuid;
+
+CREATE INDEX IF NOT EXISTS recipe_urls_llm_batch_idx
+    ON recipe.recipe_urls (llm_batch_id)
+    WHERE llm_status = 'batched';
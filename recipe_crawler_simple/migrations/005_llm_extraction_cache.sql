@@ -0,0 +1,24 @@
+-- Migration: persistent LLM extraction cache (see extraction_cache.py)
+--
+-- Maps a hash of (model, system prompt version, truncated user content) to
+-- the validated DishModel JSON. Entries are evicted by age (date_created)
+-- and by least recent use (last_used_at).
+
+CREATE TABLE IF NOT EXISTS recipe.llm_extraction_cache
+(
+    cache_key character(64) NOT NULL,
+    model character varying COLLATE pg_catalog."default" NOT NULL,
+    prompt_version character varying COLLATE pg_catalog."default" NOT NULL,
+    result jsonb NOT NULL,
+    hit_count integer NOT NULL DEFAULT 0,
+    date_created timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    last_used_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT llm_extraction_cache_pkey PRIMARY KEY (cache_key)
+)
+TABLESPACE pg_default;
+
+ALTER TABLE IF EXISTS recipe.llm_extraction_cache
+    OWNER to postgres;
+
+CREATE INDEX IF NOT EXISTS llm_extraction_cache_last_used_idx
+    ON recipe.llm_extraction_cache (last_used_at DESC);
@@ -0,0 +1,17 @@
+-- Migration: local prefilter before LLM extraction (see recipe_prefilter.py)
+--
+-- The crawler now records whether a page embeds schema.org Recipe JSON-LD.
+-- RecipeExtractor and the batch processor pass every pending page through
+-- prefilter_recipe before calling the model. Rejected pages get
+-- llm_status = 'skipped', and llm_failure_reason names the prefilter stage
+-- that rejected them, e.g. 'prefilter: roundup'.
+--
+-- Pages crawled before this migration have has_recipe_jsonld NULL. For
+-- those the cascade falls back to its text-only stages.
+
+ALTER TABLE recipe.recipe_pages
+    ADD COLUMN IF NOT EXISTS has_recipe_jsonld boolean;
+
+-- To send skipped pages back to the model after a prefilter change:
+--   UPDATE recipe.recipe_urls SET llm_status = 'pending', llm_failure_reason = NULL
+--   WHERE llm_status = 'skipped' AND llm_failure_reason LIKE 'prefilter:%';
@@ -0,0 +1,15 @@
+-- Migration: change-detecting dish upserts
+--
+-- RecipeExtractor stores a sha256 of each dish's ingredient rows and of its
+-- attribute row. A re-extraction whose ingredients hash to the stored value
+-- skips the DELETE/INSERT of recipe.dish_ingredients, and the same applies
+-- to attributes. The dishes upsert only updates a row when a column or hash
+-- actually differs, so date_modified moves only on a real change and
+-- incremental syncs keyed on it carry genuine changes only.
+--
+-- Existing dishes have NULL hashes. Each one is rewritten once on its next
+-- extraction, and its hashes are filled in then.
+
+ALTER TABLE recipe.dishes
+    ADD COLUMN IF NOT EXISTS ingredients_hash character varying,
+    ADD COLUMN IF NOT EXISTS attributes_hash character varying;
@@ -0,0 +1,73 @@
+-- Migration: interned ingredient catalog
+--
+-- dish_ingredients stored ingredient, flavor_ingredient, format, units and
+-- type as free text on every row. Across millions of rows that is a few
+-- thousand distinct values repeated over and over. The values now live once
+-- in recipe.ingredient_terms, and the fact table keeps integer term ids.
+-- RecipeExtractor resolves strings to ids in bulk through
+-- ingredient_terms.TermCatalog.
+--
+-- Readers that want the text use recipe.dish_ingredients_named. It has the
+-- old column names, and the MotherDuck copy reads from it.
+--
+-- Dropped columns keep their space until the table is rewritten. After this
+-- migration, run this in a maintenance window:
+--   VACUUM FULL recipe.dish_ingredients;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS recipe.ingredient_terms
+(
+    term_id serial NOT NULL,
+    term character varying COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT ingredient_terms_pkey PRIMARY KEY (term_id),
+    CONSTRAINT ingredient_terms_term_key UNIQUE (term)
+);
+
+ALTER TABLE recipe.dish_ingredients
+    ADD COLUMN IF NOT EXISTS ingredient_term_id integer REFERENCES recipe.ingredient_terms (term_id),
+    ADD COLUMN IF NOT EXISTS flavor_ingredient_term_id integer REFERENCES recipe.ingredient_terms (term_id),
+    ADD COLUMN IF NOT EXISTS format_term_id integer REFERENCES recipe.ingredient_terms (term_id),
+    ADD COLUMN IF NOT EXISTS units_term_id integer REFERENCES recipe.ingredient_terms (term_id),
+    ADD COLUMN IF NOT EXISTS type_term_id integer REFERENCES recipe.ingredient_terms (term_id);
+
+-- Backfill: every distinct value once, then the ids ('' is interned like any other value, as in the writer)
+INSERT INTO recipe.ingredient_terms (term)
+SELECT DISTINCT v.term
+FROM recipe.dish_ingredients d,
+     LATERAL (VALUES (d.ingredient), (d.flavor_ingredient), (d.format), (d.units), (d.type)) AS v(term)
+WHERE v.term IS NOT NULL
+ORDER BY v.term
+ON CONFLICT (term) DO NOTHING;
+
+UPDATE recipe.dish_ingredients d SET
+    ingredient_term_id = (SELECT term_id FROM recipe.ingredient_terms WHERE term = d.ingredient),
+    flavor_ingredient_term_id = (SELECT term_id FROM recipe.ingredient_terms WHERE term = d.flavor_ingredient),
+    format_term_id = (SELECT term_id FROM recipe.ingredient_terms WHERE term = d.format),
+    units_term_id = (SELECT term_id FROM recipe.ingredient_terms WHERE term = d.units),
+    type_term_id = (SELECT term_id FROM recipe.ingredient_terms WHERE term = d.type);
+
+ALTER TABLE recipe.dish_ingredients
+    DROP COLUMN IF EXISTS ingredient,
+    DROP COLUMN IF EXISTS flavor_ingredient,
+    DROP COLUMN IF EXISTS format,
+    DROP COLUMN IF EXISTS units,
+    DROP COLUMN IF EXISTS type;
+
+CREATE INDEX IF NOT EXISTS dish_ingredients_ingredient_term_idx
+    ON recipe.dish_ingredients (ingredient_term_id);
+CREATE INDEX IF NOT EXISTS dish_ingredients_flavor_ingredient_term_idx
+    ON recipe.dish_ingredients (flavor_ingredient_term_id);
+
+CREATE OR REPLACE VIEW recipe.dish_ingredients_named AS
+SELECT d.dish_id, d.ingredient_id, d.quantity, u.term AS units, f.term AS format, t.term AS type,
+       d.ingredient_role, d.flavor_role, d.alternative_ingredients, d.date_added, d.prep_method,
+       i.term AS ingredient, fi.term AS flavor_ingredient
+FROM recipe.dish_ingredients d
+LEFT JOIN recipe.ingredient_terms i ON i.term_id = d.ingredient_term_id
+LEFT JOIN recipe.ingredient_terms fi ON fi.term_id = d.flavor_ingredient_term_id
+LEFT JOIN recipe.ingredient_terms f ON f.term_id = d.format_term_id
+LEFT JOIN recipe.ingredient_terms u ON u.term_id = d.units_term_id
+LEFT JOIN recipe.ingredient_terms t ON t.term_id = d.type_term_id;
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- Migration: scope batch-claim recovery to the worker's own partition
+--
+-- openai_recipe_batch_processor.py releases claimed submissions that never
+-- got a batch id. With several --partition workers running, one worker could
+-- release another's claims while it was still uploading; those recipes were
+-- then claimed and paid for twice. Each submission now records the partition
+-- it claimed from, and a worker only recovers its own, and only once they are
+-- older than BATCH_CLAIM_RECOVERY_MINUTES (default 30).
+--
+-- Submissions claimed before this migration have queue_partition NULL and
+-- are recovered by a worker running without --partition.
+
+ALTER TABLE recipe.llm_batches
+    ADD COLUMN IF NOT EXISTS queue_partition integer;
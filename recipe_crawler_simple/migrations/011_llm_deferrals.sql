@@ -0,0 +1,19 @@
+-- Migration: back off and eventually fail recipes whose extraction keeps being deferred
+--
+-- Throttling, outages, per-request timeouts and an open circuit used to
+-- leave a recipe pending with no record of the attempt, so the next pass
+-- picked it straight up again. RecipeExtractor now counts every deferral in
+-- llm_deferrals and sets llm_next_attempt_at with an exponential backoff
+-- (config.LLM_DEFERRAL_BACKOFF_SECONDS, doubling up to
+-- LLM_DEFERRAL_BACKOFF_MAX_SECONDS). get_pending_recipes and the batch
+-- processor skip rows until then, and a recipe deferred LLM_MAX_DEFERRALS
+-- times is marked 'failed'. Both columns are reset whenever a status is
+-- written.
+
+ALTER TABLE recipe.recipe_urls
+    ADD COLUMN IF NOT EXISTS llm_deferrals integer NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS llm_next_attempt_at timestamp without time zone;
+
+-- To retry recipes that ran out of deferrals once the endpoint is healthy again:
+--   UPDATE recipe.recipe_urls SET llm_status = 'pending', llm_failure_reason = NULL
+--   WHERE llm_status = 'failed' AND llm_failure_reason LIKE 'Deferred %';
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Azure OpenAI endpoints used by the extractors.
+Serves chat completions and the Files and Batch APIs, answering every
+request with a canned response generated from the request's
+structured-output JSON schema. Chat completions get a log-normal latency,
+a configurable share of 429 and 5xx responses, and an optional TPM quota.
+
+Usage:
+    python mock_openai_server.py --port 8089 --batch-delay 5
+    python openai_recipe_batch_processor.py --azure-endpoint http://localhost:8089/ --once
+
+    python mock_openai_server.py --latency-median 1.5 --latency-sigma 0.6 --throttle-rate 0.02 --tpm 200000
+    AZURE_OPENAI_DEPLOYMENTS='[{"name": "mock", "endpoint": "http://localhost:8089/", "deployment": "gpt-4.1-mini"}]' \
+        python benchmark_extraction.py --items 2000
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+from aiohttp import web
+
+from config import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def sample_from_schema(schema, defs=None):
+    """Build a minimal instance that validates against a (strict) JSON schema"""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        return sample_from_schema(options[0], defs) if options else None
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), None)
+    if schema_type == "object":
+        return {
+            name: sample_from_schema(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return [sample_from_schema(schema.get("items", {}), defs)]
+    if schema_type == "string":
+        if schema.get("format") == "date":
+            return "2024-01-01"
+        return schema.get("title", "sample").lower()
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return False
+    return None
+
+
+def packed_indexes(body):
+    """Indexes of "[n] ..." lines in the user message of a packed request"""
+    user = next((m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user"), "")
+    return [int(index) for index in re.findall(r"^\[(\d+)\]", user, re.MULTILINE)]
+
+
+def canned_content(schema, body):
+    """Schema-conformant JSON content; packed list responses get one entry per input index"""
+    sample = sample_from_schema(schema)
+    items = sample.get("items") if isinstance(sample, dict) else None
+    if isinstance(items, list) and items and isinstance(items[0], dict) and "index" in items[0]:
+        sample["items"] = [{**items[0], "index": index} for index in packed_indexes(body)]
+    return json.dumps(sample)
+
+
+def canned_completion(body):
+    """Chat completion object answering a request body with schema-conformant content"""
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    content = canned_content(schema, body) if schema else "{}"
+    prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content, "refusal": None},
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class MockOpenAIServer:
+    def __init__(self, batch_delay=5.0, latency_median=1.0, latency_sigma=0.5,
+                 throttle_rate=0.0, error_rate=0.0, retry_after=1.0, tpm=None):
+        self.batch_delay = batch_delay
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.tpm = tpm
+        self.files = {}
+        self.batches = {}
+        # Tokens served in the current one-minute quota window
+        self.window_started = time.monotonic()
+        self.window_tokens = 0
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def quota_remaining(self):
+        """Tokens left in the current minute, or None without a TPM quota"""
+        if self.tpm is None:
+            return None
+        if time.monotonic() - self.window_started >= 60:
+            self.window_started = time.monotonic()
+            self.window_tokens = 0
+        return max(0, self.tpm - self.window_tokens)
+
+    def throttled_response(self, message):
+        self.stats["throttled"] += 1
+        return web.json_response(
+            {"error": {"code": "429", "message": message}},
+            status=429,
+            headers={"retry-after-ms": str(int(self.retry_after * 1000)), "retry-after": str(math.ceil(self.retry_after))},
+        )
+
+    async def chat_completion(self, request):
+        """Online chat completion with simulated latency, throttling and server errors"""
+        body = await request.json()
+        self.stats["requests"] += 1
+        if random.random() < self.throttle_rate:
+            return self.throttled_response("Simulated rate limit")
+        remaining = self.quota_remaining()
+        if remaining is not None and remaining <= 0:
+            return self.throttled_response("Simulated TPM quota exhausted")
+
+        await asyncio.sleep(random.lognormvariate(math.log(self.latency_median), self.latency_sigma))
+        if random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"error": {"code": "500", "message": "Simulated server error"}}, status=500)
+
+        completion = canned_completion(body)
+        completion["model"] = request.match_info["deployment"]
+        self.window_tokens += completion["usage"]["total_tokens"]
+        headers = {"x-ratelimit-remaining-requests": "1000"}
+        remaining = self.quota_remaining()
+        if remaining is not None:
+            headers["x-ratelimit-remaining-tokens"] = str(remaining)
+        return web.json_response(completion, headers=headers)
+
+    async def get_stats(self, request):
+        return web.json_response(self.stats)
+
+    def add_file(self, content, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.files[file_id] = {
+            "meta": {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+            },
+            "content": content,
+        }
+        return self.files[file_id]["meta"]
+
+    async def create_file(self, request):
+        form = await request.post()
+        upload = form["file"]
+        meta = self.add_file(upload.file.read(), upload.filename, form.get("purpose", "batch"))
+        return web.json_response(meta)
+
+    async def get_file_content(self, request):
+        file = self.files.get(request.match_info["file_id"])
+        if not file:
+            return web.json_response({"error": {"message": "file not found"}}, status=404)
+        return web.Response(body=file["content"], content_type="application/octet-stream")
+
+    async def create_batch(self, request):
+        payload = await request.json()
+        if payload["input_file_id"] not in self.files:
+            return web.json_response({"error": {"message": "input file not found"}}, status=404)
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": payload["endpoint"],
+            "input_file_id": payload["input_file_id"],
+            "completion_window": payload["completion_window"],
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": payload.get("metadata"),
+        }
+        asyncio.get_running_loop().create_task(self.run_batch(batch_id))
+        return web.json_response(self.batches[batch_id])
+
+    async def run_batch(self, batch_id):
+        """Answer every line of the input file after batch_delay seconds"""
+        batch = self.batches[batch_id]
+        batch["status"] = "in_progress"
+        await asyncio.sleep(self.batch_delay)
+
+        lines = []
+        for raw in self.files[batch["input_file_id"]]["content"].splitlines():
+            if not raw.strip():
+                continue
+            request = json.loads(raw)
+            lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": canned_completion(request["body"]),
+                },
+                "error": None,
+            }))
+
+        output = self.add_file(("\n".join(lines) + "\n").encode(), f"{batch_id}_output.jsonl", "batch_output")
+        batch.update({
+            "status": "completed",
+            "output_file_id": output["id"],
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0},
+        })
+        logger.info(f"Completed {batch_id} with {len(lines)} requests")
+
+    async def get_batch(self, request):
+        batch = self.batches.get(request.match_info["batch_id"])
+        if not batch:
+            return web.json_response({"error": {"message": "batch not found"}}, status=404)
+        return web.json_response(batch)
+
+    async def list_batches(self, request):
+        data = sorted(self.batches.values(), key=lambda b: b["created_at"], reverse=True)
+        return web.json_response({"object": "list", "data": data, "has_more": False})
+
+    def build_app(self):
+        app = web.Application(client_max_size=256 * 1024 * 1024)
+        app.router.add_post("/openai/deployments/{deployment}/chat/completions", self.chat_completion)
+        app.router.add_get("/stats", self.get_stats)
+        app.router.add_post("/openai/files", self.create_file)
+        app.router.add_get("/openai/files/{file_id}/content", self.get_file_content)
+        app.router.add_post("/openai/batches", self.create_batch)
+        app.router.add_get("/openai/batches", self.list_batches)
+        app.router.add_get("/openai/batches/{batch_id}", self.get_batch)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Azure OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--batch-delay", type=float, default=5.0, help="Seconds before a batch completes")
+    parser.add_argument("--latency-median", type=float, default=1.0, help="Median chat completion latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal sigma of the latency (spread of the tail)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Seconds advertised in 429 retry-after headers")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens-per-minute quota enforced with 429s")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        batch_delay=args.batch_delay,
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        tpm=args.tpm,
+    )
+    web.run_app(server.build_app(), host=args.host, port=args.port)
@@ -0,0 +1,382 @@
+# Batch-mode Recipe Extractor (openai_recipe_batch_processor.py)
+import os
+import sys
+import json
+import uuid
+import logging
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from openai import AsyncAzureOpenAI
+from pydantic import ValidationError
+
+# llm_client, extraction_cache and ingredient_terms live in ../llm_extraction, shared by both pipelines
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import AZURE_API_KEY, setup_logging, db_connection
+from recipe_prompts import SYSTEM_PROMPT_RECIPE_EXTRACTION, DishModel
+from openai_recipe_processor import RecipeExtractor
+from utils import recipe_urls_table
+from llm_extraction.llm_client import DEFAULT_AZURE_ENDPOINT, DEFAULT_AZURE_API_VERSION, json_schema_response_format
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Batch jobs need a Global-Batch deployment; override when it differs from the online one
+AZURE_BATCH_DEPLOYMENT = os.getenv("AZURE_BATCH_DEPLOYMENT", "gpt-4.1-mini")
+
+# Remote batch states after which no more output will appear
+TERMINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+# A claimed submission without a batch id only counts as abandoned after this long, so a
+# worker never releases rows that another worker (or this one) is still uploading
+CLAIM_RECOVERY_MINUTES = int(os.getenv("BATCH_CLAIM_RECOVERY_MINUTES", 30))
+# Result lines validated and persisted per transaction
+APPLY_CHUNK_SIZE = 500
+# Error codes on result lines that are worth another attempt; those rows go back to the queue
+RETRYABLE_ERROR_CODES = {"429", "rate_limit_exceeded", "server_error", "timeout", "batch_expired"}
+
+
+class RecipeBatchProcessor:
+    """Runs RecipeExtractor's prompts through the Azure OpenAI Batch API.
+
+    Rows move pending -> batched (claimed by a submission) -> complete/failed.
+    Every step is recorded in recipe.llm_batches, so the processor can be
+    killed and restarted at any point.
+    """
+
+    def __init__(self, max_requests=5000, max_active_batches=2, partition=None,
+                 azure_endpoint=None, work_dir=None):
+        self.max_requests = max_requests
+        self.max_active_batches = max_active_batches
+        self.partition = partition
+        self.queue_table = recipe_urls_table(partition)
+        self.work_dir = work_dir or tempfile.gettempdir()
+        # Reused for content rendering and persistence so both modes write identical rows
+        self.extractor = RecipeExtractor(partition=partition)
+        self.client = AsyncAzureOpenAI(
+            api_key=AZURE_API_KEY,
+            api_version=DEFAULT_AZURE_API_VERSION,
+            azure_endpoint=azure_endpoint or DEFAULT_AZURE_ENDPOINT,
+            timeout=300.0,
+        )
+        self.response_format = json_schema_response_format(DishModel)
+
+    def claim_pending_recipes(self, submission_id):
+        """Claim up to max_requests pending recipes for a new submission and return their content"""
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO recipe.llm_batches (submission_id, status, queue_partition) VALUES (%s, 'claimed', %s)",
+                    (submission_id, self.partition)
+                )
+                cursor.execute(
+                    f"""WITH claimed AS (
+                            UPDATE recipe.recipe_urls SET llm_status = 'batched', llm_batch_id = %s
+                            WHERE id IN (
+                                SELECT u.id FROM {self.queue_table} u
+                                JOIN recipe.recipe_pages p ON p.url_id = u.id
+                                WHERE u.is_recipe IS TRUE AND u.crawl_status = 'complete'
+                                AND u.llm_status = 'pending' AND p.parsed_text IS NOT NULL
+                                AND (u.llm_next_attempt_at IS NULL OR u.llm_next_attempt_at <= LOCALTIMESTAMP)
+                                ORDER BY u.last_crawled DESC LIMIT %s
+                                FOR UPDATE OF u SKIP LOCKED
+                            )
+                            RETURNING id, url
+                        )
+                        SELECT c.id, p.parsed_text, p.title, p.description, c.url, p.has_recipe_jsonld
+                        FROM claimed c JOIN recipe.recipe_pages p ON p.url_id = c.id""",
+                    (submission_id, self.max_requests)
+                )
+                rows = cursor.fetchall()
+                cursor.execute(
+                    "UPDATE recipe.llm_batches SET num_requests = %s WHERE submission_id = %s",
+                    (len(rows), submission_id)
+                )
+                conn.commit()
+                return rows
+
+    def write_batch_file(self, submission_id, rows):
+        """Render claimed rows as a Batch API JSONL input file"""
+        path = os.path.join(self.work_dir, f"recipe_batch_{submission_id}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for url_id, text, title, description in rows:
+                request = {
+                    "custom_id": str(url_id),
+                    "method": "POST",
+                    "url": "/chat/completions",
+                    "body": {
+                        "model": AZURE_BATCH_DEPLOYMENT,
+                        "max_tokens": 2000,
+                        "temperature": 0.0,
+                        "messages": [
+                            {"role": "system", "content": SYSTEM_PROMPT_RECIPE_EXTRACTION},
+                            {"role": "user", "content": self.extractor.build_user_content(text, title, description)}
+                        ],
+                        "response_format": self.response_format,
+                    },
+                }
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return path
+
+    def update_batch(self, submission_id, **fields):
+        """Record remote batch state on the llm_batches row"""
+        assignments = ", ".join(f"{field} = %s" for field in fields)
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE recipe.llm_batches SET {assignments} WHERE submission_id = %s",
+                    list(fields.values()) + [submission_id]
+                )
+                conn.commit()
+
+    def release_claims(self, submission_id, status):
+        """Put rows still claimed by a submission back in the queue and close the submission"""
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """UPDATE recipe.recipe_urls SET llm_status = 'pending', llm_batch_id = NULL
+                       WHERE llm_batch_id = %s AND llm_status = 'batched'""",
+                    (submission_id,)
+                )
+                released = cursor.rowcount
+                cursor.execute(
+                    """UPDATE recipe.llm_batches SET status = %s, date_completed = %s
+                       WHERE submission_id = %s""",
+                    (status, datetime.utcnow(), submission_id)
+                )
+                conn.commit()
+        if released:
+            logger.info(f"Released {released} unprocessed recipes from submission {submission_id}")
+
+    async def submit(self):
+        """Claim pending recipes, upload them and create a batch job. Returns False when the queue is empty"""
+        submission_id = str(uuid.uuid4())
+        claimed = self.claim_pending_recipes(submission_id)
+        if not claimed:
+            self.release_claims(submission_id, "empty")
+            return False
+        
+        # Same local prefilter as online mode; skipped rows leave the submission
+        rows = self.extractor.screen_recipes(claimed)
+        if not rows:
+            self.release_claims(submission_id, "empty")
+            return True
+        if len(rows) < len(claimed):
+            self.update_batch(submission_id, num_requests=len(rows))
+
+        path = self.write_batch_file(submission_id, rows)
+        try:
+            with open(path, "rb") as f:
+                input_file = await self.client.files.create(file=f, purpose="batch")
+            self.update_batch(submission_id, input_file_id=input_file.id)
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h",
+                metadata={"submission_id": submission_id},
+            )
+            self.update_batch(submission_id, batch_id=batch.id, status=batch.status)
+            logger.info(f"Submitted batch {batch.id} with {len(rows)} recipes (submission {submission_id})")
+        finally:
+            os.remove(path)
+        return True
+
+    async def recover_unsubmitted(self):
+        """Match this partition's stale claimed submissions without a batch id to remote batches, or release them.
+
+        Only claims older than CLAIM_RECOVERY_MINUTES are touched, so a
+        submission that is still uploading is never released under its worker.
+        """
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """SELECT submission_id FROM recipe.llm_batches
+                       WHERE status = 'claimed' AND batch_id IS NULL
+                       AND queue_partition IS NOT DISTINCT FROM %s
+                       AND date_created < LOCALTIMESTAMP - make_interval(mins => %s)""",
+                    (self.partition, CLAIM_RECOVERY_MINUTES)
+                )
+                orphaned = {str(row[0]) for row in cursor.fetchall()}
+        if not orphaned:
+            return
+
+        async for batch in self.client.batches.list(limit=100):
+            submission_id = (batch.metadata or {}).get("submission_id")
+            if submission_id in orphaned:
+                logger.info(f"Recovered batch {batch.id} for submission {submission_id}")
+                self.update_batch(submission_id, batch_id=batch.id, status=batch.status)
+                orphaned.discard(submission_id)
+
+        for submission_id in orphaned:
+            self.release_claims(submission_id, "abandoned")
+
+    def get_active_batches(self):
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """SELECT submission_id, batch_id FROM recipe.llm_batches
+                       WHERE batch_id IS NOT NULL AND status NOT IN ('applied', 'abandoned', 'empty')
+                       ORDER BY date_created"""
+                )
+                return cursor.fetchall()
+
+    async def iter_file_lines(self, file_id):
+        """Stream a result file line by line without holding it in memory"""
+        async with self.client.files.with_streaming_response.content(file_id) as response:
+            async for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    def parse_result(self, result):
+        """Classify one output or error line as ('complete', dish), ('retry', reason) or ('failed', reason)"""
+        response = result.get("response") or {}
+        body = response.get("body") or {}
+        status_code = response.get("status_code")
+        if result.get("error") or status_code != 200:
+            error = result.get("error") or body.get("error") or {}
+            reason = error.get("message", "Batch request failed")
+            # Throttling and server-side failures say nothing about the recipe itself
+            if status_code == 429 or (status_code or 0) >= 500 or str(error.get("code")) in RETRYABLE_ERROR_CODES:
+                return 'retry', reason
+            return 'failed', reason
+
+        try:
+            message = body["choices"][0]["message"]
+            if message.get("refusal"):
+                raise ValueError(f"Model refusal: {message['refusal']}")
+            return 'complete', DishModel.model_validate_json(message["content"])
+        except (KeyError, IndexError, TypeError, ValueError, ValidationError) as e:
+            logger.warning(f"Invalid batch result for URL {result.get('custom_id')}: {e}")
+            return 'failed', f"Batch result invalid: {e}"
+
+    def apply_chunk(self, submission_id, results):
+        """Validate result lines and persist them in one transaction. Returns (saved, failed, retried)"""
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Idempotency: only rows still claimed by this submission are written
+                cursor.execute(
+                    """SELECT id::text FROM recipe.recipe_urls
+                       WHERE id = ANY(%s::uuid[]) AND llm_batch_id = %s AND llm_status = 'batched'""",
+                    ([result["custom_id"] for result in results], submission_id)
+                )
+                claimed = {row[0] for row in cursor.fetchall()}
+
+        dishes, statuses, deferrals = [], [], []
+        for result in results:
+            url_id = result["custom_id"]
+            if url_id not in claimed:
+                continue
+            outcome, value = self.parse_result(result)
+            if outcome == 'complete':
+                dishes.append((url_id, value))
+            elif outcome == 'failed':
+                statuses.append((url_id, 'failed', value))
+            else:
+                # Counted and backed off like an online deferral; release_claims then requeues it
+                deferrals.append((url_id, value))
+        saved = self.extractor.save_results(dishes, statuses, deferrals)
+        return saved, len(statuses) + len(dishes) - saved, len(deferrals)
+
+    async def apply_results(self, submission_id, batch):
+        """Stream output and error files back through DishModel validation into save_results, a chunk at a time"""
+        succeeded = failed = retried = 0
+        chunk = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            async for result in self.iter_file_lines(file_id):
+                chunk.append(result)
+                if len(chunk) >= APPLY_CHUNK_SIZE:
+                    saved, chunk_failed, chunk_retried = self.apply_chunk(submission_id, chunk)
+                    succeeded, failed, retried = succeeded + saved, failed + chunk_failed, retried + chunk_retried
+                    chunk = []
+        if chunk:
+            saved, chunk_failed, chunk_retried = self.apply_chunk(submission_id, chunk)
+            succeeded, failed, retried = succeeded + saved, failed + chunk_failed, retried + chunk_retried
+        self.update_batch(
+            submission_id,
+            output_file_id=batch.output_file_id,
+            error_file_id=batch.error_file_id,
+            num_succeeded=succeeded,
+            num_failed=failed,
+        )
+        logger.info(f"Batch {batch.id} ({batch.status}): {succeeded} saved, {failed} failed, "
+                    f"{retried} requeued after retryable errors")
+
+    def defer_unanswered(self, submission_id, reason):
+        """Count a deferral against every row the submission still holds. Returns (deferred, given up)
+
+        Rows a finished batch produced no result line for (a failed, expired or
+        cancelled batch) are backed off like any other deferral, so a batch that
+        keeps failing cannot resubmit the same rows forever.
+        """
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """SELECT id::text FROM recipe.recipe_urls
+                       WHERE llm_batch_id = %s AND llm_status = 'batched'""",
+                    (submission_id,)
+                )
+                deferrals = [(row[0], reason) for row in cursor.fetchall()]
+                given_up = self.extractor.write_deferrals(cursor, deferrals) if deferrals else 0
+                conn.commit()
+        return len(deferrals), given_up
+
+    async def poll(self):
+        """Refresh active batches and apply the results of finished ones"""
+        active = self.get_active_batches()
+        for submission_id, batch_id in active:
+            submission_id = str(submission_id)
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status not in TERMINAL_BATCH_STATES:
+                self.update_batch(submission_id, status=batch.status)
+                continue
+            # Expired and cancelled batches can still carry partial output
+            await self.apply_results(submission_id, batch)
+            # Anything without a result line is deferred, then goes back to the online queue
+            errors = batch.errors.data if batch.errors and batch.errors.data else []
+            reason = (errors[0].message if errors else None) or f"Batch {batch.status} without a result for this recipe"
+            deferred, given_up = self.defer_unanswered(submission_id, reason)
+            if deferred:
+                logger.warning(f"Batch {batch.id} ({batch.status}) left {deferred} recipes without a result "
+                               f"({given_up} out of deferrals): {reason}")
+            self.release_claims(submission_id, "applied")
+
+    async def run(self, poll_interval=60, once=False):
+        """Main loop: recover, poll, and keep up to max_active_batches batches in flight"""
+        logger.info("Starting recipe batch extraction")
+
+        while True:
+            # Picks up submissions interrupted between claiming rows and creating the job
+            await self.recover_unsubmitted()
+            await self.poll()
+            active = len(self.get_active_batches())
+            queue_empty = False
+            while active < self.max_active_batches and not queue_empty:
+                queue_empty = not await self.submit()
+                active += 0 if queue_empty else 1
+
+            if once and active == 0:
+                logger.info("No batches in flight and no pending recipes, exiting")
+                return
+            logger.info(f"{active} batch(es) in flight, next poll in {poll_interval}s")
+            await asyncio.sleep(poll_interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Extract structured recipe data with the Azure OpenAI Batch API")
+    parser.add_argument("--max-requests", type=int, default=5000, help="Recipes per batch job")
+    parser.add_argument("--max-active-batches", type=int, default=2, help="Batch jobs kept in flight")
+    parser.add_argument("--poll-interval", type=int, default=60, help="Seconds between status polls")
+    parser.add_argument("--partition", type=int, default=None, help="Only work on this recipe_urls hash partition")
+    parser.add_argument("--azure-endpoint", default=None, help="Override the endpoint (e.g. a local mock server)")
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is drained and all batches are applied")
+    args = parser.parse_args()
+
+    processor = RecipeBatchProcessor(args.max_requests, args.max_active_batches, args.partition, args.azure_endpoint)
+    await processor.run(args.poll_interval, args.once)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,48 +1,122 @@
 # Updated Recipe Extractor (main.py)
+import os
+import sys
+import json
+import hashlib
 import logging
 import asyncio
-from openai import AsyncAzureOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+import argparse
+from pydantic import ValidationError
+from psycopg2.extras import execute_values
 
-from config import AZURE_API_ENDPOINT, AZURE_API_KEY, AZURE_API_VERSION, setup_logging, get_db_connection
+# llm_client, extraction_cache and ingredient_terms live in ../llm_extraction, shared by both pipelines
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import setup_logging, db_connection, QueueListener, RECIPE_LLM_CHANNEL
+from config import LLM_MAX_DEFERRALS, LLM_DEFERRAL_BACKOFF_SECONDS, LLM_DEFERRAL_BACKOFF_MAX_SECONDS
 from recipe_prompts import SYSTEM_PROMPT_RECIPE_EXTRACTION, DishModel
+from compact_schema import SYSTEM_PROMPT_RECIPE_EXTRACTION_COMPACT, CompactDish, expand_dish
+from utils import recipe_urls_table
+from recipe_prefilter import prefilter_recipe
+from llm_extraction.extraction_cache import ExtractionCache
+from llm_extraction.ingredient_terms import TermCatalog
+from llm_extraction.llm_client import LLMClient, LLMCallError, CONTENT_FILTER, VALIDATION
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def content_hash(rows):
+    """Stable digest of the rows stored for a dish's ingredients or attributes"""
+    return hashlib.sha256(json.dumps(rows, default=str).encode()).hexdigest()
+
+EXTRACTION_MODEL = "gpt-4.1-mini"
+EXTRACTION_MAX_TOKENS = 2000
+
+DISH_FIELDS = [
+    'dish_name', 'description', 'meal_time', 'general_category', 
+    'specific_category', 'cuisine', 'complexity', 'serving_temperature', 
+    'season', 'source', 'star_rating', 'num_ratings', 
+    'num_reviews', 'date_published', 'date_updated'
+]
+
+# Ingredient row positions (dish_id, ingredient, flavor_ingredient, format, prep_method, quantity,
+# units, type, ...) whose text is interned into ingredient_terms
+INTERNED_POSITIONS = (1, 2, 3, 6, 7)
+
+
 class RecipeExtractor:
-    def __init__(self, batch_size=32, max_concurrency=8):
+    def __init__(self, batch_size=32, max_concurrency=8, partition=None, compact_schema=False):
         self.batch_size = batch_size
-        self.semaphore = asyncio.Semaphore(max_concurrency)
-        self.client = AsyncAzureOpenAI(
-            api_key=AZURE_API_KEY, 
-            api_version="2024-12-01-preview", 
-            azure_endpoint="https://locmatic-menu-recipe.openai.azure.com/",
-            timeout=60.0,
+        # Compact mode asks for short keys and enum codes and expands them back into DishModel
+        self.compact_schema = compact_schema
+        self.system_prompt = SYSTEM_PROMPT_RECIPE_EXTRACTION_COMPACT if compact_schema else SYSTEM_PROMPT_RECIPE_EXTRACTION
+        # Scan a single hash partition of recipe_urls so workers can split the queue
+        self.queue_table = recipe_urls_table(partition)
+        # Routes over the AZURE_OPENAI_DEPLOYMENTS pool (default: the single gpt-4.1-mini deployment).
+        # Each deployment's concurrency starts at max_concurrency and adapts to latency and throttling
+        self.llm = LLMClient.from_env(
+            EXTRACTION_MODEL,
+            initial_concurrency=max_concurrency,
+            max_concurrency=max(max_concurrency, batch_size),
         )
+        self.listener = QueueListener(RECIPE_LLM_CHANNEL)
+        self.cache = ExtractionCache("recipe.llm_extraction_cache", EXTRACTION_MODEL, self.system_prompt)
+        self.terms = TermCatalog("recipe.ingredient_terms")
 
     def get_pending_recipes(self):
         """Get recipes that need extraction"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
+                # The queue scan runs on the narrow recipe_urls table; page text is joined in afterwards
                 cursor.execute(
-                    """SELECT id, parsed_text, title, description
-                       FROM recipe.recipe_urls 
-                       WHERE is_recipe IS TRUE AND crawl_status = 'complete' AND parsed_text IS NOT NULL
-                       AND llm_status = 'pending'
-                       ORDER BY last_crawled DESC LIMIT %s""",
+                    f"""SELECT u.id, p.parsed_text, p.title, p.description, u.url, p.has_recipe_jsonld
+                       FROM {self.queue_table} u
+                       JOIN recipe.recipe_pages p ON p.url_id = u.id
+                       WHERE u.is_recipe IS TRUE AND u.crawl_status = 'complete'
+                       AND u.llm_status = 'pending' AND p.parsed_text IS NOT NULL
+                       AND (u.llm_next_attempt_at IS NULL OR u.llm_next_attempt_at <= LOCALTIMESTAMP)
+                       ORDER BY u.last_crawled DESC LIMIT %s""",
                     (self.batch_size,)
                 )
                 return cursor.fetchall()
 
+    def screen_recipes(self, rows):
+        """Run the local prefilter on (id, text, title, description, url, has_jsonld) rows.
+
+        Rejected rows are marked 'skipped' with the reason; the rest come back
+        as (id, text, title, description) for extraction.
+        """
+        kept, skipped = [], []
+        for url_id, text, title, description, url, has_jsonld in rows:
+            passed, reason = prefilter_recipe(url, title, text, has_jsonld)
+            if passed:
+                kept.append((url_id, text, title, description))
+            else:
+                skipped.append((url_id, f"prefilter: {reason}"))
+        
+        if skipped:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    execute_values(
+                        cursor,
+                        """UPDATE recipe.recipe_urls u
+                           SET llm_status = 'skipped', llm_failure_reason = v.reason
+                           FROM (VALUES %s) AS v(id, reason)
+                           WHERE u.id = v.id::uuid""",
+                        skipped
+                    )
+                    conn.commit()
+            logger.info(f"Prefilter skipped {len(skipped)}/{len(rows)} pages before extraction")
+        return kept
+
     def update_llm_status(self, url_id, status, failure_reason=None):
         """Update LLM processing status"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE recipe.recipe_urls 
-                    SET llm_status = %s, llm_failure_reason = %s
+                    SET llm_status = %s, llm_failure_reason = %s, llm_deferrals = 0, llm_next_attempt_at = NULL
                     WHERE id = %s
                 """, (status, failure_reason, url_id))
                 conn.commit()
@@ -59,160 +133,371 @@ class RecipeExtractor:
             return truncated[:last_newline] + "\n[Content truncated for processing]"
         return truncated + "\n[Content truncated for processing]"
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def build_user_content(self, text, title, description):
+        """Render the user message for a recipe page, truncated to avoid token limits"""
+        content = f"Title: {title or ''}\nDescription: {description or ''}\nContent:\n{text}"
+        return self.truncate_content(content)
+
     async def extract_recipe(self, recipe_data):
-        """Extract structured recipe data using OpenAI"""
+        """Extract structured recipe data using OpenAI. Returns (url_id, dish, error)"""
         url_id, text, title, description = recipe_data
         
-        async with self.semaphore:
-            try:
-                # Truncate content to avoid token limits
-                content = f"Title: {title or ''}\nDescription: {description or ''}\nContent:\n{text}"
-                content = self.truncate_content(content)
-                
-                completion = await self.client.beta.chat.completions.parse(
-                    model="gpt-4.1-mini",
-                    max_tokens=2000,  # Increased from 1000
-                    temperature=0.0,  # Lower temperature for more consistent output
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT_RECIPE_EXTRACTION},
-                        {"role": "user", "content": content}
-                    ],
-                    response_format=DishModel,
-                )
-                
-                return url_id, completion.choices[0].message.parsed
-                
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Extraction failed for URL {url_id}: {error_msg}")
-                
-                # Log specific error types for debugging
-                if "content filter" in error_msg.lower():
-                    logger.warning(f"Content filter rejection for URL {url_id}")
-                elif "length limit" in error_msg.lower():
-                    logger.warning(f"Token limit exceeded for URL {url_id}")
-                elif "validation error" in error_msg.lower():
-                    logger.warning(f"Validation error for URL {url_id}: {error_msg}")
-                
-                return url_id, None
+        try:
+            content = self.build_user_content(text, title, description)
+            completion = await self.llm.complete(
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": content}
+                ],
+                max_tokens=EXTRACTION_MAX_TOKENS,
+                response_format=CompactDish if self.compact_schema else DishModel,
+            )
+            message = completion.choices[0].message
+            if message.parsed is None:
+                if message.refusal:
+                    raise LLMCallError(CONTENT_FILTER, f"Model refusal: {message.refusal}")
+                raise LLMCallError(VALIDATION, "Empty structured output")
+            if self.compact_schema:
+                try:
+                    return url_id, expand_dish(message.parsed), None
+                except (ValueError, IndexError) as e:  # includes pydantic's ValidationError
+                    raise LLMCallError(VALIDATION, f"Compact result did not expand: {e}")
+            return url_id, message.parsed, None
+            
+        except LLMCallError as e:
+            # Throttling, outages and an open circuit leave the row pending for a later pass
+            if e.deferrable:
+                logger.warning(f"Extraction deferred for URL {url_id}: {e}")
+            else:
+                logger.error(f"Extraction failed for URL {url_id}: {e}")
+            return url_id, None, e
+
+    def write_dishes(self, cursor, dishes):
+        """Upsert [(url_id, dish)] with their ingredients and attributes: a few statements per batch, not per row.
+
+        Returns the number of dishes inserted or changed.
+        """
+        # Ingredients and attributes are only rewritten when their content hash changed
+        cursor.execute(
+            "SELECT dish_id::text, ingredients_hash, attributes_hash FROM recipe.dishes WHERE dish_id = ANY(%s::uuid[])",
+            ([str(dish[0]) for dish in dishes],)
+        )
+        stored = {row[0]: row[1:] for row in cursor.fetchall()}
+        dish_rows, ingredient_rows, attribute_rows, replaced = [], [], [], []
+        for url_id, dish in dishes:
+            stored_ingredients_hash, stored_attributes_hash = stored.get(str(url_id), (None, None))
+            # A dish without ingredients or attributes leaves the stored ones (and their hash) in place
+            ingredients_hash, attributes_hash = stored_ingredients_hash, stored_attributes_hash
+            
+            # Save ingredients with both ingredient and flavor_ingredient fields
+            if dish.ingredients:
+                ingredients = []
+                for ingredient in dish.ingredients:
+                    ingredients.append((
+                        getattr(ingredient, 'ingredient', None),  # Full ingredient name
+                        getattr(ingredient, 'flavor_ingredient', None),  # Flavor-contributing ingredient
+                        ingredient.format, ingredient.prep_method,
+                        ingredient.quantity, ingredient.units, ingredient.type, 
+                        ingredient.ingredient_role, ingredient.flavor_role,
+                        ingredient.alternative_ingredients))
+                ingredients_hash = content_hash(ingredients)
+                if ingredients_hash != stored_ingredients_hash:
+                    replaced.append(url_id)
+                    ingredient_rows.extend((url_id,) + row for row in ingredients)
+            
+            # Save attributes
+            if dish.attributes:
+                attrs = dish.attributes
+                attributes = (attrs.flavor_attributes, attrs.texture_attributes,
+                    attrs.aroma_attributes, attrs.cooking_techniques, attrs.diet_preferences,
+                    attrs.functional_health, attrs.occasions,
+                    attrs.convenience_attributes, attrs.social_setting,
+                    attrs.emotional_attributes)
+                attributes_hash = content_hash(attributes)
+                if attributes_hash != stored_attributes_hash:
+                    attribute_rows.append((url_id,) + attributes)
+            
+            # Save main dish info (added date_published and date_updated, removed cooking_technique)
+            dish_rows.append([url_id] + [
+                'recipe' if field == 'source' else getattr(dish, field, None)  # Hardcoded source
+                for field in DISH_FIELDS
+            ] + [ingredients_hash, attributes_hash])
+        
+        # Unchanged dishes are left untouched, so date_modified only moves on a real change
+        tracked = DISH_FIELDS + ['ingredients_hash', 'attributes_hash']
+        changed = execute_values(cursor, f"""
+            INSERT INTO recipe.dishes AS d (dish_id, {', '.join(tracked)})
+            VALUES %s
+            ON CONFLICT (dish_id) DO UPDATE SET
+            {', '.join([f'{field} = EXCLUDED.{field}' for field in tracked])},
+            date_modified = CURRENT_TIMESTAMP
+            WHERE ({', '.join([f'd.{field}' for field in tracked])})
+                IS DISTINCT FROM ({', '.join([f'EXCLUDED.{field}' for field in tracked])})
+            RETURNING dish_id
+        """, dish_rows, page_size=len(dish_rows), fetch=True)
+        
+        if replaced:
+            cursor.execute("DELETE FROM recipe.dish_ingredients WHERE dish_id = ANY(%s::uuid[])", (replaced,))
+        if ingredient_rows:
+            # ingredient, flavor_ingredient, format, units and type are stored as term ids
+            ingredient_rows = self.terms.intern_rows(cursor, ingredient_rows, INTERNED_POSITIONS)
+            execute_values(cursor, """
+                INSERT INTO recipe.dish_ingredients 
+                (dish_id, ingredient_term_id, flavor_ingredient_term_id, format_term_id, prep_method, quantity,
+                units_term_id, type_term_id, ingredient_role, flavor_role, alternative_ingredients)
+                VALUES %s
+            """, ingredient_rows, page_size=len(ingredient_rows))
+        
+        if attribute_rows:
+            execute_values(cursor, """
+                INSERT INTO recipe.dish_attributes 
+                (dish_id, flavor_attributes, texture_attributes, aroma_attributes, cooking_techniques,
+                diet_preferences, functional_health, occasions, convenience_attributes,
+                social_setting, emotional_attributes)
+                VALUES %s
+                ON CONFLICT (dish_id) DO UPDATE SET
+                flavor_attributes = EXCLUDED.flavor_attributes,
+                texture_attributes = EXCLUDED.texture_attributes,
+                aroma_attributes = EXCLUDED.aroma_attributes,
+                cooking_techniques = EXCLUDED.cooking_techniques,
+                diet_preferences = EXCLUDED.diet_preferences,
+                functional_health = EXCLUDED.functional_health,
+                occasions = EXCLUDED.occasions,
+                convenience_attributes = EXCLUDED.convenience_attributes,
+                social_setting = EXCLUDED.social_setting,
+                emotional_attributes = EXCLUDED.emotional_attributes
+            """, attribute_rows, page_size=len(attribute_rows))
+        return len(changed)
+
+    def write_statuses(self, cursor, statuses):
+        """Set llm_status for [(url_id, status, failure_reason)] in one statement"""
+        execute_values(
+            cursor,
+            """UPDATE recipe.recipe_urls u
+               SET llm_status = v.status, llm_failure_reason = v.reason, llm_deferrals = 0, llm_next_attempt_at = NULL
+               FROM (VALUES %s) AS v(id, status, reason)
+               WHERE u.id = v.id::uuid""",
+            statuses,
+            page_size=len(statuses)
+        )
+
+    def write_deferrals(self, cursor, deferrals):
+        """Back off [(url_id, reason)] rows left pending. Returns how many ran out of deferrals and failed
+
+        Each deferral doubles the wait before get_pending_recipes offers the
+        row again; the LLM_MAX_DEFERRALS-th marks it failed.
+        """
+        given_up = execute_values(
+            cursor,
+            f"""UPDATE recipe.recipe_urls u
+               SET llm_deferrals = u.llm_deferrals + 1,
+                   llm_next_attempt_at = LOCALTIMESTAMP + make_interval(secs => LEAST(
+                       {LLM_DEFERRAL_BACKOFF_SECONDS} * power(2, u.llm_deferrals), {LLM_DEFERRAL_BACKOFF_MAX_SECONDS})),
+                   llm_status = CASE WHEN u.llm_deferrals + 1 >= {LLM_MAX_DEFERRALS} THEN 'failed' ELSE u.llm_status END,
+                   llm_failure_reason = CASE WHEN u.llm_deferrals + 1 >= {LLM_MAX_DEFERRALS}
+                       THEN 'Deferred {LLM_MAX_DEFERRALS} times, last: ' || v.reason ELSE v.reason END
+               FROM (VALUES %s) AS v(id, reason)
+               WHERE u.id = v.id::uuid
+               RETURNING u.llm_status = 'failed'""",
+            deferrals,
+            page_size=len(deferrals),
+            fetch=True
+        )
+        return sum(1 for (failed,) in given_up if failed)
 
     def save_dish(self, url_id, dish):
         """Save dish data to database"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
-                # Save main dish info (added date_published and date_updated, removed cooking_technique)
-                dish_fields = [
-                    'dish_name', 'description', 'meal_time', 'general_category', 
-                    'specific_category', 'cuisine', 'complexity', 'serving_temperature', 
-                    'season', 'source', 'star_rating', 'num_ratings', 
-                    'num_reviews', 'date_published', 'date_updated'
-                ]
-                values = []
-                for field in dish_fields:
-                    if field == 'source':
-                        values.append('recipe')  # Hardcoded source
-                    else:
-                        values.append(getattr(dish, field, None))
-                
-                cursor.execute(f"""
-                    INSERT INTO recipe.dishes (dish_id, {', '.join(dish_fields)})
-                    VALUES (%s, {', '.join(['%s'] * len(dish_fields))})
-                    ON CONFLICT (dish_id) DO UPDATE SET
-                    {', '.join([f'{field} = EXCLUDED.{field}' for field in dish_fields])},
-                    date_modified = CURRENT_TIMESTAMP
-                """, [url_id] + values)
-                
-                # Save ingredients with both ingredient and flavor_ingredient fields
-                if dish.ingredients:
-                    cursor.execute("DELETE FROM recipe.dish_ingredients WHERE dish_id = %s", (url_id,))
-                    for ingredient in dish.ingredients:
-                        cursor.execute("""
-                            INSERT INTO recipe.dish_ingredients 
-                            (dish_id, ingredient, flavor_ingredient, format, prep_method, quantity, units, type,
-                            ingredient_role, flavor_role, alternative_ingredients)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (url_id, 
-                            getattr(ingredient, 'ingredient', None),  # Full ingredient name
-                            getattr(ingredient, 'flavor_ingredient', None),  # Flavor-contributing ingredient
-                            ingredient.format, ingredient.prep_method,
-                            ingredient.quantity, ingredient.units, ingredient.type, 
-                            ingredient.ingredient_role, ingredient.flavor_role,
-                            ingredient.alternative_ingredients))
-                
-                # Save attributes
-                if dish.attributes:
-                    attrs = dish.attributes
-                    cursor.execute("""
-                        INSERT INTO recipe.dish_attributes 
-                        (dish_id, flavor_attributes, texture_attributes, aroma_attributes, cooking_techniques,
-                        diet_preferences, functional_health, occasions, convenience_attributes,
-                        social_setting, emotional_attributes)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (dish_id) DO UPDATE SET
-                        flavor_attributes = EXCLUDED.flavor_attributes,
-                        texture_attributes = EXCLUDED.texture_attributes,
-                        aroma_attributes = EXCLUDED.aroma_attributes,
-                        cooking_techniques = EXCLUDED.cooking_techniques,
-                        diet_preferences = EXCLUDED.diet_preferences,
-                        functional_health = EXCLUDED.functional_health,
-                        occasions = EXCLUDED.occasions,
-                        convenience_attributes = EXCLUDED.convenience_attributes,
-                        social_setting = EXCLUDED.social_setting,
-                        emotional_attributes = EXCLUDED.emotional_attributes
-                    """, (url_id, attrs.flavor_attributes, attrs.texture_attributes,
-                        attrs.aroma_attributes, attrs.cooking_techniques, attrs.diet_preferences,
-                        attrs.functional_health, attrs.occasions,
-                        attrs.convenience_attributes, attrs.social_setting,
-                        attrs.emotional_attributes))
-                
+                self.write_dishes(cursor, [(url_id, dish)])
                 conn.commit()
 
+    def save_results(self, dishes, statuses, deferrals=()):
+        """Persist a batch in one transaction. Returns the number of dishes saved
+
+        dishes are [(url_id, dish)] and are marked complete; statuses are
+        (url_id, status, failure_reason) for rows without a dish; deferrals are
+        (url_id, reason) for rows to retry later. If the batched write fails,
+        rows are retried one at a time so a bad dish only fails itself.
+        """
+        if not dishes and not statuses and not deferrals:
+            return 0
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    changed = self.write_dishes(cursor, dishes) if dishes else 0
+                    if dishes or statuses:
+                        self.write_statuses(cursor, [(url_id, 'complete', None) for url_id, _ in dishes] + statuses)
+                    given_up = self.write_deferrals(cursor, deferrals) if deferrals else 0
+                    conn.commit()
+            if dishes:
+                logger.info(f"Saved {len(dishes)} dishes ({len(dishes) - changed} unchanged)")
+            if given_up:
+                logger.warning(f"Marked {given_up} recipes failed after {LLM_MAX_DEFERRALS} deferrals")
+            return len(dishes)
+        except Exception as e:
+            logger.warning(f"Batched save of {len(dishes)} dishes failed, saving one at a time: {e}")
+        
+        if deferrals:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    self.write_deferrals(cursor, deferrals)
+                    conn.commit()
+        
+        saved = 0
+        for url_id, dish in dishes:
+            try:
+                self.save_dish(url_id, dish)
+                self.update_llm_status(url_id, 'complete')
+                saved += 1
+            except Exception as e:
+                logger.error(f"Failed to save dish {url_id}: {e}")
+                self.update_llm_status(url_id, 'failed', str(e))
+        for url_id, status, failure_reason in statuses:
+            self.update_llm_status(url_id, status, failure_reason)
+        return saved
+
+    def lookup_cached(self, recipes):
+        """Split a batch into cache hits [(url_id, dish)] and recipes that still need the model
+
+        Recipes whose content matches an earlier miss in the batch are not
+        extracted again; followers maps that miss's url_id to their url_ids.
+        """
+        cache_keys = {
+            recipe[0]: self.cache.key_for(self.build_user_content(recipe[1], recipe[2], recipe[3]))
+            for recipe in recipes
+        }
+        try:
+            cached = self.cache.get_many(list(cache_keys.values()))
+        except Exception as e:
+            logger.warning(f"Extraction cache lookup failed: {e}")
+            cached = {}
+        
+        hits, misses, followers = [], [], {}
+        extracting = {}
+        for recipe in recipes:
+            key = cache_keys[recipe[0]]
+            result = cached.get(key)
+            try:
+                if result is not None:
+                    hits.append((recipe[0], DishModel.model_validate(result), None))
+                    continue
+            except ValidationError:
+                pass  # Stored under an older DishModel; extract again
+            if key in extracting:
+                followers.setdefault(extracting[key], []).append(recipe[0])
+                continue
+            extracting[key] = recipe[0]
+            misses.append(recipe)
+        return hits, misses, cache_keys, followers
+
+    def store_cached(self, results, cache_keys):
+        """Cache every successful extraction from this batch"""
+        entries = [
+            (cache_keys[result[0]], result[1].model_dump(mode='json'))
+            for result in results
+            if isinstance(result, tuple) and len(result) == 3 and result[1]
+        ]
+        try:
+            self.cache.put_many(entries)
+        except Exception as e:
+            logger.warning(f"Extraction cache write failed: {e}")
+
+    async def process_batch(self):
+        """Extract and save one batch of pending recipes. Returns the number of rows taken (0 when the queue is empty)"""
+        pending = self.get_pending_recipes()
+        if not pending:
+            return 0
+
+        # Obvious non-recipes (roundups, listings, thin pages) never reach the model
+        recipes = self.screen_recipes(pending)
+        if not recipes:
+            return len(pending)
+
+        # Unchanged or duplicated content goes straight to save_results
+        results, recipes_to_extract, cache_keys, followers = self.lookup_cached(recipes)
+        logger.info(f"Processing {len(recipes)} recipes ({len(results)} from cache, "
+                    f"{sum(map(len, followers.values()))} duplicates of another recipe in the batch)")
+
+        # Extract the remaining recipes concurrently
+        tasks = [self.extract_recipe(recipe) for recipe in recipes_to_extract]
+        extracted = await asyncio.gather(*tasks, return_exceptions=True)
+        self.store_cached(extracted, cache_keys)
+        self.cache.maybe_evict()
+        results.extend(extracted)
+        # Recipes with the same content as an extracted one share its outcome
+        results.extend(
+            (follower, result[1], result[2])
+            for result in extracted if isinstance(result, tuple) and len(result) == 3
+            for follower in followers.get(result[0], ())
+        )
+
+        # Save successful extractions and update status in one transaction
+        dishes = []
+        statuses = []
+        deferrals = []
+        failed = 0
+        for result in results:
+            if isinstance(result, tuple) and len(result) == 3:
+                url_id, dish, error = result
+                if dish:
+                    dishes.append((url_id, dish))
+                elif error is not None and error.deferrable:
+                    deferrals.append((url_id, str(error)))
+                else:
+                    statuses.append((url_id, 'failed', str(error) if error else 'OpenAI extraction failed'))
+                    failed += 1
+            else:
+                # Handle exceptions from gather
+                logger.error(f"Unexpected result type: {result}")
+                failed += 1
+        successful = self.save_results(dishes, statuses, deferrals)
+        failed += len(dishes) - successful
+
+        logger.info(f"Successfully processed {successful}/{len(recipes)} recipes "
+                    f"({failed} failed, {len(deferrals)} deferred)")
+        llm_stats = self.llm.stats()
+        logger.info(f"LLM concurrency window: {llm_stats['window']} "
+                    f"({llm_stats['throttled']} throttled responses so far, "
+                    f"retry budget {llm_stats['retry_budget']})")
+        for name, usage in llm_stats['deployments'].items():
+            logger.info(f"Deployment {name}: {usage['requests']} requests, {usage['failures']} failed, "
+                        f"{usage['prompt_tokens'] + usage['completion_tokens']} tokens, "
+                        f"latency {usage['latency_ewma']}s")
+
+        # Don't spin on the deferred rows while the endpoint is down or throttling everything
+        if self.llm.all_circuits_open:
+            logger.warning(f"All LLM deployments unavailable, pausing {self.llm.next_probe_in():.0f}s")
+            await asyncio.sleep(self.llm.next_probe_in())
+        elif deferrals and not dishes and not statuses:
+            logger.warning(f"Every extraction in the batch was deferred, pausing {LLM_DEFERRAL_BACKOFF_SECONDS}s")
+            await asyncio.sleep(LLM_DEFERRAL_BACKOFF_SECONDS)
+        return len(pending)
+
     async def run(self):
         """Main processing loop"""
         logger.info("Starting recipe extraction")
+        # Listen before the first queue check so no enqueue notification is missed
+        try:
+            self.listener.connect()
+        except Exception as e:
+            logger.warning(f"Could not LISTEN on {RECIPE_LLM_CHANNEL}, falling back to polling: {e}")
         
         while True:
-            recipes = self.get_pending_recipes()
-            if not recipes:
-                logger.info("No recipes to process, waiting...")
-                await asyncio.sleep(10)
-                continue
-            
-            logger.info(f"Processing {len(recipes)} recipes")
-            
-            # Extract all recipes concurrently
-            tasks = [self.extract_recipe(recipe) for recipe in recipes]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Save successful extractions and update status
-            successful = 0
-            failed = 0
-            for result in results:
-                if isinstance(result, tuple) and len(result) == 2:
-                    url_id, dish = result
-                    if dish:
-                        try:
-                            self.save_dish(url_id, dish)
-                            self.update_llm_status(url_id, 'complete')
-                            successful += 1
-                        except Exception as e:
-                            logger.error(f"Failed to save dish {url_id}: {e}")
-                            self.update_llm_status(url_id, 'failed', str(e))
-                            failed += 1
-                    else:
-                        self.update_llm_status(url_id, 'failed', 'OpenAI extraction failed')
-                        failed += 1
-                else:
-                    # Handle exceptions from gather
-                    logger.error(f"Unexpected result type: {result}")
-                    failed += 1
-            
-            logger.info(f"Successfully processed {successful}/{len(recipes)} recipes ({failed} failed)")
+            if not await self.process_batch():
+                logger.info("No recipes to process, waiting for new work...")
+                await self.listener.wait()
 
 
 async def main():
-    extractor = RecipeExtractor(batch_size=64, max_concurrency=16)
+    parser = argparse.ArgumentParser(description="Extract structured recipe data")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Max concurrency")
+    parser.add_argument("--partition", type=int, default=None, help="Only work on this recipe_urls hash partition")
+    parser.add_argument("--compact-schema", action="store_true", help="Use the short-key response schema to cut output tokens")
+    args = parser.parse_args()
+    
+    extractor = RecipeExtractor(args.batch_size, args.max_concurrency, args.partition, args.compact_schema)
     await extractor.run()
 
 
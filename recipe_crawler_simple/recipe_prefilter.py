@@ -0,0 +1,84 @@
+import re
+import json
+import logging
+from urllib.parse import urlparse
+
+from utils import NON_RECIPE_PATH_SIGNAL, ROUNDUP_SLUG
+
+logger = logging.getLogger(__name__)
+
+# Pages shorter than this cannot hold an ingredient list and method
+MIN_TEXT_CHARS = 400
+
+# "1 cup flour", "½ tsp salt", "200 g butter", "- 2 large eggs"
+INGREDIENT_LINE = re.compile(
+    r'^\s*(?:[-•*▢]\s*)?(?:\d+(?:[./,]\d+)?|[½⅓⅔¼¾⅛])\s*[½⅓⅔¼¾⅛]?\s*(?:-\s*\d+\s*)?'
+    r'(?:cups?|tablespoons?|tbsps?|tbs|teaspoons?|tsps?|grams?|g|kg|ml|l|liters?|litres?|oz|ounces?|'
+    r'lbs?|pounds?|pinch(?:es)?|dash(?:es)?|cloves?|cans?|sticks?|slices?|large|medium|small|whole)\b',
+    re.IGNORECASE
+)
+# "1. Preheat the oven", "Step 2: Whisk"
+STEP_LINE = re.compile(r'^\s*(?:step\s*)?\d{1,2}\s*[.):]\s*\S', re.IGNORECASE)
+INGREDIENT_HEADING = re.compile(r'^\s*ingredients?\s*:?\s*$', re.IGNORECASE)
+INSTRUCTION_HEADING = re.compile(r'^\s*(?:instructions|directions|method|preparation|steps)\s*:?\s*$', re.IGNORECASE)
+# "25 Best Chicken Recipes", "Top 10 ..."
+ROUNDUP_TITLE = re.compile(r'^\s*\d{1,3}\s+(?:\S+\s+){0,5}(?:recipes|ideas|dishes|meals)\b|\btop\s+\d{1,3}\b', re.IGNORECASE)
+
+
+def has_recipe_jsonld(soup):
+    """True when the page embeds schema.org Recipe JSON-LD (call before script tags are stripped)"""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except (TypeError, ValueError):
+            continue
+        nodes = data if isinstance(data, list) else [data]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, list):
+                nodes.extend(node)
+            elif isinstance(node, dict):
+                node_type = node.get("@type")
+                types = node_type if isinstance(node_type, list) else [node_type]
+                if "Recipe" in types:
+                    return True
+                nodes.extend(node.get("@graph") or [])
+    return False
+
+
+def prefilter_recipe(url, title, text, has_jsonld=None):
+    """Cheap local cascade run before LLM extraction. Returns (passed, reason)
+
+    Stages run cheapest first and stop at the first decision. Only pages
+    that clearly lack a recipe are rejected; anything ambiguous goes on to
+    the model.
+    """
+    # Structured data is the strongest signal a page will produce a DishModel
+    if has_jsonld:
+        return True, "jsonld_recipe"
+
+    text = text or ""
+    if len(text) < MIN_TEXT_CHARS:
+        return False, "too_short"
+
+    lines = text.splitlines()
+    ingredient_lines = sum(1 for line in lines if INGREDIENT_LINE.match(line))
+    step_lines = sum(1 for line in lines if STEP_LINE.match(line))
+    has_ingredient_heading = any(INGREDIENT_HEADING.match(line) for line in lines)
+    has_instruction_heading = any(INSTRUCTION_HEADING.match(line) for line in lines)
+
+    # Category, tag and search pages link to recipes without containing one
+    path = urlparse(url or "").path.lower()
+    if NON_RECIPE_PATH_SIGNAL.search(path) and ingredient_lines < 3:
+        return False, "listing_page"
+
+    # Roundups quote a few quantities at most; a real recipe lists them all
+    if (ROUNDUP_SLUG.search(path) or ROUNDUP_TITLE.search(title or "")) and ingredient_lines < 5:
+        return False, "roundup"
+
+    has_ingredients = ingredient_lines >= 3 or (has_ingredient_heading and ingredient_lines >= 1)
+    has_instructions = has_instruction_heading or step_lines >= 2
+    if not has_ingredients and not has_instructions:
+        return False, "no_recipe_structure"
+
+    return True, "recipe_structure"
@@ -7,24 +7,30 @@ from datetime import datetime
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
-from config import setup_logging, get_db_connection
-from utils import fetch_with_proxies, is_recipe
+from config import setup_logging, db_connection, notify_channel, QueueListener, RECIPE_CRAWL_CHANNEL, RECIPE_LLM_CHANNEL
+from utils import fetch_with_proxies, is_recipe, recipe_urls_table
+from recipe_prefilter import has_recipe_jsonld
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
 class ContentProcessor:
-    def __init__(self, batch_size=128, max_concurrency=16):
+    def __init__(self, batch_size=128, max_concurrency=16, partition=None):
         self.batch_size = batch_size
+        # Scan a single hash partition of recipe_urls so workers can split the queue
+        self.queue_table = recipe_urls_table(partition)
         self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.listener = QueueListener(RECIPE_CRAWL_CHANNEL)
 
     def get_pending_urls(self):
         """Get batch of pending URLs from database"""
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
                 cursor.execute(
-                    "SELECT id, url FROM recipe.recipe_urls WHERE crawl_status = 'pending' LIMIT %s",
+                    f"""SELECT id, url FROM {self.queue_table}
+                        WHERE crawl_status = 'pending'
+                        ORDER BY crawl_priority DESC LIMIT %s""",
                     (self.batch_size,)
                 )
                 return cursor.fetchall()
@@ -41,6 +47,8 @@ class ContentProcessor:
                     return url_id, None, "fetch_failed", proxy_used
                 
                 soup = BeautifulSoup(content, "lxml")
+                # Structured data lives in script tags, so check it before they are stripped
+                jsonld_flag = has_recipe_jsonld(soup)
                 
                 # Remove unnecessary elements and extract text
                 for tag in soup.find_all(["nav", "footer", "aside", "script", "style", "img"]):
@@ -57,13 +65,14 @@ class ContentProcessor:
                         break
                 
                 # Check if it's a recipe
-                recipe_flag = is_recipe(url, title, description, clean_text)
+                recipe_flag = jsonld_flag or is_recipe(url, title, description, clean_text)
                 
                 return url_id, {
                     'parsed_text': clean_text,
                     'page_title': title,
                     'page_description': description,
                     'is_recipe': recipe_flag,
+                    'has_recipe_jsonld': jsonld_flag,
                     'proxy_used': proxy_used
                 }, None, proxy_used
                 
@@ -73,7 +82,9 @@ class ContentProcessor:
 
     def save_results(self, results):
         """Save processing results to database"""
-        with get_db_connection() as conn:
+        now = datetime.utcnow()
+        pages = []
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 for result in results:
                     if len(result) == 4:
@@ -84,37 +95,62 @@ class ContentProcessor:
                         proxy_used = None
                     
                     if data:
-                        # Success case
+                        # Success case: only the narrow queue columns live on recipe_urls
                         cursor.execute(
                             """UPDATE recipe.recipe_urls 
-                               SET parsed_text = %s, page_title = %s, page_description = %s,
-                                   is_recipe = %s, crawl_status = 'complete', 
+                               SET is_recipe = %s, crawl_status = 'complete', 
                                    proxy_used = %s, last_crawled = %s
                                WHERE id = %s""",
-                            (data['parsed_text'], data['page_title'], data['page_description'],
-                             data['is_recipe'], data.get('proxy_used'), datetime.utcnow(), url_id)
+                            (data['is_recipe'], data.get('proxy_used'), now, url_id)
                         )
+                        pages.append((url_id, data['page_title'], data['page_description'],
+                                      data['parsed_text'], data['has_recipe_jsonld'], now))
                     else:
                         # Failure case
                         cursor.execute(
                             """UPDATE recipe.recipe_urls 
-                               SET crwal_status = 'failed', crawl_failure_reason = %s, 
+                               SET crawl_status = 'failed', crawl_failure_reason = %s, 
                                    proxy_used = %s, last_crawled = %s
                                WHERE id = %s""",
-                            (error, proxy_used, datetime.utcnow(), url_id)
+                            (error, proxy_used, now, url_id)
                         )
+                
+                if pages:
+                    # Page content goes to the side table so status updates stay cheap
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        """INSERT INTO recipe.recipe_pages
+                           (url_id, title, description, parsed_text, has_recipe_jsonld, date_modified)
+                           VALUES %s
+                           ON CONFLICT (url_id) DO UPDATE SET
+                           title = EXCLUDED.title,
+                           description = EXCLUDED.description,
+                           parsed_text = EXCLUDED.parsed_text,
+                           has_recipe_jsonld = EXCLUDED.has_recipe_jsonld,
+                           date_modified = EXCLUDED.date_modified""",
+                        pages
+                    )
+                
+                if any(result[1] and result[1]['is_recipe'] for result in results):
+                    # Wake idle extraction workers once these pages are committed
+                    notify_channel(cursor, RECIPE_LLM_CHANNEL)
                 conn.commit()
 
     async def run(self):
         """Main processing loop"""
         logger.info("Starting content processor")
+        # Listen before the first queue check so no enqueue notification is missed
+        try:
+            self.listener.connect()
+        except Exception as e:
+            logger.warning(f"Could not LISTEN on {RECIPE_CRAWL_CHANNEL}, falling back to polling: {e}")
         
         while True:
             urls = self.get_pending_urls()
             
             if not urls:
-                logger.info("No URLs to process, waiting...")
-                await asyncio.sleep(5)
+                logger.info("No URLs to process, waiting for new work...")
+                await self.listener.wait()
                 continue
             
             logger.info(f"Processing {len(urls)} URLs")
@@ -134,9 +170,10 @@ async def main():
     parser = argparse.ArgumentParser(description="Process recipe URLs")
     parser.add_argument("--batch-size", type=int, default=256, help="Batch size")
     parser.add_argument("--max-concurrency", type=int, default=16, help="Max concurrency")
+    parser.add_argument("--partition", type=int, default=None, help="Only work on this recipe_urls hash partition")
     args = parser.parse_args()
     
-    processor = ContentProcessor(args.batch_size, args.max_concurrency)
+    processor = ContentProcessor(args.batch_size, args.max_concurrency, args.partition)
     await processor.run()
 
 
@@ -1,14 +1,16 @@
 import logging
-import random
 import argparse
+import csv
+import io
 from datetime import datetime
+from itertools import islice
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urlunparse
 import psycopg2
 from psycopg2.extras import execute_values
 
-from config import setup_logging, get_db_connection
-from utils import fetch_sitemap_with_fallback, is_valid_url
+from config import setup_logging, db_connection, notify_channel, RECIPE_CRAWL_CHANNEL
+from utils import fetch_sitemap_with_fallback, filter_valid_urls, url_id_for, parse_lastmod, score_crawl_priority
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -146,34 +148,97 @@ class SitemapCrawler:
         return nested_sitemaps, urls_data
 
 
-def save_urls_to_database(urls_data, site_id):
-    """Save URLs to database with duplicate handling"""
-    with get_db_connection() as conn:
+# URLs per COPY/merge round trip; each chunk is committed on its own
+INGEST_CHUNK_SIZE = 50000
+
+
+def _iter_chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_site_hit_rate(cursor, site_id):
+    """Smoothed share of this site's crawled pages that turned out to be recipes (None if never crawled)"""
+    cursor.execute(
+        """SELECT COUNT(*) FILTER (WHERE is_recipe IS TRUE), COUNT(*)
+           FROM recipe.recipe_urls
+           WHERE site_id = %s AND crawl_status = 'complete'""",
+        (site_id,)
+    )
+    hits, crawled = cursor.fetchone()
+    if not crawled:
+        return None
+    return (hits + 1) / (crawled + 2)
+
+
+def save_urls_to_database(urls_data, site_id, chunk_size=INGEST_CHUNK_SIZE):
+    """Stream URLs into recipe_urls: COPY each chunk into a staging table, then insert only new rows"""
+    counts = {'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    
+    with db_connection() as conn:
         with conn.cursor() as cursor:
-            # Filter valid URLs and prepare for insertion
-            current_time = datetime.utcnow()
-            urls_to_insert = []
+            # Temp tables are never WAL-logged and are private to this session,
+            # so concurrent site runs cannot see each other's staged rows
+            cursor.execute(
+                """CREATE TEMP TABLE IF NOT EXISTS recipe_urls_staging (
+                       id uuid, original_url text, url text, sitemap_url text,
+                       sitemap_lastmod timestamptz, crawl_priority smallint
+                   ) ON COMMIT DELETE ROWS"""
+            )
+            site_hit_rate = get_site_hit_rate(cursor, site_id)
             
-            for url_data in urls_data:
-                if is_valid_url(url_data['original_url']):
-                    urls_to_insert.append((
+            for chunk in _iter_chunks(urls_data, chunk_size):
+                valid = filter_valid_urls(chunk)
+                counts['invalid'] += len(chunk) - len(valid)
+                if not valid:
+                    continue
+                
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for url_data in valid:
+                    lastmod = parse_lastmod(url_data.get('lastmod'))
+                    writer.writerow((
+                        url_id_for(url_data['url']),        # id derived from normalized url
                         url_data['original_url'],           # original_url
                         url_data['url'],                    # normalized url
-                        site_id,
                         url_data['sitemap_url'],
-                        random.randint(0, 10)
+                        lastmod.isoformat() if lastmod else None,
+                        score_crawl_priority(url_data['url'], url_data.get('lastmod'), site_hit_rate)
                     ))
-            
-            if urls_to_insert:
-                # Use ON CONFLICT to handle duplicates on normalized URL
-                execute_values(
-                    cursor,
+                buffer.seek(0)
+                cursor.copy_expert(
+                    """COPY recipe_urls_staging (id, original_url, url, sitemap_url, sitemap_lastmod, crawl_priority)
+                       FROM STDIN WITH (FORMAT csv)""",
+                    buffer
+                )
+                
+                # Set-based merge: known URLs are filtered out before they reach the partitioned table
+                cursor.execute(
                     """INSERT INTO recipe.recipe_urls 
-                       (original_url, url, site_id, sitemap_url, randnum) 
-                       VALUES %s 
-                       ON CONFLICT (url) DO NOTHING""",
-                    urls_to_insert
+                       (id, original_url, url, site_id, sitemap_url, sitemap_lastmod, crawl_priority) 
+                       SELECT DISTINCT ON (s.id) s.id, s.original_url, s.url, %s, s.sitemap_url,
+                              s.sitemap_lastmod, s.crawl_priority
+                       FROM recipe_urls_staging s
+                       WHERE NOT EXISTS (SELECT 1 FROM recipe.recipe_urls u WHERE u.id = s.id)
+                       ORDER BY s.id
+                       ON CONFLICT (id) DO NOTHING""",
+                    (site_id,)
                 )
+                inserted = cursor.rowcount
+                counts['inserted'] += inserted
+                counts['duplicates'] += len(valid) - inserted
+                if inserted:
+                    # Wake idle crawl workers once this chunk is committed
+                    notify_channel(cursor, RECIPE_CRAWL_CHANNEL)
+                
+                # Commit per chunk: clears the staging table and keeps transactions short
+                conn.commit()
+                logger.info(f"Site {site_id}: {counts['inserted']} URLs inserted, "
+                            f"{counts['duplicates']} duplicates so far")
                 
             # Update site status
             cursor.execute(
@@ -184,7 +249,10 @@ def save_urls_to_database(urls_data, site_id):
             )
             
             conn.commit()
-            logger.info(f"Inserted {len(urls_to_insert)} URLs for site {site_id}")
+            logger.info(f"Inserted {counts['inserted']} URLs for site {site_id} "
+                        f"({counts['duplicates']} duplicates, {counts['invalid']} invalid)")
+    
+    return counts
 
 
 def process_site(site_url, site_id=None, manual_sitemaps=None):
@@ -194,7 +262,7 @@ def process_site(site_url, site_id=None, manual_sitemaps=None):
     try:
         # Get site info if needed
         if not site_id:
-            with get_db_connection() as conn:
+            with db_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(
                         "SELECT id, manual_sitemaps FROM recipe.recipe_sites WHERE url = %s",
@@ -216,7 +284,7 @@ def process_site(site_url, site_id=None, manual_sitemaps=None):
     except Exception as e:
         logger.error(f"Failed to process site {site_url}: {e}")
         # Mark site as failed
-        with get_db_connection() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """UPDATE recipe.recipe_sites 
@@ -231,7 +299,7 @@ def process_all_sites():
     """Process all sites that need URL extraction"""
     logger.info("Starting URL extraction for all sites")
     
-    with get_db_connection() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """SELECT id, url, manual_sitemaps 
@@ -247,12 +315,48 @@ def process_all_sites():
     logger.info("Completed URL extraction for all sites")
 
 
+def rescore_pending_urls(chunk_size=INGEST_CHUNK_SIZE):
+    """Recompute crawl_priority for pending URLs, e.g. after sites have built up is_recipe history"""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM recipe.recipe_sites")
+            site_ids = [row[0] for row in cursor.fetchall()]
+    
+    for site_id in site_ids:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                site_hit_rate = get_site_hit_rate(cursor, site_id)
+                cursor.execute(
+                    """SELECT id, url, sitemap_lastmod FROM recipe.recipe_urls
+                       WHERE site_id = %s AND crawl_status = 'pending'""",
+                    (site_id,)
+                )
+                rows = cursor.fetchall()
+                for chunk in _iter_chunks(rows, chunk_size):
+                    scores = [
+                        (score_crawl_priority(url, lastmod.isoformat() if lastmod else None, site_hit_rate), url_id)
+                        for url_id, url, lastmod in chunk
+                    ]
+                    execute_values(
+                        cursor,
+                        """UPDATE recipe.recipe_urls AS u SET crawl_priority = v.priority
+                           FROM (VALUES %s) AS v (priority, id)
+                           WHERE u.id = v.id::uuid""",
+                        scores
+                    )
+                    conn.commit()
+                logger.info(f"Rescored {len(rows)} pending URLs for site {site_id}")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract URLs from recipe sites")
     parser.add_argument("--site-url", help="Single site URL to process")
+    parser.add_argument("--rescore", action="store_true", help="Recompute crawl_priority for pending URLs")
     args = parser.parse_args()
     
-    if args.site_url:
+    if args.rescore:
+        rescore_pending_urls()
+    elif args.site_url:
         process_site(args.site_url)
     else:
         process_all_sites()
\ No newline at end of file
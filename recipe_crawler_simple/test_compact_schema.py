@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Round-trip test for compact_schema: expand_dish(compact_dish(dish)) must give
+back the dish it started from, so nothing is lost on the compact wire format.
+
+No endpoint or database is needed.
+
+Usage:
+    python -m unittest test_compact_schema
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from recipe_prompts import (
+    DishModel, MealTime, GeneralCategory, Season, Complexity, ServingTemperature,
+    IngredientRole, FlavorRole, PhysicalFormat,
+)
+from compact_schema import CompactDish, compact_dish, expand_dish
+
+
+def full_dish(**overrides):
+    """A dish with every field filled in"""
+    dish = {
+        "dish_name": "Chana masala",
+        "description": "Chickpeas simmered in a spiced tomato gravy",
+        "meal_time": MealTime.DINNER,
+        "general_category": GeneralCategory.MAIN_DISH,
+        "specific_category": "curry",
+        "cuisine": "Indian",
+        "complexity": Complexity.INTERMEDIATE,
+        "serving_temperature": ServingTemperature.HOT,
+        "season": Season.FALL,
+        "star_rating": Decimal("4.5"),
+        "num_ratings": 120,
+        "num_reviews": 37,
+        "date_published": date(2024, 2, 29),
+        "date_updated": date(2025, 1, 1),
+        "ingredients": [
+            {
+                "ingredient": "dried chickpeas",
+                "flavor_ingredient": "chickpea",
+                "format": PhysicalFormat.DRIED,
+                "prep_method": "soaked",
+                "quantity": Decimal("1.25"),
+                "units": "cup",
+                "type": "legume",
+                "ingredient_role": IngredientRole.BASE,
+                "flavor_role": FlavorRole.DOMINANT,
+                "alternative_ingredients": ["canned chickpeas"],
+            },
+            {"ingredient": "salt", "flavor_ingredient": "salt"},
+        ],
+        "attributes": {
+            "flavor_attributes": ["savory", "spicy"],
+            "texture_attributes": ["creamy"],
+            "aroma_attributes": ["cumin"],
+            "cooking_techniques": ["simmering"],
+            "diet_preferences": ["vegan"],
+            "functional_health": ["high protein"],
+            "occasions": ["weeknight"],
+            "convenience_attributes": ["one pot"],
+            "social_setting": ["family"],
+            "emotional_attributes": ["comforting"],
+        },
+    }
+    dish.update(overrides)
+    return DishModel.model_validate(dish)
+
+
+class CompactRoundTrip(unittest.TestCase):
+
+    def assertRoundTrips(self, dish):
+        compact = compact_dish(dish)
+        self.assertIsInstance(compact, CompactDish)
+        self.assertEqual(expand_dish(compact), dish)
+        # And through the JSON the model actually returns
+        self.assertEqual(expand_dish(CompactDish.model_validate_json(compact.model_dump_json())), dish)
+
+    def test_full_dish(self):
+        self.assertRoundTrips(full_dish())
+
+    def test_minimal_dish(self):
+        self.assertRoundTrips(DishModel(dish_name="Toast"))
+
+    def test_empty_ingredient_list_and_attributes(self):
+        self.assertRoundTrips(full_dish(ingredients=[], attributes={}))
+
+    def test_every_enum_code(self):
+        dish_enums = {
+            "meal_time": MealTime, "general_category": GeneralCategory, "complexity": Complexity,
+            "serving_temperature": ServingTemperature, "season": Season,
+        }
+        for field, enum in dish_enums.items():
+            for member in enum:
+                with self.subTest(field=field, member=member):
+                    self.assertRoundTrips(full_dish(**{field: member}))
+
+        ingredient_enums = {"format": PhysicalFormat, "ingredient_role": IngredientRole, "flavor_role": FlavorRole}
+        for field, enum in ingredient_enums.items():
+            for member in enum:
+                with self.subTest(field=field, member=member):
+                    ingredient = {"ingredient": "rice", "flavor_ingredient": "rice", field: member}
+                    self.assertRoundTrips(full_dish(ingredients=[ingredient]))
+
+    def test_compact_keys_are_short(self):
+        wire = compact_dish(full_dish()).model_dump_json()
+        self.assertNotIn("alternative_ingredients", wire)
+        self.assertNotIn("dinner", wire)
+
+
+if __name__ == "__main__":
+    unittest.main()
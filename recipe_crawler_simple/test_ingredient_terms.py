@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Round-trip test for ingredient_terms.TermCatalog and migrations/008_ingredient_terms.sql.
+
+Builds the pre-migration dish_ingredients table in a throwaway schema, runs
+the migration against it, writes more rows through TermCatalog, and reads
+everything back through dish_ingredients_named. Blank strings must come
+back as '' and NULLs as NULL. The MotherDuck copy maps flavor_ingredient
+into a NOT NULL column, so a blank must not turn into NULL.
+
+Needs a scratch PostgreSQL database configured as for config.py (DB_NAME,
+DB_HOST, ...); skipped when DB_NAME is not set.
+
+Usage:
+    python -m unittest test_ingredient_terms
+"""
+
+import os
+import sys
+import uuid
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_extraction.ingredient_terms import TermCatalog
+
+TEST_SCHEMA = "ingredient_terms_test"
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "008_ingredient_terms.sql")
+
+
+@unittest.skipUnless(os.getenv("DB_NAME"), "needs a scratch PostgreSQL database (DB_NAME)")
+class IngredientTermsRoundTrip(unittest.TestCase):
+
+    def setUp(self):
+        from config import get_db_connection
+        self.conn = get_db_connection()
+        self.conn.autocommit = True  # the migration brings its own BEGIN/COMMIT
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {TEST_SCHEMA}")
+            cursor.execute(f"""
+                CREATE TABLE {TEST_SCHEMA}.dish_ingredients (
+                    dish_id uuid NOT NULL,
+                    ingredient_id serial NOT NULL,
+                    quantity numeric(18,3),
+                    ingredient_role character varying,
+                    flavor_role character varying,
+                    alternative_ingredients character varying[],
+                    date_added timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+                    prep_method character varying,
+                    ingredient character varying,
+                    flavor_ingredient character varying,
+                    format character varying,
+                    units character varying,
+                    type character varying,
+                    PRIMARY KEY (dish_id, ingredient_id)
+                )
+            """)
+
+    def tearDown(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+        self.conn.close()
+
+    def migrate(self):
+        with open(MIGRATION) as f:
+            migration = f.read().replace("recipe.", f"{TEST_SCHEMA}.")
+        with self.conn.cursor() as cursor:
+            cursor.execute(migration)
+
+    def named(self, dish_id):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT ingredient, flavor_ingredient, format, units, type
+                    FROM {TEST_SCHEMA}.dish_ingredients_named WHERE dish_id = %s ORDER BY ingredient_id""",
+                (dish_id,)
+            )
+            return cursor.fetchall()
+
+    def test_backfill_keeps_blank_and_null_apart(self):
+        dish_id = str(uuid.uuid4())
+        rows = [("1 cup rice", "", "cooked", "", None),
+                ("salt", None, "", None, "seasoning")]
+        with self.conn.cursor() as cursor:
+            cursor.executemany(
+                f"""INSERT INTO {TEST_SCHEMA}.dish_ingredients
+                    (dish_id, ingredient, flavor_ingredient, format, units, type)
+                    VALUES (%s, %s, %s, %s, %s, %s)""",
+                [(dish_id, *row) for row in rows]
+            )
+        self.migrate()
+        self.assertEqual(self.named(dish_id), rows)
+
+    def test_writer_keeps_blank_and_null_apart(self):
+        self.migrate()
+        dish_id = str(uuid.uuid4())
+        rows = [(dish_id, "2 tbsp soy sauce", "", "", "tbsp", None),
+                (dish_id, "water", None, "", None, "")]
+        catalog = TermCatalog(f"{TEST_SCHEMA}.ingredient_terms")
+        # Twice: the second pass resolves every term from the cache
+        for _ in range(2):
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {TEST_SCHEMA}.dish_ingredients WHERE dish_id = %s", (dish_id,))
+                cursor.executemany(
+                    f"""INSERT INTO {TEST_SCHEMA}.dish_ingredients
+                        (dish_id, ingredient_term_id, flavor_ingredient_term_id, format_term_id,
+                         units_term_id, type_term_id)
+                        VALUES (%s, %s, %s, %s, %s, %s)""",
+                    catalog.intern_rows(cursor, rows, (1, 2, 3, 4, 5))
+                )
+            self.assertEqual(self.named(dish_id), [row[1:] for row in rows])
+
+
+if __name__ == "__main__":
+    unittest.main()
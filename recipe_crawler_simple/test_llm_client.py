@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pure parts of llm_extraction/llm_client.py.
+
+No endpoint or database is needed: deployments get a dummy API key and
+their call() is replaced where a test drives LLMClient.
+
+Usage:
+    python -m unittest test_llm_client
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import httpx
+import openai
+from pydantic import BaseModel, ValidationError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_extraction.llm_client import (
+    AdaptiveConcurrencyLimiter, CircuitBreaker, Deployment, LLMCallError, LLMClient, RetryBudget, TokenRateLimiter,
+    estimate_request_tokens, classify_error, backoff_delay,
+    THROTTLE, TRANSIENT, CONTENT_FILTER, LENGTH_LIMIT, VALIDATION, FATAL,
+)
+
+
+def api_response(status, headers=None):
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://example.invalid/"))
+
+
+def open_breaker(breaker, probe_due=True):
+    """Put breaker in the open state, with its probe already due unless probe_due is False"""
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - (breaker.reset_seconds + 1 if probe_due else 0)
+
+
+class AdaptiveConcurrency(unittest.TestCase):
+
+    def test_window_grows_by_about_one_per_window_of_successes(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4)
+        for _ in range(4):
+            limiter.record_success(1.0)
+        self.assertEqual(limiter.limit, 4)
+        self.assertGreater(limiter.window, 4.9)
+
+    def test_slow_or_near_quota_responses_do_not_grow_the_window(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4, latency_target=30.0)
+        limiter.record_success(31.0)
+        limiter.record_success(1.0, {"x-ratelimit-remaining-tokens": "100"})
+        limiter.record_success(1.0, {"x-ratelimit-remaining-requests": "1"})
+        self.assertEqual(limiter.window, 4.0)
+
+    def test_window_stops_at_maximum(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4, maximum=4)
+        limiter.record_success(1.0)
+        self.assertEqual(limiter.window, 4.0)
+
+    def test_throttle_cuts_the_window_once_per_burst_and_pauses(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=16, decrease=0.5)
+        limiter.record_throttle(retry_after=5.0)
+        limiter.record_throttle(retry_after=5.0)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.throttled, 2)
+        self.assertGreater(limiter.paused_until, time.monotonic() + 4)
+
+    def test_throttle_never_goes_below_minimum(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, minimum=1)
+        for _ in range(3):
+            limiter.last_decrease = 0.0
+            limiter.record_throttle()
+        self.assertEqual(limiter.limit, 1)
+
+
+class TokenBucket(unittest.IsolatedAsyncioTestCase):
+
+    async def test_acquire_reserves_tokens_and_a_request(self):
+        bucket = TokenRateLimiter(6000, 60)
+        await bucket.acquire(1000)
+        self.assertAlmostEqual(bucket.tokens, 5000, delta=5)
+        self.assertAlmostEqual(bucket.requests, 59, delta=0.1)
+
+    async def test_bucket_refills_with_time_up_to_its_quota(self):
+        bucket = TokenRateLimiter(6000, 60)
+        bucket.tokens, bucket.requests = 0.0, 0.0
+        bucket.updated -= 30
+        bucket._refill()
+        self.assertAlmostEqual(bucket.tokens, 3000, delta=5)
+        self.assertAlmostEqual(bucket.requests, 30, delta=0.1)
+        bucket.updated -= 120
+        bucket._refill()
+        self.assertEqual(bucket.tokens, 6000)
+
+    async def test_reconcile_returns_unused_reservation_and_charges_overruns(self):
+        bucket = TokenRateLimiter(6000, 60)
+        await bucket.acquire(2000)
+        bucket.reconcile(2000, 500)
+        self.assertAlmostEqual(bucket.tokens, 5500, delta=5)
+        bucket.reconcile(0, 1500)
+        self.assertAlmostEqual(bucket.tokens, 4000, delta=5)
+
+    async def test_request_larger_than_the_bucket_is_admitted_when_full(self):
+        bucket = TokenRateLimiter(6000, 60)
+        await asyncio.wait_for(bucket.acquire(10000), 1)
+        self.assertAlmostEqual(bucket.tokens, 0, delta=5)
+
+    async def test_acquire_waits_for_the_bucket_to_refill(self):
+        bucket = TokenRateLimiter(60000, 600)
+        bucket.tokens = 0.0
+        started = time.monotonic()
+        await bucket.acquire(100)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_estimate_covers_prompt_and_completion_budget(self):
+        messages = [{"role": "system", "content": "x" * 400}, {"role": "user", "content": None}]
+        # 100 prompt tokens at 4 characters each, 4 overhead per message, the full completion budget
+        self.assertEqual(estimate_request_tokens(messages, 1000), 100 + 2 * 4 + 1000)
+
+
+class BreakerTransitions(unittest.TestCase):
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.remaining(), 59)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        open_breaker(breaker)
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.probing)
+        self.assertFalse(breaker.allow())
+
+    def test_successful_probe_closes_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        open_breaker(breaker)
+        breaker.allow()
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+        self.assertFalse(breaker.probing)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens_the_circuit(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        open_breaker(breaker)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.probing)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.remaining(), 59)
+
+
+class Budget(unittest.TestCase):
+
+    def test_reserve_allows_a_burst_of_retries_then_runs_out(self):
+        budget = RetryBudget(ratio=0.1, reserve=2)
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+        self.assertEqual(budget.exhausted, 1)
+
+    def test_first_attempts_earn_retries_up_to_the_reserve(self):
+        budget = RetryBudget(ratio=0.25, reserve=2)
+        budget.balance = 0.0
+        for _ in range(4):
+            budget.record_attempt()
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+        for _ in range(100):
+            budget.record_attempt()
+        self.assertEqual(budget.balance, 2.0)
+
+
+class ErrorClassification(unittest.TestCase):
+
+    def assertKind(self, error, kind):
+        classified = classify_error(error)
+        self.assertIsInstance(classified, LLMCallError)
+        self.assertEqual(classified.kind, kind)
+        return classified
+
+    def test_rate_limit_is_a_retryable_throttle_with_retry_after(self):
+        error = openai.RateLimitError("slow down", response=api_response(429, {"retry-after-ms": "1500"}), body=None)
+        classified = self.assertKind(error, THROTTLE)
+        self.assertTrue(classified.retryable)
+        self.assertEqual(classified.retry_after, 1.5)
+
+    def test_connection_errors_and_server_errors_are_transient(self):
+        request = httpx.Request("POST", "https://example.invalid/")
+        self.assertKind(openai.APITimeoutError(request), TRANSIENT)
+        self.assertKind(openai.APIConnectionError(request=request), TRANSIENT)
+        for status in (408, 409, 500, 503):
+            error = openai.APIStatusError("server error", response=api_response(status), body=None)
+            self.assertTrue(self.assertKind(error, TRANSIENT).deferrable)
+
+    def test_content_filter_rejections_and_finishes(self):
+        error = openai.BadRequestError("filtered", response=api_response(400), body={"code": "content_filter"})
+        self.assertFalse(self.assertKind(error, CONTENT_FILTER).retryable)
+        self.assertKind(openai.ContentFilterFinishReasonError(), CONTENT_FILTER)
+
+    def test_length_finish_is_a_length_limit(self):
+        completion = SimpleNamespace(usage=None)
+        self.assertKind(openai.LengthFinishReasonError(completion=completion), LENGTH_LIMIT)
+
+    def test_invalid_output_is_a_validation_error(self):
+        class Model(BaseModel):
+            value: int
+
+        with self.assertRaises(ValidationError) as raised:
+            Model.model_validate({"value": "not a number"})
+        self.assertKind(raised.exception, VALIDATION)
+        self.assertKind(json.JSONDecodeError("Expecting value", "", 0), VALIDATION)
+
+    def test_other_client_errors_are_fatal(self):
+        error = openai.BadRequestError("bad request", response=api_response(400), body={"code": "invalid_value"})
+        classified = self.assertKind(error, FATAL)
+        self.assertFalse(classified.retryable)
+        self.assertFalse(classified.deferrable)
+        self.assertKind(RuntimeError("boom"), FATAL)
+
+    def test_already_classified_errors_pass_through(self):
+        error = LLMCallError(VALIDATION, "Empty structured output")
+        self.assertIs(classify_error(error), error)
+
+    def test_backoff_never_undercuts_retry_after(self):
+        for attempt in range(1, 6):
+            self.assertGreaterEqual(backoff_delay(attempt, retry_after=7.0), 7.0)
+            self.assertLessEqual(backoff_delay(attempt, cap=2.0), 2.0)
+
+
+class CancelledProbe(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cancelled_probe_lets_the_next_call_probe(self):
+        deployment = Deployment("test", "https://example.invalid/", "test", api_key="test")
+        client = LLMClient([deployment])
+        open_breaker(deployment.breaker)
+        started = asyncio.Event()
+
+        async def hang(*args):
+            started.set()
+            await asyncio.sleep(3600)
+
+        deployment.call = hang
+        probe = asyncio.create_task(client.complete([{"role": "user", "content": "hi"}], 10, {}))
+        await started.wait()
+        self.assertTrue(deployment.breaker.probing)
+        self.assertFalse(deployment.available)
+
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+        self.assertFalse(deployment.breaker.probing)
+        self.assertTrue(deployment.available)
+
+        async def answer(*args):
+            return "completion"
+
+        deployment.call = answer
+        self.assertEqual(await client.complete([{"role": "user", "content": "hi"}], 10, {}), "completion")
+        self.assertFalse(deployment.breaker.is_open)
+
+
+class FailedCallReconciliation(unittest.IsolatedAsyncioTestCase):
+    """Reservations are settled however the call ends, not only on success and 429s"""
+
+    def deployment(self, create):
+        deployment = Deployment("test", "https://example.invalid/", "test", api_key="test", tpm=6000, rpm=600)
+        deployment.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=create))))
+        return deployment
+
+    async def test_unanswered_call_is_refunded(self):
+        async def create(**kwargs):
+            raise ConnectionError("connection reset before any response")
+
+        deployment = self.deployment(create)
+        with self.assertRaises(ConnectionError):
+            await deployment.call([{"role": "user", "content": "hi"}], 1000, {}, 0.0)
+        self.assertAlmostEqual(deployment.rate_limiter.tokens, 6000, delta=5)
+
+    async def test_answered_call_rejected_by_parse_is_charged_its_usage(self):
+        class Response:
+            headers = {}
+            http_response = SimpleNamespace(json=lambda: {"usage": {"total_tokens": 500}})
+
+            def parse(self):
+                raise ValueError("completion does not match the schema")
+
+        async def create(**kwargs):
+            return Response()
+
+        deployment = self.deployment(create)
+        window = deployment.limiter.window
+        with self.assertRaises(ValueError):
+            await deployment.call([{"role": "user", "content": "hi"}], 1000, {}, 0.0)
+        self.assertAlmostEqual(deployment.rate_limiter.tokens, 5500, delta=5)
+        # The endpoint answered, so the concurrency window still counts it as healthy
+        self.assertGreater(deployment.limiter.window, window)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,9 @@ import logging
 import gzip
 import chardet
 import re
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
 from urllib.parse import urlparse
 import tldextract
 from tenacity import retry, stop_after_attempt, wait_fixed
@@ -12,6 +15,75 @@ from config import DATACENTER_PROXY, PREMIUM_PROXY
 
 logger = logging.getLogger(__name__)
 
+# Must match the hash modulus in migrations/002_partition_recipe_urls.sql
+RECIPE_URL_PARTITIONS = 16
+
+
+def url_id_for(url):
+    """Deterministic recipe_urls id for a normalized URL (same as uuid_generate_v5(uuid_ns_url(), url))"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
+
+
+def recipe_urls_table(partition=None):
+    """Queue table to scan: the partitioned parent, or a single hash partition"""
+    if partition is None:
+        return "recipe.recipe_urls"
+    if not 0 <= partition < RECIPE_URL_PARTITIONS:
+        raise ValueError(f"partition must be between 0 and {RECIPE_URL_PARTITIONS - 1}")
+    return f"recipe.recipe_urls_p{partition:02d}"
+
+
+# URL path signals used to rank the crawl queue
+RECIPE_PATH_SIGNAL = re.compile(r'recipe')
+NON_RECIPE_PATH_SIGNAL = re.compile(
+    r'/(tags?|categor(y|ies)|authors?|page|about|contact|privacy|terms|shop|store|search|'
+    r'collections?|roundups?|videos?|events?|news|press|cart|account)(/|$)'
+)
+ROUNDUP_SLUG = re.compile(r'(^|/)\d+[-_](best|easy|quick|healthy|favorite|must)|-recipes(/|$)')
+
+
+def parse_lastmod(lastmod):
+    """Parse a sitemap <lastmod> value (W3C datetime); returns None when missing or malformed"""
+    if not lastmod:
+        return None
+    try:
+        parsed = datetime.fromisoformat(lastmod.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def score_crawl_priority(url, lastmod=None, site_hit_rate=None):
+    """Expected recipe yield of a URL on a 0-100 scale (higher is crawled first)"""
+    path = urlparse(url).path.lower()
+    score = 20
+    
+    # Site history: what fraction of this site's crawled pages were recipes
+    score += round(35 * (0.5 if site_hit_rate is None else site_hit_rate))
+    
+    # URL path signals
+    if NON_RECIPE_PATH_SIGNAL.search(path):
+        score -= 40
+    elif RECIPE_PATH_SIGNAL.search(path):
+        score += 30
+    if ROUNDUP_SLUG.search(path):
+        score -= 20
+    slug = path.rstrip('/').rsplit('/', 1)[-1]
+    if slug.count('-') >= 2:
+        # Descriptive slugs ("creamy-garlic-pasta") are typical of recipe posts
+        score += 10
+    
+    # Freshness from the sitemap
+    modified = parse_lastmod(lastmod)
+    if modified:
+        age_days = (datetime.now(timezone.utc) - modified).days
+        if age_days <= 365:
+            score += 15
+        elif age_days <= 3 * 365:
+            score += 5
+    
+    return max(0, min(100, score))
+
 
 def is_recipe(url, title, description, content):
     """Determines if content is a recipe based on simple but effective rules."""
@@ -133,6 +205,20 @@ def fetch_sitemap_with_fallback(sitemap_url):
     return None
 
 
+# Unwanted file types and site sections, compiled once for the ingest hot path
+EXCLUDED_URL_PATH = re.compile(
+    r'\.(jpg|jpeg|png|gif|pdf|zip|doc|docx|xml|txt)$'
+    r'|/(sitemap|feed|rss|atom|api|admin|login|wp-content|tag|category|author|search)/'
+)
+
+
+@lru_cache(maxsize=4096)
+def has_registered_domain(netloc):
+    """tldextract lookup, cached per host since a sitemap's URLs share a handful of hosts"""
+    ext = tldextract.extract(netloc)
+    return bool(ext.domain and ext.suffix)
+
+
 def is_valid_url(url):
     """Check if URL is valid and not an excluded file type or path"""
     if not url:
@@ -146,22 +232,23 @@ def is_valid_url(url):
             return False
         
         # Domain validation
-        ext = tldextract.extract(url)
-        if not (ext.domain and ext.suffix):
+        if not has_registered_domain(parsed.netloc):
             return False
         
         # Exclude unwanted patterns
-        excluded = [
-            r'\.(jpg|jpeg|png|gif|pdf|zip|doc|docx|xml|txt)$',
-            r'/(sitemap|feed|rss|atom|api|admin|login|wp-content|tag|category|author|search)/'
-        ]
-        
-        
-        path = parsed.path.lower()
-        return not any(re.search(pattern, path) for pattern in excluded)
+        return not EXCLUDED_URL_PATH.search(parsed.path.lower())
         
     except Exception:
         return False
+
+
+def filter_valid_urls(urls_data):
+    """Keep the url dicts whose original_url passes is_valid_url.
+
+    Each URL is checked on its own; the tldextract lookups behind it are
+    shared through has_registered_domain's per-host cache.
+    """
+    return [url_data for url_data in urls_data if is_valid_url(url_data['original_url'])]
     
 
 def normalize_url(url):